@@ -0,0 +1,424 @@
+"""
+HTTP Caching
+Conditional GET support and a pre-serialized response cache tied to the
+loaded data snapshot
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from anyio import to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+from api.profiling import PROFILE_SCOPE_KEY
+from data.service import data_service
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are stored
+    brotli = None
+
+# Cache-Control sent with every data-bearing response
+CACHE_CONTROL = os.getenv("UNISKOR_CACHE_CONTROL", "public, max-age=60")
+
+# Response cache bounds: entry count (LRU) and largest body worth keeping
+RESPONSE_CACHE_SIZE = int(os.getenv("UNISKOR_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_MAX_BODY = int(os.getenv("UNISKOR_RESPONSE_CACHE_MAX_BODY", str(8 * 1024 * 1024)))
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# Preference order when a client accepts several encodings
+ENCODINGS = ("br", "gzip")
+
+# Paths whose content is fully determined by the snapshot and the query string
+DATA_PATH_PREFIX = "/api/"
+STATIC_DATA_PATH = "/data/data.json"
+
+# API paths that change without the current snapshot changing
+UNCACHED_PATHS = frozenset({"/api/data/versions"})
+
+
+def is_data_path(path: str) -> bool:
+    """Check whether a path serves snapshot data"""
+    if path in UNCACHED_PATHS:
+        return False
+    return path.startswith(DATA_PATH_PREFIX) or path == STATIC_DATA_PATH
+
+
+def normalize_query(query_string: bytes) -> str:
+    """Canonical query string, so parameter order does not change the cache key"""
+    if not query_string:
+        return ""
+    pairs = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode(sorted(pairs))
+
+
+def snapshot_etag(version: Optional[str], path: str, query: str) -> str:
+    """Strong ETag for a response: hash of snapshot version, path and parameters"""
+    digest = hashlib.blake2b(f"{version}|{path}|{query}".encode("utf-8"), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of a content-encoded variant; strong ETags must differ per encoding"""
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> Optional[str]:
+    """Evaluate an If-None-Match header; returns the matching variant ETag"""
+    variants = [etag] + [encoded_etag(etag, encoding) for encoding in ENCODINGS]
+    for candidate in if_none_match.split(","):
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in variants:
+            return candidate
+    return None
+
+
+def not_modified_since(if_modified_since: str, last_modified: Optional[float]) -> bool:
+    """Evaluate an If-Modified-Since header against the snapshot mtime"""
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one second resolution
+    return int(last_modified) <= since
+
+
+def static_file_state() -> Optional[Tuple[str, float]]:
+    """Version and mtime of the data.json StaticFiles serves, from its stat.
+
+    That body comes from disk, which can differ from the loaded snapshot
+    (data.bin loaded, or a new data.json not yet reloaded), so it is
+    validated against the file itself as StaticFiles does. None if it is gone.
+    """
+    try:
+        stat = os.stat(data_service.data_dir / "data.json")
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}", stat.st_mtime
+
+
+def requested_version(query_string: bytes) -> Optional[str]:
+    """The ``version`` query parameter of a request, if any"""
+    for name, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True):
+        if name == "version":
+            return value
+    return None
+
+
+class ConditionalGetMiddleware:
+    """Answer conditional GETs for snapshot data with 304.
+
+    Data-bearing responses get ETag, Last-Modified and Cache-Control headers
+    taken from the snapshot the request reads: the current one, or the
+    dated one named by ``?version=``; the static data.json is validated
+    against its file (see static_file_state). The ETag identifies a 200 response of
+    that snapshot, so a matching If-None-Match is answered here before
+    routing and no ranking or serialization work runs for it.
+    If-Modified-Since only dates the snapshot, not the route's outcome, so
+    it is evaluated once the route has answered 200; errors go out as they
+    are.
+    """
+
+    def __init__(self, app, cache_control: str = CACHE_CONTROL):
+        self.app = app
+        self.cache_control = cache_control
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not is_data_path(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        state = await self._state(scope)
+        if state is None:
+            # Nothing to validate against; let the route report the error
+            await self.app(scope, receive, send)
+            return
+        version, last_modified = state
+
+        etag = snapshot_etag(version, scope["path"], normalize_query(scope["query_string"]))
+        validators = {"ETag": etag, "Cache-Control": self.cache_control}
+        if last_modified is not None:
+            validators["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_none_match is not None:
+            matched = etag_matches(if_none_match, etag)
+            if matched is not None:
+                validators["ETag"] = matched
+                # As the 200 would: its stored variants differ by encoding
+                validators["Vary"] = "Accept-Encoding"
+                await self._send_not_modified(validators, send)
+                return
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.2.2)
+        check_modified = (
+            if_none_match is None
+            and if_modified_since is not None
+            and not_modified_since(if_modified_since, last_modified)
+        )
+        suppressed = False
+
+        async def send_with_validators(message):
+            nonlocal suppressed
+            if suppressed:
+                return
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                validators["ETag"] = encoded_etag(etag, headers.get("content-encoding"))
+                if check_modified:
+                    # Drop the body; the client's copy is current
+                    suppressed = True
+                    if "vary" in headers:
+                        validators["Vary"] = headers["vary"]
+                    await self._send_not_modified(validators, send)
+                    return
+                for name, value in validators.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
+
+    @staticmethod
+    async def _state(scope) -> Optional[Tuple[Optional[str], Optional[float]]]:
+        """Version and mtime the response is validated against, if known"""
+        if scope["path"] == STATIC_DATA_PATH:
+            return await to_thread.run_sync(static_file_state)
+        version = requested_version(scope["query_string"])
+        try:
+            if version is None:
+                snapshot = data_service.get_snapshot()
+            else:
+                # Historical snapshots may have to be read from disk first
+                snapshot = await to_thread.run_sync(data_service.get_snapshot, version)
+        except (FileNotFoundError, KeyError):
+            return None
+        return snapshot.version, snapshot.last_modified
+
+    @staticmethod
+    async def _send_not_modified(validators: Dict[str, str], send):
+        await send({
+            "type": "http.response.start",
+            "status": 304,
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in validators.items()],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the preferred encoding the client accepts, if any"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A finished response body with its precompressed variants"""
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    bodies: Dict[Optional[str], bytes]
+
+
+def render_variants(body: bytes) -> Dict[Optional[str], bytes]:
+    """Compress a body into every supported encoding worth serving"""
+    bodies = {None: body}
+    if len(body) < MIN_COMPRESS_SIZE:
+        return bodies
+    bodies["gzip"] = gzip.compress(body, compresslevel=9)
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=11)
+    # Drop variants that did not actually shrink the body
+    return {encoding: data for encoding, data in bodies.items() if len(data) < len(body) or encoding is None}
+
+
+class ResponseCache:
+    """Size-bounded LRU of finished responses keyed by (path, query, snapshot version)"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str, Optional[str]], CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key) -> Optional[CachedResponse]:
+        """Look up an entry, marking it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, key, entry: CachedResponse):
+        """Store an entry, evicting the least recently used ones over the bound"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, *_):
+        """Drop every entry; registered as a DataService reload listener"""
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache()
+data_service.add_reload_listener(response_cache.clear)
+
+
+class ResponseCacheMiddleware:
+    """Serve snapshot data from pre-serialized, precompressed bytes.
+
+    The first GET for a (path, query, snapshot version) runs the route,
+    then its JSON body is stored alongside gzip and brotli encodings.
+    Later requests are answered from those bytes with the encoding the
+    client accepts, skipping routing and serialization. Non-JSON and
+    non-200 responses (errors, streamed exports) and profiled requests
+    pass straight through.
+    """
+
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not is_data_path(scope["path"])
+            or scope.get(PROFILE_SCOPE_KEY)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            if scope["path"] == STATIC_DATA_PATH:
+                # Keyed by the file on disk, which is what StaticFiles sends
+                state = await to_thread.run_sync(static_file_state)
+                if state is None:
+                    raise FileNotFoundError(scope["path"])
+                version = state[0]
+            else:
+                version = data_service.get_snapshot().version
+        except FileNotFoundError:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], normalize_query(scope["query_string"]), version)
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding"))
+
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = await self._render(scope, receive, send)
+            if entry is None:
+                return
+            self.cache.put(key, entry)
+
+        await self._send_entry(entry, encoding, send)
+
+    async def _render(self, scope, receive, send) -> Optional[CachedResponse]:
+        """Run the route; capture a cacheable response or pass it through"""
+        start = None
+        chunks = []
+        size = 0
+        passthrough = False
+
+        async def capture(message):
+            nonlocal start, size, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                cacheable = (
+                    message["status"] == 200
+                    and headers.get("content-type", "").startswith("application/json")
+                    and "content-encoding" not in headers
+                )
+                if cacheable:
+                    start = message
+                else:
+                    passthrough = True
+                    await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > RESPONSE_CACHE_MAX_BODY:
+                # Too large to keep; flush what we have and stream the rest
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                if not message.get("more_body", False):
+                    await send({"type": "http.response.body", "body": b""})
+
+        await self.app(scope, receive, capture)
+        if passthrough or start is None:
+            return None
+
+        headers = [
+            (name, value) for name, value in start["headers"]
+            if name not in (b"content-length", b"content-encoding", b"vary")
+        ]
+        bodies = await to_thread.run_sync(render_variants, b"".join(chunks))
+        return CachedResponse(status=start["status"], headers=headers, bodies=bodies)
+
+    async def _send_entry(self, entry: CachedResponse, encoding: Optional[str], send):
+        """Send a cached response in the requested encoding, if stored"""
+        if encoding not in entry.bodies:
+            encoding = None
+        body = entry.bodies[encoding]
+
+        headers = list(entry.headers)
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        if len(entry.bodies) > 1:
+            headers.append((b"vary", b"Accept-Encoding"))
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
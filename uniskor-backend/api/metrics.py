@@ -0,0 +1,244 @@
+"""
+Metrics
+Per-route request counts, latency and response size histograms, plus data
+reload and response cache statistics, in the Prometheus text format
+
+Metrics are kept per process: with several uvicorn workers each one
+reports its own counters and Prometheus should scrape every worker.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.routing import Match
+
+from api.caching import ResponseCache, response_cache
+from api.warmup import WARMUP_SCOPE_KEY
+from data.service import DataService, data_service
+
+# Histogram upper bounds (le); +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Label for requests no route matched, so unknown paths cannot grow the label set
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Bound on memoized path -> route template lookups
+MAX_ROUTE_MEMO = 10000
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are cumulated only when rendered"""
+
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, cumulative count) pairs ending with +Inf"""
+        total = 0
+        buckets = []
+        for le, count in zip([_format_value(bound) for bound in self.bounds] + ["+Inf"], self.counts):
+            total += count
+            buckets.append((le, total))
+        return buckets
+
+
+class RequestMetrics:
+    """Request counters and histograms keyed by route template.
+
+    Only touched from the event loop thread, so updates need no lock.
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.sizes: Dict[Tuple[str, str], Histogram] = {}
+        self.in_progress = 0
+
+    def observe(self, method: str, route: str, status: int, duration: float, size: int):
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        series = (method, route)
+        latency = self.latency.get(series)
+        if latency is None:
+            latency = self.latency[series] = Histogram(LATENCY_BUCKETS)
+            self.sizes[series] = Histogram(SIZE_BUCKETS)
+        latency.observe(duration)
+        self.sizes[series].observe(size)
+
+
+request_metrics = RequestMetrics()
+
+
+class RouteResolver:
+    """Map request paths to route templates (``/api/data/year/{year}``).
+
+    Responses served from the response cache never reach the router, so
+    the template is resolved here rather than read from the scope.
+    Lookups are memoized per path.
+    """
+
+    def __init__(self, max_entries: int = MAX_ROUTE_MEMO):
+        self.max_entries = max_entries
+        self._templates: Dict[Tuple[str, str], str] = {}
+
+    def resolve(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._templates.get(key)
+        if template is None:
+            template = self._match(scope)
+            if len(self._templates) >= self.max_entries:
+                self._templates.clear()
+            self._templates[key] = template
+        return template
+
+    def _match(self, scope) -> str:
+        router = scope["app"].router
+        partial = None
+        for route in router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record method, route, status, latency and response size of every request.
+
+    Added last so it wraps every other middleware: cached responses and
+    304s are measured as clients see them. Sizes are body bytes on the
+    wire, i.e. after content encoding. The app's own warm-up requests are
+    not counted.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics, resolver: Optional[RouteResolver] = None):
+        self.app = app
+        self.metrics = metrics
+        self.resolver = resolver or RouteResolver()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get(WARMUP_SCOPE_KEY):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_recorded(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        # Resolve first: mounts rewrite scope["path"] while routing
+        route = self.resolver.resolve(scope)
+        self.metrics.in_progress += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_recorded)
+        finally:
+            duration = time.perf_counter() - started
+            self.metrics.in_progress -= 1
+            self.metrics.observe(scope["method"], route, status, duration, size)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+
+class _Writer:
+    """Accumulates exposition lines, one HELP/TYPE block per metric family"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, value, **labels):
+        self.lines.append(f"{name}{_labels(**labels)} {_format_value(value)}")
+
+    def histograms(self, name: str, help_text: str, histograms: Dict[Tuple[str, str], Histogram]):
+        self.family(name, "histogram", help_text)
+        for (method, route), histogram in sorted(histograms.items()):
+            for le, count in histogram.cumulative():
+                self.sample(f"{name}_bucket", count, method=method, route=route, le=le)
+            self.sample(f"{name}_sum", histogram.sum, method=method, route=route)
+            self.sample(f"{name}_count", sum(histogram.counts), method=method, route=route)
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_metrics(
+    metrics: RequestMetrics = request_metrics,
+    service: DataService = data_service,
+    cache: ResponseCache = response_cache
+) -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    out = _Writer()
+
+    out.family("uniskor_http_requests_total", "counter", "HTTP requests by method, route and status")
+    for (method, route, status), count in sorted(metrics.requests.items()):
+        out.sample("uniskor_http_requests_total", count, method=method, route=route, status=status)
+    out.family("uniskor_http_requests_in_progress", "gauge", "HTTP requests currently being served")
+    out.sample("uniskor_http_requests_in_progress", metrics.in_progress)
+    out.histograms("uniskor_http_request_duration_seconds", "HTTP request latency", metrics.latency)
+    out.histograms("uniskor_http_response_size_bytes", "HTTP response body size on the wire", metrics.sizes)
+
+    stats = service.get_reload_stats()
+    out.family("uniskor_snapshot_reloads_total", "counter", "Data snapshots loaded and published")
+    out.sample("uniskor_snapshot_reloads_total", stats['reloads'])
+    out.family("uniskor_snapshot_reload_failures_total", "counter", "Data reloads that failed and kept the old snapshot")
+    out.sample("uniskor_snapshot_reload_failures_total", stats['failures'])
+    out.family("uniskor_snapshot_load_duration_seconds", "gauge", "Duration of the last snapshot load")
+    out.sample("uniskor_snapshot_load_duration_seconds", stats['lastDuration'])
+    out.family("uniskor_snapshot_load_duration_seconds_total", "counter", "Time spent loading snapshots")
+    out.sample("uniskor_snapshot_load_duration_seconds_total", stats['totalDuration'])
+    out.family("uniskor_snapshot_age_seconds", "gauge", "Seconds since the served data file was modified")
+    out.sample("uniskor_snapshot_age_seconds", stats['snapshotAge'])
+    out.family("uniskor_snapshot_loaded_age_seconds", "gauge", "Seconds since the served snapshot was loaded")
+    out.sample("uniskor_snapshot_loaded_age_seconds", stats['loadedAge'])
+    if stats['generation'] is not None:
+        out.family("uniskor_snapshot_generation", "gauge", "Shared snapshot generation served by this worker")
+        out.sample("uniskor_snapshot_generation", stats['generation'])
+
+    out.family("uniskor_response_cache_requests_total", "counter", "Response cache lookups by result")
+    out.sample("uniskor_response_cache_requests_total", cache.hits, result="hit")
+    out.sample("uniskor_response_cache_requests_total", cache.misses, result="miss")
+    out.family("uniskor_response_cache_evictions_total", "counter", "Response cache entries evicted by the LRU bound")
+    out.sample("uniskor_response_cache_evictions_total", cache.evictions)
+    out.family("uniskor_response_cache_entries", "gauge", "Responses currently cached")
+    out.sample("uniskor_response_cache_entries", len(cache))
+
+    return out.text()
@@ -0,0 +1,128 @@
+"""
+Pagination Helpers
+Opaque offset cursors and field projection for list endpoints
+"""
+
+import base64
+import binascii
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, Query
+
+from data.snapshot import METRICS
+
+# Upper bound for the limit parameter on list endpoints
+MAX_LIMIT = 1000
+
+# Projectable fields per list item shape
+RANKING_FIELDS = ('slug', 'name', 'ortalama', 'medyan', 'rank')
+# A metric on a university item is its per-year series, {"2015": ..., ...}
+UNIVERSITY_SCORE_FIELDS = METRICS
+UNIVERSITY_FIELDS = ('slug', 'name', 'scores') + UNIVERSITY_SCORE_FIELDS
+RESCORE_FIELDS = ('slug', 'name', 'mean', 'median', 'rank')
+
+# Leading characters of the snapshot version kept in a cursor
+CURSOR_VERSION_CHARS = 16
+
+
+def _version_tag(version: Optional[str]) -> str:
+    """The part of a snapshot version a cursor carries"""
+    return (version or '')[:CURSOR_VERSION_CHARS]
+
+
+def encode_cursor(offset: int, version: Optional[str]) -> str:
+    """Encode a list offset, bound to the snapshot it indexes, as an opaque cursor"""
+    token = f"{offset}:{_version_tag(version)}"
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], version: Optional[str]) -> int:
+    """Decode a cursor back to a list offset; no cursor means the first page.
+
+    A cursor issued for another snapshot (the data was reloaded between
+    pages) is rejected with 409 rather than resumed at an offset into a
+    different list, which would skip or repeat items.
+    """
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset, separator, tag = base64.urlsafe_b64decode(padded.encode()).decode().partition(':')
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0 or not separator:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if tag != _version_tag(version):
+        raise HTTPException(
+            status_code=409,
+            detail="Cursor belongs to a different data snapshot; restart from the first page"
+        )
+    return offset
+
+
+def parse_list(value: Optional[str]) -> List[str]:
+    """Split a comma separated query value, ignoring blanks"""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def fields_query(allowed: Sequence[str]):
+    """The fields= query parameter of a list endpoint, documenting its choices"""
+    return Query(None, description=f"Comma separated fields to return: {', '.join(allowed)} (default: all)")
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Optional[List[str]]:
+    """Parse a comma separated fields= value, rejecting unknown names"""
+    if not fields:
+        return None
+    requested = parse_list(fields)
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return requested
+
+
+def project(item: Dict, fields: List[str]) -> Dict:
+    """Keep the requested fields of a list item; a score metric missing from
+    a university item is taken per year from its nested scores"""
+    projected = {}
+    for name in fields:
+        if name in item:
+            projected[name] = item[name]
+        elif name in UNIVERSITY_SCORE_FIELDS and 'scores' in item:
+            projected[name] = {year: scores.get(name) for year, scores in item['scores'].items()}
+        else:
+            projected[name] = None
+    return projected
+
+
+def paginate(
+    items: Sequence[Dict],
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    *,
+    version: Optional[str]
+) -> Dict:
+    """Slice a precomputed list into one page and project the requested fields.
+
+    Returns the page under ``items`` along with ``total`` and ``nextCursor``
+    (None on the last page). Without a limit the rest of the list is returned.
+    ``version`` is the snapshot the list was built from; cursors are bound to it.
+    """
+    offset = decode_cursor(cursor, version)
+    end = len(items) if limit is None else offset + limit
+    page = items[offset:end]
+    if fields is not None:
+        page = [project(item, fields) for item in page]
+
+    return {
+        'items': page,
+        'total': len(items),
+        'nextCursor': encode_cursor(end, version) if end < len(items) else None
+    }
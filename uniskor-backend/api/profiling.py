@@ -0,0 +1,206 @@
+"""
+Request Profiling
+Opt-in per-request profiles in folded-stack (flame graph) or cProfile form
+
+Enabled with UNISKOR_PROFILING=1; otherwise the middleware is not installed
+and requests pay nothing. A request is profiled when its ``X-Profile``
+header or ``profile`` query parameter equals UNISKOR_PROFILING_TOKEN, or
+when it falls into the sampled fraction UNISKOR_PROFILING_SAMPLE_RATE of
+traffic. Without a token clients cannot ask for profiles; only sampling
+works.
+
+Formats (``X-Profile-Format`` header or ``profile_format`` parameter):
+    folded    stack sampling of the event loop thread; one ``a;b;c count``
+              line per stack, for flamegraph.pl, speedscope or inferno.
+              Samples are taken every few milliseconds at best, so use
+              cprofile for very fast requests
+    cprofile  deterministic cProfile stats (.prof), for snakeviz or pstats
+
+Profiles are written to UNISKOR_PROFILING_DIR; the response names the file
+in an ``X-Profile-File`` header. Routes are async and run on the event
+loop, so a profile also contains any request interleaved with this one.
+Profiled requests bypass the response cache to measure the route itself.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qsl
+
+from anyio import CancelScope, to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.getenv("UNISKOR_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILING_TOKEN = os.getenv("UNISKOR_PROFILING_TOKEN") or None
+PROFILING_SAMPLE_RATE = float(os.getenv("UNISKOR_PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = Path(os.getenv("UNISKOR_PROFILING_DIR", Path(tempfile.gettempdir()) / "uniskor-profiles"))
+# Seconds between stack samples in folded mode
+PROFILING_INTERVAL = float(os.getenv("UNISKOR_PROFILING_INTERVAL", "0.001"))
+# Profile files kept on disk; the oldest are removed beyond this
+MAX_PROFILES = int(os.getenv("UNISKOR_PROFILING_MAX_FILES", "200"))
+
+FORMATS = ("folded", "cprofile")
+
+# Scope key telling the caching middlewares to let a request through
+PROFILE_SCOPE_KEY = "uniskor.profile"
+
+
+def _frame_label(frame) -> str:
+    """Flame graph frame name: function plus the last two path components"""
+    code = frame.f_code
+    path = "/".join(Path(code.co_filename).parts[-2:])
+    # ';' separates frames in folded stacks
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Sample one thread's stack from a background thread into folded stacks"""
+
+    def __init__(self, thread_id: int, interval: float = PROFILING_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="uniskor-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _requested(scope, token: Optional[str]) -> Optional[str]:
+    """The requested format if the request carries the profiling token"""
+    if token is None:
+        return None
+    headers = Headers(scope=scope)
+    flag = headers.get("x-profile")
+    fmt = headers.get("x-profile-format")
+    if flag is None and b"profile" in scope["query_string"]:
+        params = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        flag = params.get("profile")
+        fmt = fmt or params.get("profile_format")
+    if flag is None or not hmac.compare_digest(flag.encode("utf-8"), token.encode("utf-8")):
+        return None
+    return fmt if fmt in FORMATS else FORMATS[0]
+
+
+def _profile_path(directory: Path, scope, suffix: str) -> Path:
+    """Unique, sortable file name describing the request"""
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", scope["path"]).strip("-") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return directory / f"{stamp}-{time.perf_counter_ns() % 10**9:09d}-{scope['method']}-{slug[:80]}{suffix}"
+
+
+def _prune(directory: Path, keep: int):
+    """Remove the oldest profiles beyond ``keep``"""
+    profiles = sorted([*directory.glob("*.folded"), *directory.glob("*.prof")], key=lambda path: path.name)
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Profile flagged and sampled requests; added only when profiling is enabled.
+
+    At most one request is profiled at a time, since profilers and the
+    stack sampler observe the whole event loop thread.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        directory: Path = PROFILING_DIR,
+        max_profiles: int = MAX_PROFILES,
+        token: Optional[str] = PROFILING_TOKEN
+    ):
+        self.app = app
+        self.token = token
+        if token is None:
+            logger.warning("UNISKOR_PROFILING_TOKEN is not set; only sampled requests are profiled")
+        self.sample_rate = sample_rate
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        fmt = _requested(scope, self.token)
+        if fmt is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            fmt = FORMATS[0]
+        if fmt is None or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        scope[PROFILE_SCOPE_KEY] = True
+        path = _profile_path(self.directory, scope, ".folded" if fmt == "folded" else ".prof")
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-File"] = path.name
+            await send(message)
+
+        if fmt == "folded":
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if fmt != "folded":
+                # cProfile stops on the thread it profiles
+                profiler.disable()
+            # Joining the sampler and writing the file happen in a worker
+            # thread, shielded so a disconnect cannot leave the sampler running
+            try:
+                with CancelScope(shield=True):
+                    await to_thread.run_sync(self._finish, profiler, path)
+            finally:
+                self._active = False
+
+    def _finish(self, profiler, path: Path):
+        """Stop a stack sampler and write the profile; runs in a worker thread"""
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if isinstance(profiler, StackSampler):
+                path.write_text(profiler.folded(), encoding="utf-8")
+            else:
+                profiler.dump_stats(path)
+            _prune(self.directory, self.max_profiles)
+        except OSError:
+            logger.exception("Could not write profile %s", path)
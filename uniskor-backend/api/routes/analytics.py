@@ -0,0 +1,104 @@
+"""
+Analytics API Routes
+Endpoints for precomputed year-over-year and distribution analytics
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from api.pagination import MAX_LIMIT, RESCORE_FIELDS, fields_query, paginate, parse_fields, parse_list
+from api.versioning import request_snapshot
+from data.service import data_service
+from data.snapshot import Snapshot
+
+router = APIRouter()
+
+@router.get("/year/{year}")
+async def get_year_distribution(year: int, snapshot: Snapshot = Depends(request_snapshot)):
+    """Get score distribution summary and percentile bands for specific year"""
+    try:
+        summary = data_service.get_year_summary(year, percentiles=True, snapshot=snapshot)
+        if summary is None:
+            raise HTTPException(status_code=404, detail=f"Year {year} not available")
+        
+        return summary
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/year/{year}/movers")
+async def get_rank_movers(
+    year: int,
+    limit: int = Query(10, ge=1, le=500),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Get the biggest rank risers and fallers into specific year"""
+    try:
+        movers = data_service.get_rank_movers(year, snapshot)
+        if movers is None:
+            raise HTTPException(status_code=404, detail=f"Year {year} not available")
+        
+        risers = [entry for entry in movers[:limit] if entry['rankChange'] > 0]
+        fallers = [entry for entry in reversed(movers[-limit:]) if entry['rankChange'] < 0]
+        return {
+            "year": year,
+            "risers": risers,
+            "fallers": fallers
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/year/{year}/rescore")
+async def rescore_year(
+    year: int,
+    weights: Optional[str] = Query(None, description="Comma separated weights, one per indicator (default: methodology weights)"),
+    rank_by: str = Query("mean", description="Rank by the weighted mean or median"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(RESCORE_FIELDS),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Re-score and rank specific year under custom indicator weights"""
+    try:
+        try:
+            weight_list = [float(weight) for weight in parse_list(weights)] or None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Weights must be numbers")
+        
+        result = data_service.rescore_year(year, weight_list, rank_by, snapshot)
+        if result is None:
+            raise HTTPException(status_code=404, detail=f"Year {year} not available")
+        
+        page = paginate(result.pop("ranking"), limit, cursor, parse_fields(fields, RESCORE_FIELDS), version=snapshot.version)
+        return {
+            **result,
+            "ranking": page["items"],
+            "total": page["total"],
+            "nextCursor": page["nextCursor"]
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/universities/{slug}")
+async def get_university_changes(slug: str, snapshot: Snapshot = Depends(request_snapshot)):
+    """Get year-over-year score deltas and rank changes for a university"""
+    try:
+        university = data_service.get_university_by_slug(slug, snapshot)
+        if not university:
+            raise HTTPException(status_code=404, detail="University not found")
+        
+        return {
+            'university': university['name'],
+            'slug': slug,
+            'changes': data_service.get_university_changes(slug, snapshot)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
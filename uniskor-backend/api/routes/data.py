@@ -3,65 +3,144 @@ Data API Routes
 Endpoints for data operations
 """
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
+from api.pagination import MAX_LIMIT, RANKING_FIELDS, UNIVERSITY_FIELDS, decode_cursor, fields_query, paginate, parse_fields
+from api.versioning import request_snapshot
 from data.service import data_service
+from data.snapshot import Snapshot
 
 router = APIRouter()
 
+def _ranking_page(
+    year: int,
+    limit: Optional[int],
+    cursor: Optional[str],
+    fields: Optional[str],
+    snapshot: Snapshot
+):
+    """Build a paginated ranking response for a year"""
+    page = paginate(
+        data_service.get_ranking_for_year(year, snapshot),
+        limit,
+        cursor,
+        parse_fields(fields, RANKING_FIELDS),
+        version=snapshot.version
+    )
+    return {
+        "year": year,
+        "ranking": page["items"],
+        "total": page["total"],
+        "nextCursor": page["nextCursor"]
+    }
+
 @router.get("/")
-async def get_data_info():
+async def get_data_info(snapshot: Snapshot = Depends(request_snapshot)):
     """Get data metadata"""
     try:
-        return data_service.get_data_info()
+        return data_service.get_data_info(snapshot)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/years")
-async def get_years():
+async def get_years(snapshot: Snapshot = Depends(request_snapshot)):
     """Get available years"""
     try:
-        return {"years": data_service.get_years()}
+        return {"years": data_service.get_years(snapshot)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/versions")
+async def get_versions():
+    """Get the dated historical snapshots that can be passed as version="""
+    try:
+        return {"versions": data_service.list_versions()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/latest")
-async def get_latest_data():
+async def get_latest_data(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(RANKING_FIELDS),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
     """Get latest year data"""
     try:
-        latest_year = data_service.get_latest_year()
+        latest_year = data_service.get_latest_year(snapshot)
         if not latest_year:
             raise HTTPException(status_code=404, detail="No data available")
         
-        ranking = data_service.get_ranking_for_year(latest_year)
-        return {
-            "year": latest_year,
-            "ranking": ranking
-        }
+        return _ranking_page(latest_year, limit, cursor, fields, snapshot)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/year/{year}")
-async def get_year_data(year: int):
+async def get_year_data(
+    year: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(RANKING_FIELDS),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
     """Get data for specific year"""
     try:
-        years = data_service.get_years()
+        years = data_service.get_years(snapshot)
         if year not in years:
             raise HTTPException(status_code=404, detail=f"Year {year} not available")
         
-        ranking = data_service.get_ranking_for_year(year)
-        return {
-            "year": year,
-            "ranking": ranking
-        }
+        return _ranking_page(year, limit, cursor, fields, snapshot)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/year/{year}/summary")
+async def get_year_summary(year: int, snapshot: Snapshot = Depends(request_snapshot)):
+    """Get score distribution summary for specific year"""
+    try:
+        summary = data_service.get_year_summary(year, snapshot=snapshot)
+        if summary is None:
+            raise HTTPException(status_code=404, detail=f"Year {year} not available")
+        
+        return summary
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/search")
-async def search_universities(q: str = Query(..., min_length=1)):
-    """Search universities"""
+async def search_universities(
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(UNIVERSITY_FIELDS),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Search universities.
+
+    With a limit only the matches up to the end of the page (and one more,
+    to know whether a next page exists) are ranked, so ``total`` is null
+    while further pages remain.
+    """
     try:
-        results = data_service.search_universities(q)
-        return {"results": results}
+        fields = parse_fields(fields, UNIVERSITY_FIELDS)
+        needed = None if limit is None else decode_cursor(cursor, snapshot.version) + limit + 1
+        page = paginate(
+            data_service.search_universities(q, needed, snapshot),
+            limit,
+            cursor,
+            fields,
+            version=snapshot.version
+        )
+        return {
+            "results": page["items"],
+            "total": page["total"] if page["nextCursor"] is None else None,
+            "nextCursor": page["nextCursor"]
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
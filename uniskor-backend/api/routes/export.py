@@ -0,0 +1,76 @@
+"""
+Export API Routes
+Streaming NDJSON/CSV exports of rankings and score series
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Optional, Sequence
+from api.pagination import parse_list
+from api.versioning import request_snapshot
+from data.export import (
+    ALL_YEARS_COLUMNS, FORMATS, MEDIA_TYPES, RANKING_COLUMNS, SERIES_COLUMNS,
+    all_years_rows, encode, ranking_rows, series_rows
+)
+from data.service import data_service
+from data.snapshot import Snapshot
+
+router = APIRouter()
+
+FORMAT_QUERY = Query("ndjson", description="Export format: ndjson or csv")
+
+def _stream(rows: Iterator, columns: Sequence[str], fmt: str, filename: str) -> StreamingResponse:
+    """Send encoded rows chunk by chunk.
+
+    The generators are synchronous, so Starlette pulls each chunk in a
+    worker thread and the event loop keeps serving other requests.
+    """
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {fmt} (allowed: {', '.join(FORMATS)})")
+    return StreamingResponse(
+        encode(rows, columns, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+@router.get("/year/{year}")
+async def export_year_ranking(
+    year: int,
+    format: str = FORMAT_QUERY,
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Stream the ranking of specific year"""
+    try:
+        if year not in snapshot.year_index:
+            raise HTTPException(status_code=404, detail=f"Year {year} not available")
+
+        return _stream(ranking_rows(snapshot, year), RANKING_COLUMNS, format, f"uniskor-{year}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/years")
+async def export_all_rankings(format: str = FORMAT_QUERY, snapshot: Snapshot = Depends(request_snapshot)):
+    """Stream the rankings of all years"""
+    try:
+        return _stream(all_years_rows(snapshot), ALL_YEARS_COLUMNS, format, "uniskor-rankings")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/universities")
+async def export_university_series(
+    format: str = FORMAT_QUERY,
+    slugs: Optional[str] = Query(None, description="Comma separated university slugs (default: all)"),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Stream per-university score and rank series"""
+    try:
+        slug_list = parse_list(slugs) or None
+        return _stream(series_rows(snapshot, slug_list), SERIES_COLUMNS, format, "uniskor-universities")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
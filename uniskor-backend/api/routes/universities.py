@@ -3,57 +3,125 @@ Universities API Routes
 Endpoints for university-specific operations
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from api.pagination import MAX_LIMIT, UNIVERSITY_FIELDS, fields_query, paginate, parse_fields, parse_list
+from api.versioning import request_snapshot
 from data.service import data_service
+from data.snapshot import Snapshot
 
 router = APIRouter()
 
+# Most universities one batch or compare request may ask for
+MAX_BATCH_SIZE = 100
+
+def _parse_selection(slugs: str, years: Optional[str], metrics: Optional[str]):
+    """Parse the slugs/years/metrics query values of batch endpoints"""
+    slug_list = parse_list(slugs)
+    if not slug_list:
+        raise HTTPException(status_code=400, detail="At least one slug is required")
+    if len(slug_list) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} slugs per request")
+    try:
+        year_list = [int(year) for year in parse_list(years)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Years must be integers")
+    return slug_list, year_list or None, parse_list(metrics) or None
+
 @router.get("/")
-async def get_all_universities():
+async def get_all_universities(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = fields_query(UNIVERSITY_FIELDS),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
     """Get all universities"""
     try:
-        universities = data_service.get_universities()
-        return {"universities": universities}
+        page = paginate(
+            data_service.get_universities(snapshot),
+            limit,
+            cursor,
+            parse_fields(fields, UNIVERSITY_FIELDS),
+            version=snapshot.version
+        )
+        return {
+            "universities": page["items"],
+            "total": page["total"],
+            "nextCursor": page["nextCursor"]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/batch")
+async def get_universities_batch(
+    slugs: str = Query(..., description="Comma separated university slugs"),
+    years: Optional[str] = Query(None, description="Comma separated years (default: all)"),
+    metrics: Optional[str] = Query(None, description="Comma separated metrics (default: all)"),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Get score series for several universities at once"""
+    try:
+        slug_list, year_list, metric_list = _parse_selection(slugs, years, metrics)
+        return data_service.get_scores_batch(slug_list, year_list, metric_list, snapshot)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/compare")
+async def compare_universities(
+    slugs: str = Query(..., description="Comma separated university slugs; the first is the reference"),
+    years: Optional[str] = Query(None, description="Comma separated years (default: all)"),
+    metrics: Optional[str] = Query(None, description="Comma separated metrics (default: all)"),
+    snapshot: Snapshot = Depends(request_snapshot)
+):
+    """Compare universities with aligned score matrices and rank differences"""
+    try:
+        slug_list, year_list, metric_list = _parse_selection(slugs, years, metrics)
+        return data_service.compare_universities(slug_list, year_list, metric_list, snapshot)
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{slug}")
-async def get_university(slug: str):
+async def get_university(slug: str, snapshot: Snapshot = Depends(request_snapshot)):
     """Get university by slug"""
     try:
-        university = data_service.get_university_by_slug(slug)
+        university = data_service.get_university_by_slug(slug, snapshot)
         if not university:
             raise HTTPException(status_code=404, detail="University not found")
         
         return university
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{slug}/scores")
-async def get_university_scores(slug: str):
+async def get_university_scores(slug: str, snapshot: Snapshot = Depends(request_snapshot)):
     """Get university scores across all years"""
     try:
-        university = data_service.get_university_by_slug(slug)
+        university = data_service.get_university_by_slug(slug, snapshot)
         if not university:
             raise HTTPException(status_code=404, detail="University not found")
         
-        years = data_service.get_years()
-        scores = []
-        
-        for year in sorted(years):
-            year_scores = university.get('scores', {}).get(str(year))
-            if year_scores:
-                scores.append({
-                    'year': year,
-                    'ortalama': year_scores.get('ortalama'),
-                    'medyan': year_scores.get('medyan')
-                })
+        scores = data_service.get_university_scores(slug, snapshot)
         
         return {
             'university': university['name'],
             'slug': slug,
             'scores': scores
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
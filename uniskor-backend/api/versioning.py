@@ -0,0 +1,30 @@
+"""
+Snapshot Versioning
+The ``version`` query parameter shared by every data route
+"""
+
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from data.service import data_service
+from data.snapshot import Snapshot
+
+
+def request_snapshot(
+    version: Optional[str] = Query(None, description="Dated snapshot to read, e.g. 2024-10-26 (default: current)")
+) -> Snapshot:
+    """Resolve the snapshot a request reads: the dated ``version`` or the current one.
+
+    A plain ``def`` dependency, so FastAPI runs it in a worker thread and
+    loading a historical snapshot never blocks the event loop. Handlers use
+    the returned snapshot for the whole request instead of looking the
+    version up again, which could touch the filesystem or, after an LRU
+    eviction, parse the file on the event loop.
+    """
+    try:
+        return data_service.get_snapshot(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Version {version} not available")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=500, detail=str(e))
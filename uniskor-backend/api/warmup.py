@@ -0,0 +1,124 @@
+"""
+Warm-up
+Pre-renders hot responses in-process before the app takes traffic, and
+again after every snapshot reload
+"""
+
+import asyncio
+import logging
+import time
+from typing import Iterable, List, Optional
+
+from data.service import data_service
+from data.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+# Scope key marking warm-up requests, which the request metrics leave out
+WARMUP_SCOPE_KEY = "uniskor.warmup"
+
+# Responses every client asks for first
+HOT_PATHS = (
+    "/api/data/",
+    "/api/data/years",
+    "/api/data/latest",
+    "/api/universities/",
+)
+
+
+def hot_paths() -> List[str]:
+    """Hot paths for the current snapshot, including every year's ranking"""
+    snapshot = data_service.current_snapshot
+    years = snapshot.years if snapshot is not None else []
+    return list(HOT_PATHS) + [f"/api/data/year/{year}" for year in years]
+
+
+async def _get(app, path: str) -> int:
+    """Send one GET through the full ASGI stack; returns the status code"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"warmup"), (b"accept-encoding", b"br, gzip")],
+        "client": None,
+        "server": None,
+        WARMUP_SCOPE_KEY: True,
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def prerender(app, paths: Iterable[str]) -> int:
+    """Request each path once so its serialized bytes land in the response cache"""
+    rendered = 0
+    for path in paths:
+        status = await _get(app, path)
+        if status == 200:
+            rendered += 1
+        else:
+            logger.warning("Warm-up of %s returned %s", path, status)
+    return rendered
+
+
+class Rewarmer:
+    """Pre-render the hot paths again whenever a new snapshot is published.
+
+    Registered as a DataService reload listener, it does nothing until
+    start() binds it to the running event loop. Listeners may be called
+    from any thread, so the warm-up is scheduled onto that loop; a reload
+    during a warm-up cancels it and starts over on the newer snapshot.
+    ``app.state`` gets the count and duration of the last warm-up.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def __call__(self, snapshot: Snapshot):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._schedule)
+
+    def _schedule(self):
+        if self._loop is None:
+            return
+        if self._task is not None:
+            self._task.cancel()
+        self._task = self._loop.create_task(self._run())
+
+    async def _run(self):
+        started = time.perf_counter()
+        rendered = await prerender(self.app, hot_paths())
+        self.app.state.prerendered = rendered
+        self.app.state.warmup_duration = time.perf_counter() - started
+        logger.info("Re-warmed %d responses in %.3fs", rendered, self.app.state.warmup_duration)
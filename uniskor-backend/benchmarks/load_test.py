@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+API load test and latency benchmark
+Drives the routes in api/routes/ in-process or over HTTP and reports
+throughput, latency percentiles and payload sizes per route
+
+Usage (from uniskor-backend/):
+    # In-process (ASGI) against a synthetic dataset
+    python benchmarks/load_test.py --universities 2000 --years 30 --concurrency 16
+    # Against a local uvicorn started for the run
+    python benchmarks/load_test.py --spawn --workers 4
+    # Against an already running server (uses whatever data it serves)
+    python benchmarks/load_test.py --url http://127.0.0.1:8000
+    # Record a baseline, then fail later runs that regress beyond 20%
+    python benchmarks/load_test.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_test.py --baseline benchmarks/baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks import synthetic_data  # noqa: E402
+
+# (path, extra headers) pairs a route cycles through
+Target = Tuple[str, Dict[str, str]]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def in_process_client(data_dir: Path):
+    """ASGI client for the app, with its lifespan (load + warm-up) running"""
+    os.environ["UNISKOR_DATA_DIR"] = str(data_dir)
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            yield client
+
+
+@asynccontextmanager
+async def spawned_client(data_dir: Path, workers: int, limits: httpx.Limits):
+    """Start uvicorn on a free port, wait for /ready, and yield an HTTP client"""
+    port = _free_port()
+    env = dict(os.environ, UNISKOR_DATA_DIR=str(data_dir))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if (await client.get("/ready")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("uvicorn did not become ready")
+                await asyncio.sleep(0.2)
+            yield client
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@asynccontextmanager
+async def url_client(url: str, limits: httpx.Limits):
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        yield client
+
+
+async def build_targets(client: httpx.AsyncClient, rng: random.Random, sample: int) -> Dict[str, List[Target]]:
+    """Route name -> targets, sampled from the data the server actually serves"""
+    years = (await client.get("/api/data/years")).json()["years"]
+    indicators = (await client.get("/api/data/")).json().get("indicators") or []
+    universities = (await client.get("/api/universities/?fields=slug,name")).json()["universities"]
+    picked = rng.sample(universities, min(sample, len(universities)))
+    slugs = [quote(uni["slug"]) for uni in picked]
+    latest = await client.get("/api/data/latest")
+
+    def pairs(items, size):
+        return [",".join(rng.sample(items, min(size, len(items)))) for _ in range(sample)]
+
+    queries = [uni["name"][:rng.randint(1, 8)].lower() for uni in picked]
+
+    def plain(paths):
+        return [(path, {}) for path in paths]
+
+    def weights():
+        return ",".join(str(rng.randint(1, 9)) for _ in indicators)
+
+    targets = {
+        "info": plain(["/api/data/"]),
+        "years": plain(["/api/data/years"]),
+        "latest": plain(["/api/data/latest"]),
+        "latest_304": [("/api/data/latest", {"If-None-Match": latest.headers.get("etag", "")})],
+        "latest_page": plain(["/api/data/latest?limit=20&fields=slug,name,ortalama"]),
+        "year": plain([f"/api/data/year/{year}" for year in years]),
+        "year_summary": plain([f"/api/data/year/{year}/summary" for year in years]),
+        "search": plain([f"/api/data/search?q={quote(query)}&limit=10" for query in queries]),
+        "universities": plain(["/api/universities/"]),
+        "universities_page": plain(["/api/universities/?limit=20&fields=slug,name"]),
+        "university": plain([f"/api/universities/{slug}" for slug in slugs]),
+        "scores": plain([f"/api/universities/{slug}/scores" for slug in slugs]),
+        "batch": plain([f"/api/universities/batch?slugs={group}" for group in pairs(slugs, 5)]),
+        "compare": plain([f"/api/universities/compare?slugs={group}" for group in pairs(slugs, 5)]),
+        "analytics_year": plain([f"/api/analytics/year/{year}" for year in years]),
+        "movers": plain([f"/api/analytics/year/{year}/movers" for year in years]),
+        "university_analytics": plain([f"/api/analytics/universities/{slug}" for slug in slugs]),
+    }
+    if indicators:
+        targets["rescore"] = plain([
+            f"/api/analytics/year/{rng.choice(years)}/rescore?weights={weights()}&limit=20"
+            for _ in range(sample)
+        ])
+    return targets
+
+
+async def run_route(client: httpx.AsyncClient, targets: List[Target], requests: int, concurrency: int) -> Dict:
+    """Fire ``requests`` requests across ``concurrency`` workers and summarize them"""
+    latencies = np.zeros(requests)
+    sizes = np.zeros(requests)
+    wire_sizes = np.zeros(requests)
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            path, headers = targets[i % len(targets)]
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            body = response.content
+            latencies[i] = time.perf_counter() - started
+            sizes[i] = len(body)
+            wire_sizes[i] = response.num_bytes_downloaded
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "mean": round(float(latencies.mean() * 1000), 3),
+        "bytes": int(sizes.mean()),
+        "wireBytes": int(wire_sizes.mean()),
+    }
+
+
+async def benchmark(client: httpx.AsyncClient, args) -> Dict[str, Dict]:
+    rng = random.Random(args.seed)
+    targets = await build_targets(client, rng, args.sample)
+    selected = args.routes or list(targets)
+    results = {}
+    for name in selected:
+        # Warm each distinct target once (response cache, connection pool)
+        for path, headers in targets[name][:args.sample]:
+            await client.get(path, headers=headers)
+        results[name] = await run_route(client, targets[name], args.requests, args.concurrency)
+        print_row(name, results[name])
+    return results
+
+
+def print_header():
+    print(f"{'route':<22}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'bytes':>10}{'wire':>10}{'errors':>8}")
+
+
+def print_row(name: str, result: Dict):
+    print(f"{name:<22}{result['rps']:>10}{result['p50']:>10}{result['p95']:>10}{result['p99']:>10}"
+          f"{result['bytes']:>10}{result['wireBytes']:>10}{result['errors']:>8}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Regressions against a baseline: p95 slower or throughput lower beyond tolerance"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95']} -> {current['p95']} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: req/s {previous['rps']} -> {current['rps']}")
+    return regressions
+
+
+async def main_async(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with tempfile.TemporaryDirectory(prefix="uniskor-bench-") as tmp:
+        data_dir = Path(args.data_dir) if args.data_dir else Path(tmp)
+        if not args.url and not args.data_dir:
+            data = synthetic_data.generate(args.universities, args.years, seed=args.seed)
+            synthetic_data.write(data, data_dir, binary=args.binary)
+
+        if args.url:
+            mode, context = "url", url_client(args.url, limits)
+        elif args.spawn:
+            mode, context = f"uvicorn x{args.workers}", spawned_client(data_dir, args.workers, limits)
+        else:
+            mode, context = "in-process", in_process_client(data_dir)
+
+        print(f"Mode: {mode}, concurrency {args.concurrency}, {args.requests} requests per route")
+        print_header()
+        async with context as client:
+            results = await benchmark(client, args)
+
+    report = {
+        "meta": {
+            "mode": mode,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "universities": None if args.url or args.data_dir else args.universities,
+            "years": None if args.url or args.data_dir else args.years,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+        },
+        "routes": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to: {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline["routes"], args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="UniSkor API load test")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    target.add_argument("--spawn", action="store_true", help="Start a local uvicorn for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--data-dir", help="Serve this data directory instead of synthetic data")
+    parser.add_argument("--universities", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--binary", action="store_true", help="Also write data.bin for the synthetic data")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route")
+    parser.add_argument("--sample", type=int, default=50, help="Distinct slugs/queries per route")
+    parser.add_argument("--routes", nargs="*", help="Only run these route names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Compare against a saved results file")
+    parser.add_argument("--save-baseline", help="Save this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Synthetic data.json generator for benchmarks
+Produces data in the same schema as scripts/excel_to_json.py at any scale
+
+Usage:
+    python benchmarks/synthetic_data.py --universities 2000 --years 30 --output /tmp/bench
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Make the backend packages (data/) importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+CITIES = [
+    "ANKARA", "İSTANBUL", "İZMİR", "BURSA", "ANTALYA", "KONYA", "ADANA", "GAZİANTEP",
+    "KAYSERİ", "ESKİŞEHİR", "TRABZON", "SAMSUN", "ERZURUM", "MALATYA", "DİYARBAKIR",
+    "SAKARYA", "KOCAELİ", "MUĞLA", "DENİZLİ", "ÇANAKKALE", "BALIKESİR", "SİVAS",
+]
+QUALIFIERS = [
+    "", "TEKNİK", "BİLİM", "SAĞLIK BİLİMLERİ", "KENT", "TİCARET", "MEDİPOL",
+    "YEDİTEPE", "AREL", "OKAN", "ATLAS", "BİLGİ", "GELİŞİM", "ŞEHİR",
+]
+SUFFIXES = ["ÜNİVERSİTESİ", "TEKNİK ÜNİVERSİTESİ", "YÜKSEK TEKNOLOJİ ENSTİTÜSÜ"]
+
+
+def slugify(name: str) -> str:
+    """Same slug rule as slugify_names in scripts/excel_to_json.py"""
+    cleaned = re.sub(r'[^\w\s-]', '', name.strip())
+    return re.sub(r'[-\s]+', '-', cleaned.lower())
+
+
+def university_names(count: int, rng: random.Random):
+    """Unique, realistic-looking Turkish university names"""
+    names = []
+    seen = set()
+    while len(names) < count:
+        parts = [rng.choice(CITIES), rng.choice(QUALIFIERS), rng.choice(SUFFIXES)]
+        name = " ".join(part for part in parts if part)
+        if name in seen:
+            name = f"{name} {len(names) + 1}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def generate(
+    universities: int = 1000,
+    years: int = 20,
+    first_year: int = 2000,
+    missing_rate: float = 0.1,
+    seed: int = 0,
+    indicators: int = 13
+) -> dict:
+    """Generate data.json content with random-walk scores in (0, 1]
+
+    With indicators, each year gets y1..yN efficiencies around the
+    university's level and ortalama/medyan are their weighted mean and
+    median, as in the real data.
+    """
+    import numpy as np
+    from data.rescoring import DEFAULT_WEIGHTS, weighted_scores
+
+    rng = random.Random(seed)
+    year_list = list(range(first_year, first_year + years))
+    indicator_names = [f"y{k}" for k in range(1, indicators + 1)]
+    weights = DEFAULT_WEIGHTS if len(DEFAULT_WEIGHTS) == indicators else [1] * indicators
+
+    entries = []
+    for name in university_names(universities, rng):
+        level = rng.uniform(0.5, 0.95)
+        founded = rng.choice(year_list[: max(1, len(year_list) // 2)])
+        scores = {}
+        for year in year_list:
+            level = min(1.0, max(0.05, level + rng.gauss(0, 0.03)))
+            if year < founded or rng.random() < missing_rate:
+                scores[str(year)] = {'ortalama': None, 'medyan': None}
+                scores[str(year)].update({name: None for name in indicator_names})
+            elif indicators:
+                values = [
+                    None if rng.random() < missing_rate else min(1.0, max(0.01, level + rng.gauss(0, 0.15)))
+                    for _ in indicator_names
+                ]
+                mean, median = weighted_scores(np.array(values, dtype=float), weights)
+                scores[str(year)] = {
+                    'ortalama': None if np.isnan(mean) else float(mean),
+                    'medyan': None if np.isnan(median) else float(median),
+                    **dict(zip(indicator_names, values))
+                }
+            else:
+                scores[str(year)] = {
+                    'ortalama': level,
+                    'medyan': min(1.0, max(0.05, level + rng.gauss(0.02, 0.05)))
+                }
+        entries.append({'slug': slugify(name), 'name': name, 'scores': scores})
+
+    return {
+        'years': year_list,
+        'universities': entries,
+        'indicators': indicator_names,
+        'lastUpdated': datetime.now().strftime('%Y-%m-%d')
+    }
+
+
+def write(data: dict, output_dir: Path, binary: bool = False) -> Path:
+    """Write data.json (and optionally data.bin) into output_dir"""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    json_path = output_dir / "data.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    bin_path = output_dir / "data.bin"
+    if binary:
+        from data.binary import write_binary_snapshot
+        write_binary_snapshot(data, bin_path)
+    elif bin_path.exists():
+        # A stale data.bin would shadow the new data.json
+        bin_path.unlink()
+    return json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic UniSkor data.json")
+    parser.add_argument("--universities", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--first-year", type=int, default=2000)
+    parser.add_argument("--missing-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--indicators", type=int, default=13, help="Per-indicator scores per year (0: none)")
+    parser.add_argument("--binary", action="store_true", help="Also write data.bin")
+    parser.add_argument("--output", type=Path, required=True, help="Output directory")
+    args = parser.parse_args()
+
+    data = generate(args.universities, args.years, args.first_year, args.missing_rate, args.seed, args.indicators)
+    path = write(data, args.output, args.binary)
+    print(f"Synthetic data saved to: {path} ({path.stat().st_size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Snapshot Analytics
+Year-over-year deltas, rank movement and distribution statistics,
+computed in one vectorized pass per data load
+"""
+
+import warnings
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+# Percentile cut points published per year and metric
+PERCENTILES = (10, 25, 50, 75, 90)
+
+# Summary statistics, in output order
+STATISTICS = ('mean', 'median', 'min', 'max', 'std')
+
+
+@dataclass(frozen=True)
+class Analytics:
+    """Precomputed analytics over a snapshot's score matrix.
+
+    Year axes here follow ``years`` (sorted ascending), not the snapshot's
+    file order. Transition ``t`` is the change from ``years[t]`` to
+    ``years[t + 1]``.
+    """
+    years: List[int]
+    year_position: Dict[int, int]
+    deltas: np.ndarray
+    rank_changes: np.ndarray
+    counts: np.ndarray
+    statistics: Dict[str, np.ndarray]
+    percentiles: np.ndarray
+    movers: Dict[int, List[Dict]]
+
+
+def _build_movers(
+    rank_changes: np.ndarray,
+    ranks: np.ndarray,
+    slugs: List[str],
+    names: List[str],
+    years: List[int]
+) -> Dict[int, List[Dict]]:
+    """Universities ranked in both years of each transition, biggest risers first"""
+    movers = {}
+    for t, year in enumerate(years[1:]):
+        change = rank_changes[:, t]
+        rows = np.flatnonzero(~np.isnan(change))
+        rows = rows[np.argsort(-change[rows], kind='stable')]
+        movers[year] = [
+            {
+                'slug': slugs[row],
+                'name': names[row],
+                'rankFrom': int(ranks[row, t]),
+                'rankTo': int(ranks[row, t + 1]),
+                'rankChange': int(change[row])
+            }
+            for row in rows.tolist()
+        ]
+    return movers
+
+
+def build_analytics(
+    scores: np.ndarray,
+    ranks: np.ndarray,
+    years: List[int],
+    slugs: List[str],
+    names: List[str]
+) -> Analytics:
+    """Compute analytics from a (university, year, metric) matrix and its ranks"""
+    order = np.argsort(np.asarray(years, dtype=int), kind='stable')
+    sorted_years = [years[j] for j in order.tolist()]
+    scores = scores[:, order, :]
+    ranks = ranks[:, order]
+
+    # NaN propagates: a delta exists only where both years have a score
+    deltas = scores[:, 1:, :] - scores[:, :-1, :]
+    # Positive means the university moved up the ranking
+    rank_changes = ranks[:, :-1] - ranks[:, 1:]
+
+    counts = np.count_nonzero(~np.isnan(scores), axis=0)
+    if scores.shape[0] == 0:
+        # No universities: reductions have nothing to work on
+        statistics = {name: np.full(scores.shape[1:], np.nan) for name in STATISTICS}
+        percentiles = np.full((len(PERCENTILES),) + scores.shape[1:], np.nan)
+    else:
+        with warnings.catch_warnings():
+            # Years nobody was scored in produce NaN rather than a warning
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            statistics = {
+                'mean': np.nanmean(scores, axis=0),
+                'median': np.nanmedian(scores, axis=0),
+                'min': np.nanmin(scores, axis=0),
+                'max': np.nanmax(scores, axis=0),
+                'std': np.nanstd(scores, axis=0)
+            }
+            percentiles = np.nanpercentile(scores, PERCENTILES, axis=0)
+
+    arrays = (deltas, rank_changes, counts, percentiles, *statistics.values())
+    for array in arrays:
+        array.flags.writeable = False
+
+    return Analytics(
+        years=sorted_years,
+        year_position={year: t for t, year in enumerate(sorted_years)},
+        deltas=deltas,
+        rank_changes=rank_changes,
+        counts=counts,
+        statistics=statistics,
+        percentiles=percentiles,
+        movers=_build_movers(rank_changes, ranks, slugs, names, sorted_years)
+    )
+
@@ -0,0 +1,218 @@
+"""
+Binary Snapshot Format
+Compact columnar data file loaded through mmap with zero-copy array views
+
+Layout (all integers little-endian):
+    magic           8 bytes   b"UNISKOR\\0"
+    format version  uint32
+    header length   uint32
+    header          JSON: years, metrics, indicators, intervals, bootstrap,
+                    shape, lastUpdated, contentHash and the (offset, length)
+                    of each section below
+    sections        8-byte aligned:
+        scores          float64 (university, year, metric), NaN for missing
+        present         uint8 (university, year)
+        string_offsets  uint32 (2 * universities + 1) into strings
+        strings         UTF-8 slugs followed by names
+        indicators      float64 (university, year, indicator), NaN for missing
+        intervals       float64 (university, year, interval), NaN for missing
+
+Version 1 files have no indicators section and load without indicators;
+version 1 and 2 files have no intervals section and load without intervals.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from data.snapshot import (
+    METRICS, Snapshot, build_indicator_matrix, build_score_matrix, build_snapshot_from_matrix
+)
+
+MAGIC = b"UNISKOR\0"
+FORMAT_VERSION = 3
+READABLE_VERSIONS = (1, 2, 3)
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 8
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _sections(data: Dict):
+    """The score matrix and the encoded sections of data.json content"""
+    years = data.get('years', [])
+    universities = data.get('universities', [])
+    indicators = data.get('indicators', [])
+    intervals = data.get('intervals', [])
+    scores, present = build_score_matrix(universities, years)
+    indicator_scores = build_indicator_matrix(universities, years, indicators)
+    interval_scores = build_indicator_matrix(universities, years, intervals)
+
+    strings = [uni.get('slug') or '' for uni in universities] + [uni.get('name') or '' for uni in universities]
+    encoded = [value.encode('utf-8') for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    string_offsets[1:] = np.cumsum([len(value) for value in encoded])
+
+    blobs = {
+        'scores': np.ascontiguousarray(scores, dtype='<f8').tobytes(),
+        'present': np.ascontiguousarray(present, dtype='u1').tobytes(),
+        'string_offsets': string_offsets.tobytes(),
+        'strings': b''.join(encoded),
+        'indicators': np.ascontiguousarray(indicator_scores, dtype='<f8').tobytes(),
+        'intervals': np.ascontiguousarray(interval_scores, dtype='<f8').tobytes(),
+    }
+    return scores, blobs
+
+
+def _hash_sections(data: Dict, blobs: Dict[str, bytes]) -> str:
+    content_hash = hashlib.sha256()
+    for blob in blobs.values():
+        content_hash.update(blob)
+    labels = [data.get('years', []), list(METRICS), data.get('indicators', []), data.get('lastUpdated')]
+    if data.get('intervals'):
+        # Appended only when present, so files without intervals keep their hash
+        labels += [data['intervals'], data.get('bootstrap')]
+    content_hash.update(json.dumps(labels).encode('utf-8'))
+    return content_hash.hexdigest()
+
+
+def content_hash(data: Dict) -> str:
+    """Canonical hash of data.json content, the snapshot version.
+
+    It covers the decoded values rather than file bytes, so data.json and
+    data.bin holding the same data share one version (and ETags) whichever
+    of them is loaded. The converter stores it in both files as contentHash.
+    """
+    _, blobs = _sections(data)
+    return _hash_sections(data, blobs)
+
+
+def write_binary_snapshot(data: Dict, path) -> Path:
+    """Write data.json content as a binary snapshot.
+
+    The file is written next to its destination and moved into place with
+    os.replace, so readers that have the old file mapped are never exposed
+    to a partially written one.
+    """
+    path = Path(path)
+    scores, blobs = _sections(data)
+
+    header = {
+        'years': data.get('years', []),
+        'metrics': list(METRICS),
+        'indicators': data.get('indicators', []),
+        'intervals': data.get('intervals', []),
+        'bootstrap': data.get('bootstrap'),
+        'shape': list(scores.shape),
+        'lastUpdated': data.get('lastUpdated'),
+        'contentHash': _hash_sections(data, blobs),
+        'sections': {},
+    }
+    # Section offsets depend on the header length, which depends on the
+    # offsets' digits; lay out until the header size stops changing
+    header_bytes = b''
+    while True:
+        offset = _align(_PREAMBLE.size + len(header_bytes))
+        for name, blob in blobs.items():
+            header['sections'][name] = [offset, len(blob)]
+            offset = _align(offset + len(blob))
+        encoded_header = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        settled = len(encoded_header) == len(header_bytes)
+        header_bytes = encoded_header
+        if settled:
+            break
+
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, blob in blobs.items():
+            f.write(b'\0' * (header['sections'][name][0] - f.tell()))
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(buffer) -> Dict:
+    """Validate the preamble and decode the JSON header"""
+    if len(buffer) < _PREAMBLE.size:
+        raise ValueError("Binary snapshot is truncated")
+    magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a UniSkor binary snapshot")
+    if version not in READABLE_VERSIONS:
+        raise ValueError(f"Unsupported binary snapshot version: {version}")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]).decode('utf-8'))
+    if header['metrics'] != list(METRICS):
+        raise ValueError(f"Unsupported metrics in binary snapshot: {header['metrics']}")
+    return header
+
+
+def load_binary_snapshot(path, last_modified: Optional[float] = None) -> Snapshot:
+    """Map a binary snapshot and build a Snapshot on zero-copy array views.
+
+    The mapping stays open for as long as the arrays referencing it are
+    alive, i.e. until the snapshot is replaced and garbage collected.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header = _read_header(buffer)
+    sections = header['sections']
+    if max(offset + length for offset, length in sections.values()) > len(buffer):
+        raise ValueError("Binary snapshot is truncated")
+    universities, year_count, metric_count = header['shape']
+
+    def view(name: str, dtype: str) -> np.ndarray:
+        offset, length = sections[name]
+        return np.frombuffer(buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+    scores = view('scores', '<f8').reshape(universities, year_count, metric_count)
+    present = view('present', 'u1').reshape(universities, year_count).view(bool)
+    string_offsets = view('string_offsets', '<u4').tolist()
+    offset, length = sections['strings']
+    raw = bytes(buffer[offset:offset + length])
+    values = [raw[start:end].decode('utf-8') for start, end in zip(string_offsets, string_offsets[1:])]
+
+    indicators = header.get('indicators', [])
+    indicator_scores = None
+    if 'indicators' in sections:
+        indicator_scores = view('indicators', '<f8').reshape(universities, year_count, len(indicators))
+    intervals = header.get('intervals', [])
+    interval_scores = None
+    if 'intervals' in sections:
+        interval_scores = view('intervals', '<f8').reshape(universities, year_count, len(intervals))
+
+    return build_snapshot_from_matrix(
+        slugs=values[:universities],
+        names=values[universities:],
+        years=header['years'],
+        scores=scores,
+        present=present,
+        indicators=indicators,
+        indicator_scores=indicator_scores,
+        intervals=intervals,
+        interval_scores=interval_scores,
+        bootstrap=header.get('bootstrap'),
+        last_updated=header.get('lastUpdated'),
+        last_modified=last_modified,
+        version=header['contentHash']
+    )
+
+
+if __name__ == "__main__":
+    # python -m data.binary [data.json] [data.bin]
+    source = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "data.json"
+    target = Path(sys.argv[2]) if len(sys.argv) > 2 else source.with_suffix('.bin')
+    with open(source, 'r', encoding='utf-8') as f:
+        written = write_binary_snapshot(json.load(f), target)
+    print(f"Binary snapshot saved to: {written} ({written.stat().st_size:,} bytes)")
@@ -0,0 +1,133 @@
+"""
+Data Export
+Lazy row generators over a snapshot and chunked NDJSON/CSV encoders
+
+Generators walk the snapshot in fixed-size blocks and the encoders emit one
+bytes chunk per block, so memory use does not grow with the export size.
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from data.snapshot import METRICS, Snapshot, nan_to_none
+
+# Columns of each export, in output order
+RANKING_COLUMNS = ('rank', 'slug', 'name') + METRICS
+ALL_YEARS_COLUMNS = ('year',) + RANKING_COLUMNS
+SERIES_COLUMNS = ('slug', 'name', 'year') + METRICS + ('rank',)
+
+FORMATS = ('ndjson', 'csv')
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Rows per generated block and per emitted chunk
+CHUNK_ROWS = 500
+
+
+def ranking_rows(snapshot: Snapshot, year: int) -> Iterator[Dict]:
+    """Ranking entries of a year, best first.
+
+    Read from the rank and score arrays CHUNK_ROWS universities at a time,
+    so the snapshot's cached ranking lists are neither used nor filled.
+    """
+    j = snapshot.year_index.get(year)
+    if j is None:
+        return
+    ranks = snapshot.ranks[:, j]
+    order = np.flatnonzero(~np.isnan(ranks))
+    order = order[np.argsort(ranks[order], kind='stable')]
+
+    for start in range(0, len(order), CHUNK_ROWS):
+        block = order[start:start + CHUNK_ROWS]
+        rank = ranks[block].astype(int).tolist()
+        series = [nan_to_none(snapshot.scores[block, j, k]) for k in range(len(METRICS))]
+        for n, row in enumerate(block.tolist()):
+            entry = {'rank': rank[n], 'slug': snapshot.slugs[row], 'name': snapshot.names[row]}
+            entry.update({metric: series[k][n] for k, metric in enumerate(METRICS)})
+            yield entry
+
+
+def all_years_rows(snapshot: Snapshot) -> Iterator[Dict]:
+    """Ranking entries of every year, oldest year first"""
+    for year in sorted(snapshot.years):
+        for row in ranking_rows(snapshot, year):
+            yield {'year': year, **row}
+
+
+def series_rows(snapshot: Snapshot, slugs: Optional[List[str]] = None) -> Iterator[Dict]:
+    """Per-university score and rank series, one row per scored year.
+
+    Universities follow ``slugs`` (unknown ones are skipped) or file order;
+    the matrix is read CHUNK_ROWS universities at a time.
+    """
+    if slugs is None:
+        rows = np.arange(len(snapshot.slugs))
+    else:
+        rows = np.array([snapshot.slug_index[slug] for slug in slugs if slug in snapshot.slug_index], dtype=int)
+    columns = np.argsort(np.asarray(snapshot.years), kind='stable')
+    years = [snapshot.years[j] for j in columns.tolist()]
+
+    for start in range(0, len(rows), CHUNK_ROWS):
+        block = rows[start:start + CHUNK_ROWS]
+        present = snapshot.present[np.ix_(block, columns)].tolist()
+        values = snapshot.scores[np.ix_(block, columns)]
+        ranks = snapshot.ranks[np.ix_(block, columns)]
+        for n, row in enumerate(block.tolist()):
+            series = [nan_to_none(values[n, :, k]) for k in range(len(METRICS))]
+            rank = nan_to_none(ranks[n])
+            for t, year in enumerate(years):
+                if not present[n][t]:
+                    continue
+                entry = {'slug': snapshot.slugs[row], 'name': snapshot.names[row], 'year': year}
+                entry.update({metric: series[k][t] for k, metric in enumerate(METRICS)})
+                entry['rank'] = None if rank[t] is None else int(rank[t])
+                yield entry
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) >= size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def encode_ndjson(rows: Iterable[Dict], chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """One JSON object per line"""
+    for block in _chunks(rows, chunk_rows):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in block).encode('utf-8')
+
+
+def encode_csv(rows: Iterable[Dict], columns: Sequence[str], chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    """CSV with a header row; missing values are empty fields"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    header = buffer.getvalue()
+    emitted_header = False
+    for block in _chunks(rows, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        if not emitted_header:
+            buffer.write(header)
+            emitted_header = True
+        writer.writerows([['' if row[column] is None else row[column] for column in columns] for row in block])
+        yield buffer.getvalue().encode('utf-8')
+    if not emitted_header:
+        yield header.encode('utf-8')
+
+
+def encode(rows: Iterable[Dict], columns: Sequence[str], fmt: str) -> Iterator[bytes]:
+    """Encode rows in an export format"""
+    if fmt == 'csv':
+        return encode_csv(rows, columns)
+    return encode_ndjson(rows)
@@ -0,0 +1,87 @@
+"""
+Pipeline Interchange
+Per-year Parquet datasets passed between the scraper, the SFA analysis and
+the JSON converter
+
+A dataset is a directory with one file per year:
+    <dataset>/<year>.parquet
+
+The first column is the university name (string), every other column is
+float64, so stages read typed columns back without re-parsing workbooks.
+Excel copies are optional side outputs for people reading the data.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional
+
+import pandas as pd
+
+YEAR_FILE = re.compile(r"^(\d{4})\.parquet$")
+
+
+def year_path(directory: Path, year: int) -> Path:
+    return Path(directory) / f"{year}.parquet"
+
+
+def list_years(directory: Path):
+    """Years present in a dataset, ascending"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        int(match.group(1))
+        for match in (YEAR_FILE.match(path.name) for path in directory.iterdir())
+        if match
+    )
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Name column as string, every other column as float64"""
+    label = df.columns[0]
+    typed = df.copy()
+    typed[label] = typed[label].map(lambda value: None if pd.isna(value) else str(value))
+    for column in typed.columns[1:]:
+        typed[column] = pd.to_numeric(typed[column], errors='coerce').astype('float64')
+    return typed.reset_index(drop=True)
+
+
+def write_dataset(
+    frames: Mapping[int, pd.DataFrame],
+    directory: Path,
+    excel_path: Optional[Path] = None
+) -> Path:
+    """Write one Parquet file per year; years no longer present are removed"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    typed = {int(year): typed_frame(df) for year, df in frames.items() if not df.empty}
+
+    for year, df in typed.items():
+        path = year_path(directory, year)
+        tmp_path = path.with_name(path.name + '.tmp')
+        df.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, path)
+    for year in list_years(directory):
+        if year not in typed:
+            year_path(directory, year).unlink()
+
+    if excel_path is not None:
+        with pd.ExcelWriter(excel_path) as writer:
+            for year, df in sorted(typed.items()):
+                df.to_excel(writer, sheet_name=str(year), engine='openpyxl', index=False)
+    return directory
+
+
+def read_dataset(directory: Path, years: Optional[Iterable[int]] = None) -> Dict[int, pd.DataFrame]:
+    """Frames of a dataset by year, ascending"""
+    selected = list_years(directory) if years is None else sorted(years)
+    return {year: pd.read_parquet(year_path(directory, year), engine='pyarrow') for year in selected}
+
+
+def read_tables(path: Path) -> Dict[str, pd.DataFrame]:
+    """Sheets by name from a Parquet dataset directory or an Excel workbook"""
+    path = Path(path)
+    if path.is_dir():
+        return {str(year): df for year, df in read_dataset(path).items()}
+    return pd.read_excel(path, sheet_name=None)
@@ -0,0 +1,121 @@
+"""
+Custom-Weight Rescoring
+Weighted mean and weighted median of the per-indicator efficiencies under
+user-supplied weights, for every university and year in one batched pass
+
+This is the estimator of weighted.avg / weighted.median in
+Etkinlik_skorlari.R, quirks included, shared with scripts/sfa.py: weights
+are renormalized over each university's observed indicators; the median is
+the first sorted value whose cumulative weight reaches one half, averaged
+with the next value when an even number of indicators is observed.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+# Weights Etkinlik_skorlari.R combines y1..y13 with
+DEFAULT_WEIGHTS = (3, 7, 7, 7, 6, 6, 6, 6, 6, 6, 6, 4, 5)
+
+# Weight vectors whose results are kept per snapshot
+RESCORE_CACHE_SIZE = int(os.getenv("UNISKOR_RESCORE_CACHE_SIZE", "64"))
+
+
+def _r_sum(values: np.ndarray) -> np.ndarray:
+    """Sum over the last axis like R's sum(): sequential in long double,
+    rounded to double once"""
+    return np.cumsum(values, axis=-1, dtype=np.longdouble)[..., -1].astype(float)
+
+
+# DEFAULT_WEIGHTS scaled to one exactly as the script does (w/100, then w/sum(w))
+_PERCENTAGES = np.asarray(DEFAULT_WEIGHTS, dtype=float) / 100
+METHODOLOGY_WEIGHTS = tuple((_PERCENTAGES / _r_sum(_PERCENTAGES)).tolist())
+
+
+def normalize_weights(weights: Sequence[float], count: int) -> Tuple[float, ...]:
+    """Validate a weight vector and scale it to sum to one"""
+    if len(weights) != count:
+        raise ValueError(f"Expected {count} weights, got {len(weights)}")
+    array = np.asarray(weights, dtype=float)
+    if not np.all(np.isfinite(array)) or np.any(array < 0):
+        raise ValueError("Weights must be finite and non-negative")
+    total = array.sum()
+    if total <= 0:
+        raise ValueError("At least one weight must be positive")
+    return tuple((array / total).tolist())
+
+
+def weighted_scores(values: np.ndarray, weights: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """weighted.avg and weighted.median of Etkinlik_skorlari.R over the last
+    axis of ``values`` (..., indicator), ignoring NaN.
+
+    Both results have the leading shape and are NaN where no indicator with
+    positive weight is observed. The R quirks are kept so that
+    METHODOLOGY_WEIGHTS reproduce the published scores bit for bit: the
+    mean recycles the observed values over all weights (exact only for
+    complete rows), the median of an even count takes its upper neighbour
+    from the unsorted row, and sums and cumulative sums accumulate in long
+    double as R's do, which decides weights landing exactly on one half.
+    """
+    weights = np.asarray(weights, dtype=float)
+    observed = ~np.isnan(values)
+    count = observed.sum(axis=-1)
+    total = _r_sum(np.where(observed, weights, 0.0))
+    valid = total > 0
+    safe_total = np.where(valid, total, 1.0)[..., None]
+    w = np.where(observed, weights / safe_total, 0.0)
+
+    # data0 * w in R: observed values in row order, recycled over all weights
+    compact = np.take_along_axis(values, np.argsort(~observed, axis=-1, kind='stable'), axis=-1)
+    position = np.arange(values.shape[-1]) % np.maximum(count, 1)[..., None]
+    recycled = np.take_along_axis(compact, position, axis=-1)
+    mean = _r_sum(np.where(observed, recycled * w, 0.0))
+
+    # Missing values sort last (as +inf) and carry no weight
+    order = np.argsort(np.where(observed, values, np.inf), axis=-1, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=-1)
+    cumulative = np.cumsum(np.take_along_axis(w, order, axis=-1), axis=-1, dtype=np.longdouble).astype(float)
+    index = np.argmax(cumulative >= 0.5, axis=-1)[..., None]
+    lower = np.take_along_axis(sorted_values, index, axis=-1)[..., 0]
+    # data[ind0 + 1] in R: the unsorted row, NA past its end
+    upper_index = np.minimum(index + 1, values.shape[-1] - 1)
+    upper = np.where(
+        index[..., 0] + 1 < values.shape[-1],
+        np.take_along_axis(values, upper_index, axis=-1)[..., 0],
+        np.nan
+    )
+    median = np.where(count % 2 == 0, (lower + upper) / 2, lower)
+
+    return np.where(valid, mean, np.nan), np.where(valid, median, np.nan)
+
+
+def rank_descending(column: np.ndarray) -> np.ndarray:
+    """Rows with a score, best first; ties keep file order like the published rankings"""
+    order = np.flatnonzero(~np.isnan(column))
+    return order[np.argsort(-column[order], kind='stable')]
+
+
+class RescoreCache:
+    """Size-bounded LRU of (mean, median) arrays keyed by snapshot and weights"""
+
+    def __init__(self, max_entries: int = RESCORE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: Tuple[np.ndarray, np.ndarray]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,132 @@
+"""
+University Search Index
+Turkish-aware normalization, trigram and prefix indexes built once per data load
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from typing import Dict, List, Optional, Set
+
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+# Turkish casing: dotted/dotless i do not follow the default Unicode mapping
+_TURKISH_CASE = str.maketrans({'İ': 'i', 'I': 'ı'})
+# Letters NFKD does not decompose into a base letter plus a combining mark
+_ASCII_FOLD = str.maketrans({'ı': 'i', 'ß': 'ss', 'æ': 'ae', 'ø': 'o', 'đ': 'd', 'ł': 'l'})
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize(text: str) -> str:
+    """Turkish casefold and strip accents, so 'İSTANBUL', 'istanbul' and 'ıstanbul' compare equal"""
+    text = text.translate(_TURKISH_CASE).lower()
+    # Drop combining marks: cedillas, breves, umlauts and the stray dot that
+    # str.lower() leaves after 'i' (the 'i̇' seen in data.json slugs)
+    text = ''.join(
+        char for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+    text = text.translate(_ASCII_FOLD)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def _trigrams(key: str) -> Set[str]:
+    """Word-padded trigrams of a normalized string"""
+    grams = set()
+    for token in key.split():
+        padded = f'  {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    """Ranked name search over a fixed list of names.
+
+    Match tiers, best first: exact name, name prefix, every query word
+    prefixing a word of the name (autocomplete), substring, and finally
+    trigram similarity for typos. Within a tier, shorter names rank first.
+    """
+
+    def __init__(self, names: List[str]):
+        self._keys = [normalize(name or '') for name in names]
+
+        postings: Dict[str, List[int]] = {}
+        for doc, key in enumerate(self._keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(doc)
+        self._postings = postings
+
+        # Sorted (token, doc) pairs; prefix lookups are a bisect into this list
+        pairs = sorted({(token, doc) for doc, key in enumerate(self._keys) for token in key.split()})
+        self._tokens = [token for token, _ in pairs]
+        self._token_docs = [doc for _, doc in pairs]
+
+    @property
+    def size(self) -> int:
+        """Number of distinct trigrams plus prefix entries"""
+        return len(self._postings) + len(self._tokens)
+
+    def _prefix_docs(self, prefix: str) -> Set[int]:
+        """Docs with a word starting with ``prefix``"""
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + '\uffff', lo=start)
+        return set(self._token_docs[start:end])
+
+    def _substring_docs(self, query: str) -> Set[int]:
+        """Docs whose normalized name contains ``query``"""
+        grams = _trigrams(query)
+        # Only inner trigrams are required: the query may start or end mid-word
+        inner = [gram for gram in grams if ' ' not in gram]
+        if inner:
+            candidates = set.intersection(*(set(self._postings.get(gram, ())) for gram in inner))
+        else:
+            candidates = range(len(self._keys))
+        return {doc for doc in candidates if query in self._keys[doc]}
+
+    def _fuzzy_docs(self, query: str) -> Dict[int, float]:
+        """Docs sharing enough trigrams with ``query``, with their similarity"""
+        grams = _trigrams(query)
+        if not grams:
+            return {}
+        hits = Counter()
+        for gram in grams:
+            hits.update(self._postings.get(gram, ()))
+        return {
+            doc: count / len(grams)
+            for doc, count in hits.items()
+            if count / len(grams) >= FUZZY_THRESHOLD
+        }
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Return doc positions matching ``query``, best match first"""
+        query = normalize(query)
+        if not query:
+            return []
+
+        words = query.split()
+        prefix_docs = set.intersection(*(self._prefix_docs(word) for word in words))
+        substring_docs = self._substring_docs(query)
+
+        ranked = {}
+        for doc in prefix_docs | substring_docs:
+            key = self._keys[doc]
+            if key == query:
+                tier = 0
+            elif key.startswith(query):
+                tier = 1
+            elif doc in prefix_docs:
+                tier = 2
+            else:
+                tier = 3
+            ranked[doc] = (tier, 0.0, len(key), doc)
+
+        # Typo tolerance only matters when the exact tiers leave room
+        if limit is None or len(ranked) < limit:
+            for doc, similarity in self._fuzzy_docs(query).items():
+                if doc not in ranked:
+                    ranked[doc] = (4, -similarity, len(self._keys[doc]), doc)
+
+        ordered = sorted(ranked, key=ranked.__getitem__)
+        return ordered if limit is None else ordered[:limit]
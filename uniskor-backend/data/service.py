@@ -3,113 +3,467 @@ Data Service Layer
 Handles data loading, processing, and caching
 """
 
-import json
+import logging
 import os
+import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from datetime import datetime
 
+import numpy as np
+
+from data.analytics import PERCENTILES, STATISTICS
+from data.rescoring import METHODOLOGY_WEIGHTS, RescoreCache, normalize_weights, rank_descending, weighted_scores
+from data.shared import SharedSnapshotStore
+from data.snapshot import METRICS, Snapshot, nan_to_none
+from data.versions import SnapshotVersions, read_snapshot_file
+
+logger = logging.getLogger(__name__)
+
+# Scores a custom-weight ranking can be ordered by
+RESCORE_RANK_BY = ('mean', 'median')
+
 class DataService:
     def __init__(self):
-        self.data_dir = Path(__file__).parent
+        # UNISKOR_DATA_DIR points the API at another data.json/data.bin (e.g. benchmarks)
+        self.data_dir = Path(os.getenv("UNISKOR_DATA_DIR", Path(__file__).parent))
         self.json_path = self.data_dir / "data.json"
-        self._cache = None
-        self._last_modified = None
+        self.bin_path = self.data_dir / "data.bin"
+        self._snapshot: Optional[Snapshot] = None
+        self._reload_listeners: List[Callable[[Snapshot], None]] = []
+        self.load_duration: Optional[float] = None
+        # Reload statistics, reported by /metrics
+        self.reload_count = 0
+        self.reload_failures = 0
+        self.total_load_duration = 0.0
+        self.loaded_at: Optional[float] = None
+        # With several uvicorn workers, point this at a directory they share
+        shared_dir = os.getenv("UNISKOR_SHARED_SNAPSHOT_DIR")
+        self.shared_store = SharedSnapshotStore(Path(shared_dir)) if shared_dir else None
+        # Dated historical snapshots, loaded on demand into a bounded LRU
+        self.versions = SnapshotVersions(Path(os.getenv("UNISKOR_VERSIONS_DIR", self.data_dir / "versions")))
+        self.rescore_cache = RescoreCache()
+        # Set while data.json and data.bin are both gone; reported by /ready
+        self.source_missing = False
+    
+    def add_reload_listener(self, listener: Callable[[Snapshot], None]):
+        """Register a callback run with each newly swapped-in snapshot"""
+        self._reload_listeners.append(listener)
+    
+    def load_data(self, version: Optional[str] = None) -> Dict:
+        """Get the raw data of the current snapshot"""
+        return self.get_snapshot(version).data
+    
+    @property
+    def current_snapshot(self) -> Optional[Snapshot]:
+        """The published snapshot, or None before the first load; never loads"""
+        return self._snapshot
+    
+    def get_snapshot(self, version: Optional[str] = None) -> Snapshot:
+        """Get the current snapshot, or a dated historical one.
+        
+        Reloads are driven by the background watcher (data/watcher.py), so
+        this only touches the filesystem when nothing has been loaded yet,
+        e.g. when the service is used outside the app lifespan. Historical
+        versions come from the versions LRU; unknown ones raise KeyError.
+        """
+        if version is not None:
+            return self.versions.get(version)
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._load_from_file()
+        return snapshot
+    
+    def _resolve(self, snapshot: Optional[Snapshot]) -> Snapshot:
+        """The snapshot a request resolved up front (see api/versioning.py), or the current one"""
+        return snapshot if snapshot is not None else self.get_snapshot()
+    
+    def _source_path(self) -> Path:
+        """Pick the file to load: data.bin unless it is missing or older than data.json"""
+        if self.bin_path.exists():
+            if not self.json_path.exists():
+                return self.bin_path
+            if self.bin_path.stat().st_mtime >= self.json_path.stat().st_mtime:
+                return self.bin_path
+        return self.json_path
+    
+    def watch_targets(self):
+        """Directories and file names whose changes should trigger a reload check"""
+        directories = [self.data_dir]
+        names = {self.json_path.name, self.bin_path.name}
+        if self.shared_store is not None:
+            directories.append(self.shared_store.directory)
+            names.add(self.shared_store.pointer_path.name)
+        return directories, names
     
-    def load_data(self) -> Dict:
-        """Load data from JSON file with caching"""
-        if self._should_reload():
-            self._load_from_file()
-        return self._cache
+    def _source_fingerprint(self):
+        """Identify the data the next reload would read: source mtime and shared generation"""
+        generation = self.shared_store.current_generation() if self.shared_store is not None else None
+        return self._source_path().stat().st_mtime, generation
     
     def _should_reload(self) -> bool:
         """Check if data should be reloaded"""
-        if self._cache is None:
+        if self._snapshot is None:
             return True
         
-        if not self.json_path.exists():
-            return True
+        # Another worker may have published a newer shared generation
+        if self.shared_store is not None:
+            if self.shared_store.current_generation() != self._snapshot.generation:
+                return True
+        
+        source = self._source_path()
+        if not source.exists():
+            # Nothing to reload from; keep serving the loaded snapshot, but say so
+            if not self.source_missing:
+                logger.warning("Data file not found: %s; serving the loaded snapshot", self.json_path)
+            self.source_missing = True
+            return False
+        self.source_missing = False
         
-        current_mtime = self.json_path.stat().st_mtime
-        if self._last_modified != current_mtime:
+        current_mtime = source.stat().st_mtime
+        if self._snapshot.last_modified != current_mtime:
             return True
         
         return False
     
-    def _load_from_file(self):
-        """Load data from JSON file"""
-        if not self.json_path.exists():
-            raise FileNotFoundError(f"Data file not found: {self.json_path}")
+    def _read_snapshot(self) -> Snapshot:
+        """Load data.bin (memory-mapped) or data.json and build a snapshot without publishing it"""
+        source = self._source_path()
+        if self.shared_store is not None:
+            return self._read_shared_snapshot(source)
         
-        with open(self.json_path, 'r', encoding='utf-8') as f:
-            self._cache = json.load(f)
+        if not source.exists():
+            raise FileNotFoundError(f"Data file not found: {self.json_path}")
         
-        self._last_modified = self.json_path.stat().st_mtime
+        return read_snapshot_file(source)
     
-    def get_years(self) -> List[int]:
+    def _read_shared_snapshot(self, source: Path) -> Snapshot:
+        """Map the current shared generation, publishing one first if the source changed"""
+        if source.exists():
+            pointer = self.shared_store.publish_if_stale(source)
+        else:
+            pointer = self.shared_store.read_pointer()
+            if pointer is None:
+                raise FileNotFoundError(f"Data file not found: {self.json_path}")
+        return self.shared_store.load(pointer)
+    
+    def _publish(self, snapshot: Snapshot, load_duration: Optional[float] = None):
+        """Swap in a new snapshot and notify reload listeners"""
+        # Single reference assignment: readers see the old or new snapshot, never a mix
+        self._snapshot = snapshot
+        self.load_duration = load_duration
+        self.reload_count += 1
+        self.total_load_duration += load_duration or 0.0
+        self.loaded_at = time.time()
+        for listener in self._reload_listeners:
+            listener(snapshot)
+    
+    def _load_from_file(self) -> Snapshot:
+        """Load data from JSON file and swap in a freshly built snapshot"""
+        started = time.perf_counter()
+        snapshot = self._read_snapshot()
+        self._publish(snapshot, time.perf_counter() - started)
+        return snapshot
+    
+    def get_reload_stats(self) -> Dict:
+        """Get reload counters and the age of the published snapshot"""
+        snapshot = self._snapshot
+        now = time.time()
+        return {
+            'reloads': self.reload_count,
+            'failures': self.reload_failures,
+            'lastDuration': self.load_duration,
+            'totalDuration': self.total_load_duration,
+            'snapshotAge': now - snapshot.last_modified if snapshot and snapshot.last_modified else None,
+            'loadedAge': now - self.loaded_at if self.loaded_at is not None else None,
+            'generation': snapshot.generation if snapshot else None
+        }
+    
+    def list_versions(self) -> List[Dict]:
+        """Get the dated historical snapshots available"""
+        return self.versions.list()
+    
+    def has_version(self, version: str) -> bool:
+        """Check whether a dated historical snapshot exists"""
+        return self.versions.exists(version)
+    
+    def get_index_sizes(self) -> Dict:
+        """Get the sizes of the current snapshot's precomputed structures"""
+        snapshot = self.get_snapshot()
+        return {
+            'universities': len(snapshot.universities),
+            'years': len(snapshot.years),
+            'slugIndex': len(snapshot.slug_index),
+            'rankingEntries': int(np.count_nonzero(~np.isnan(snapshot.ranks))),
+            'searchIndex': snapshot.search_index.size,
+            'scoreMatrixBytes': int(snapshot.scores.nbytes)
+        }
+    
+    def get_years(self, snapshot: Optional[Snapshot] = None) -> List[int]:
         """Get available years"""
-        data = self.load_data()
-        return data.get('years', [])
+        return self._resolve(snapshot).years
     
-    def get_universities(self) -> List[Dict]:
+    def get_universities(self, snapshot: Optional[Snapshot] = None) -> List[Dict]:
         """Get all universities"""
-        data = self.load_data()
-        return data.get('universities', [])
+        return self._resolve(snapshot).universities
     
-    def get_university_by_slug(self, slug: str) -> Optional[Dict]:
+    def get_university_by_slug(self, slug: str, snapshot: Optional[Snapshot] = None) -> Optional[Dict]:
         """Get university by slug"""
-        universities = self.get_universities()
-        for uni in universities:
-            if uni.get('slug') == slug:
-                return uni
-        return None
+        return self._resolve(snapshot).universities_by_slug.get(slug)
     
-    def get_ranking_for_year(self, year: int) -> List[Dict]:
+    def get_ranking_for_year(self, year: int, snapshot: Optional[Snapshot] = None) -> List[Dict]:
         """Get ranking for specific year"""
-        universities = self.get_universities()
-        year_key = str(year)
-        
-        ranking = []
-        for uni in universities:
-            scores = uni.get('scores', {}).get(year_key)
-            if scores and scores.get('ortalama') is not None:
-                ranking.append({
-                    'slug': uni['slug'],
-                    'name': uni['name'],
-                    'ortalama': scores['ortalama'],
-                    'medyan': scores.get('medyan')
-                })
-        
-        # Sort by ortalama score (descending)
-        ranking.sort(key=lambda x: x['ortalama'], reverse=True)
-        return ranking
-    
-    def search_universities(self, query: str) -> List[Dict]:
-        """Search universities by name"""
-        universities = self.get_universities()
-        query_lower = query.lower()
-        
-        results = []
-        for uni in universities:
-            if query_lower in uni['name'].lower():
-                results.append(uni)
-        
-        return results
-    
-    def get_latest_year(self) -> Optional[int]:
-        """Get the latest available year"""
-        years = self.get_years()
-        return max(years) if years else None
+        return self._resolve(snapshot).rankings.get(year, [])
     
-    def get_data_info(self) -> Dict:
-        """Get data metadata"""
-        data = self.load_data()
+    def get_university_scores(self, slug: str, snapshot: Optional[Snapshot] = None) -> Optional[List[Dict]]:
+        """Get a university's scores across all years, oldest first"""
+        snapshot = self._resolve(snapshot)
+        row = snapshot.slug_index.get(slug)
+        if row is None:
+            return None
+        
+        years = np.asarray(snapshot.years)
+        columns = np.argsort(years, kind='stable')
+        columns = columns[snapshot.present[row, columns]]
+        values = snapshot.scores[row, columns]
+        
+        series = {metric: nan_to_none(values[:, k]) for k, metric in enumerate(METRICS)}
+        return [
+            {'year': year, **{metric: series[metric][n] for metric in METRICS}}
+            for n, year in enumerate(years[columns].tolist())
+        ]
+    
+    def _select_axes(
+        self,
+        snapshot: Snapshot,
+        years: Optional[List[int]] = None,
+        metrics: Optional[List[str]] = None
+    ):
+        """Resolve requested years and metrics to matrix columns"""
+        years = sorted(snapshot.years) if not years else years
+        unknown_years = [year for year in years if year not in snapshot.year_index]
+        if unknown_years:
+            raise ValueError(f"Years not available: {', '.join(map(str, unknown_years))}")
+        
+        metrics = list(METRICS) if not metrics else metrics
+        unknown_metrics = [metric for metric in metrics if metric not in snapshot.metric_index]
+        if unknown_metrics:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown_metrics)}")
+        
+        columns = np.array([snapshot.year_index[year] for year in years], dtype=int)
+        metric_columns = np.array([snapshot.metric_index[metric] for metric in metrics], dtype=int)
+        return years, columns, metrics, metric_columns
+    
+    def _select_rows(self, snapshot: Snapshot, slugs: List[str]):
+        """Resolve slugs to matrix rows, keeping request order and dropping duplicates"""
+        found = []
+        missing = []
+        for slug in dict.fromkeys(slugs):
+            (found if slug in snapshot.slug_index else missing).append(slug)
+        rows = np.array([snapshot.slug_index[slug] for slug in found], dtype=int)
+        return found, missing, rows
+    
+    def get_scores_batch(
+        self,
+        slugs: List[str],
+        years: Optional[List[int]] = None,
+        metrics: Optional[List[str]] = None,
+        snapshot: Optional[Snapshot] = None
+    ) -> Dict:
+        """Get score series for several universities in one pass over the matrix"""
+        snapshot = self._resolve(snapshot)
+        years, columns, metrics, metric_columns = self._select_axes(snapshot, years, metrics)
+        found, missing, rows = self._select_rows(snapshot, slugs)
+        
+        values = snapshot.scores[np.ix_(rows, columns, metric_columns)]
+        present = snapshot.present[np.ix_(rows, columns)]
+        
+        universities = []
+        for n, slug in enumerate(found):
+            series = {metric: nan_to_none(values[n, :, k]) for k, metric in enumerate(metrics)}
+            universities.append({
+                'slug': slug,
+                'university': snapshot.names[rows[n]],
+                'scores': [
+                    {'year': year, **{metric: series[metric][t] for metric in metrics}}
+                    for t, year in enumerate(years)
+                    if present[n, t]
+                ]
+            })
+        
+        return {
+            'years': years,
+            'metrics': metrics,
+            'universities': universities,
+            'notFound': missing
+        }
+    
+    def compare_universities(
+        self,
+        slugs: List[str],
+        years: Optional[List[int]] = None,
+        metrics: Optional[List[str]] = None,
+        snapshot: Optional[Snapshot] = None
+    ) -> Dict:
+        """Get aligned (university x year) score and rank matrices for several universities.
+        
+        Rank differences are relative to the first university: positive means
+        ranked below it, None where either side is unranked.
+        """
+        snapshot = self._resolve(snapshot)
+        years, columns, metrics, metric_columns = self._select_axes(snapshot, years, metrics)
+        found, missing, rows = self._select_rows(snapshot, slugs)
+        if missing:
+            raise KeyError(f"Universities not found: {', '.join(missing)}")
+        
+        values = snapshot.scores[np.ix_(rows, columns, metric_columns)]
+        ranks = snapshot.ranks[np.ix_(rows, columns)]
+        rank_differences = ranks - ranks[:1]
+        
+        def int_rows(matrix: np.ndarray) -> List[List[Optional[int]]]:
+            return [[None if value is None else int(value) for value in nan_to_none(row)] for row in matrix]
+        
+        return {
+            'slugs': found,
+            'names': [snapshot.names[row] for row in rows.tolist()],
+            'years': years,
+            'scores': {metric: [nan_to_none(row) for row in values[:, :, k]] for k, metric in enumerate(metrics)},
+            'ranks': int_rows(ranks),
+            'rankDifferences': int_rows(rank_differences)
+        }
+    
+    def get_year_summary(
+        self,
+        year: int,
+        percentiles: bool = False,
+        snapshot: Optional[Snapshot] = None
+    ) -> Optional[Dict]:
+        """Get per-metric distribution aggregates for a year"""
+        analytics = self._resolve(snapshot).analytics
+        position = analytics.year_position.get(year)
+        if position is None:
+            return None
+        
+        statistics = {name: nan_to_none(analytics.statistics[name][position]) for name in STATISTICS}
+        summary = {'year': year}
+        for k, metric in enumerate(METRICS):
+            values = {'count': int(analytics.counts[position, k])}
+            values.update({name: statistics[name][k] for name in STATISTICS})
+            if percentiles:
+                cuts = nan_to_none(analytics.percentiles[:, position, k])
+                values['percentiles'] = {f'p{p}': cut for p, cut in zip(PERCENTILES, cuts)}
+            summary[metric] = values
+        return summary
+    
+    def get_university_changes(self, slug: str, snapshot: Optional[Snapshot] = None) -> Optional[List[Dict]]:
+        """Get a university's year-over-year score deltas and rank changes"""
+        snapshot = self._resolve(snapshot)
+        row = snapshot.slug_index.get(slug)
+        if row is None:
+            return None
+        
+        analytics = snapshot.analytics
+        ranks = snapshot.ranks[row, [snapshot.year_index[year] for year in analytics.years]]
+        deltas = {metric: nan_to_none(analytics.deltas[row, :, k]) for k, metric in enumerate(METRICS)}
+        rank_changes = nan_to_none(analytics.rank_changes[row])
+        ranks = nan_to_none(ranks)
+        
+        return [
+            {
+                'fromYear': from_year,
+                'toYear': to_year,
+                **{metric: deltas[metric][t] for metric in METRICS},
+                'rankFrom': None if ranks[t] is None else int(ranks[t]),
+                'rankTo': None if ranks[t + 1] is None else int(ranks[t + 1]),
+                'rankChange': None if rank_changes[t] is None else int(rank_changes[t])
+            }
+            for t, (from_year, to_year) in enumerate(zip(analytics.years, analytics.years[1:]))
+        ]
+    
+    def get_rank_movers(self, year: int, snapshot: Optional[Snapshot] = None) -> Optional[List[Dict]]:
+        """Get rank movement into ``year`` from the previous year, biggest risers first"""
+        analytics = self._resolve(snapshot).analytics
+        if year not in analytics.year_position:
+            return None
+        return analytics.movers.get(year, [])
+    
+    def rescore_year(
+        self,
+        year: int,
+        weights: Optional[List[float]] = None,
+        rank_by: str = 'mean',
+        snapshot: Optional[Snapshot] = None
+    ) -> Optional[Dict]:
+        """Rank a year by the weighted mean or median of the per-indicator scores.
+        
+        Without weights the methodology weights of Etkinlik_skorlari.R are
+        used. Scores for every university and year are computed in one
+        batched pass per weight vector and cached.
+        """
+        snapshot = self._resolve(snapshot)
+        if not snapshot.indicators:
+            raise ValueError("Per-indicator scores are not available in this data")
+        if rank_by not in RESCORE_RANK_BY:
+            raise ValueError(f"rank_by must be one of: {', '.join(RESCORE_RANK_BY)}")
+        column = snapshot.year_index.get(year)
+        if column is None:
+            return None
+        
+        count = len(snapshot.indicators)
+        if weights is None and len(METHODOLOGY_WEIGHTS) == count:
+            # Scaled exactly as the R script scales them, so the published
+            # scores are reproduced bit for bit
+            weights = METHODOLOGY_WEIGHTS
+        else:
+            weights = normalize_weights(weights or [1.0] * count, count)
+        
+        key = (snapshot.version, snapshot.generation, weights)
+        scores = self.rescore_cache.get(key)
+        if scores is None:
+            scores = weighted_scores(snapshot.indicator_scores, weights)
+            for array in scores:
+                array.flags.writeable = False
+            self.rescore_cache.put(key, scores)
+        
+        mean = scores[0][:, column]
+        median = scores[1][:, column]
+        order = rank_descending(mean if rank_by == 'mean' else median)
+        means = nan_to_none(mean[order])
+        medians = nan_to_none(median[order])
         return {
-            'lastUpdated': data.get('lastUpdated'),
-            'years': data.get('years', []),
-            'universityCount': len(data.get('universities', [])),
-            'latestYear': self.get_latest_year()
+            'year': year,
+            'indicators': snapshot.indicators,
+            'weights': list(weights),
+            'rankBy': rank_by,
+            'ranking': [
+                {
+                    'slug': snapshot.slugs[row],
+                    'name': snapshot.names[row],
+                    'mean': means[n],
+                    'median': medians[n],
+                    'rank': n + 1
+                }
+                for n, row in enumerate(order.tolist())
+            ]
         }
+    
+    def search_universities(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        snapshot: Optional[Snapshot] = None
+    ) -> List[Dict]:
+        """Search universities by name, best match first"""
+        snapshot = self._resolve(snapshot)
+        return [snapshot.universities[doc] for doc in snapshot.search_index.search(query, limit)]
+    
+    def get_latest_year(self, snapshot: Optional[Snapshot] = None) -> Optional[int]:
+        """Get the latest available year"""
+        return self._resolve(snapshot).latest_year
+    
+    def get_data_info(self, snapshot: Optional[Snapshot] = None) -> Dict:
+        """Get data metadata"""
+        return self._resolve(snapshot).info
 
 # Global instance
 data_service = DataService()
@@ -0,0 +1,126 @@
+"""
+Shared Snapshot Store
+One memory-mapped snapshot per generation, shared by every uvicorn worker
+
+Layout of the shared directory:
+    gen-<N>.bin   binary snapshot of generation N (see data/binary.py)
+    CURRENT       JSON pointer: generation, file, source name and mtime
+    .lock         flock() target that elects the worker publishing a generation
+
+Whichever worker first notices that the source data changed takes the lock,
+writes the next generation and atomically replaces CURRENT; the others find
+CURRENT already up to date once they get the lock. Every worker maps the
+generation named by CURRENT read-only, so the score arrays live once in the
+OS page cache however many workers there are. What each worker still holds
+privately is the search index, the analytics and the slug index (about
+0.5 MB for the current data), plus the university dicts and per-year
+rankings it has served so far, which are built from the arrays on first
+access.
+"""
+
+import dataclasses
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+from data.binary import load_binary_snapshot, write_binary_snapshot
+from data.snapshot import Snapshot
+
+# Generations kept on disk; older ones are unlinked (mapped files stay valid)
+KEEP_GENERATIONS = 2
+
+
+class SharedSnapshotStore:
+    """Generation-counted binary snapshots in a directory shared by workers"""
+
+    def __init__(self, directory: Path):
+        try:
+            import fcntl  # noqa: F401  (POSIX only)
+        except ImportError:
+            raise RuntimeError("Shared snapshots need fcntl.flock (POSIX)")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.pointer_path = self.directory / "CURRENT"
+        self.lock_path = self.directory / ".lock"
+
+    @contextmanager
+    def _locked(self):
+        """Hold the publisher lock for the duration of the block"""
+        import fcntl
+
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_pointer(self) -> Optional[Dict]:
+        """The CURRENT pointer, or None if nothing was published yet"""
+        try:
+            with open(self.pointer_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def current_generation(self) -> Optional[int]:
+        """Generation every worker should be serving"""
+        pointer = self.read_pointer()
+        return pointer['generation'] if pointer else None
+
+    def publish_if_stale(self, source: Path) -> Dict:
+        """Publish a new generation from ``source`` unless CURRENT already matches it"""
+        with self._locked():
+            pointer = self.read_pointer()
+            source_mtime = source.stat().st_mtime
+            if pointer and pointer['sourceMtime'] == source_mtime and pointer['source'] == source.name:
+                return pointer
+
+            generation = (pointer['generation'] if pointer else 0) + 1
+            target = self.directory / f"gen-{generation}.bin"
+            if source.suffix == '.bin':
+                tmp_path = target.with_name(target.name + '.tmp')
+                shutil.copyfile(source, tmp_path)
+                os.replace(tmp_path, target)
+            else:
+                with open(source, 'r', encoding='utf-8') as f:
+                    write_binary_snapshot(json.load(f), target)
+
+            pointer = {
+                'generation': generation,
+                'file': target.name,
+                'source': source.name,
+                'sourceMtime': source_mtime,
+            }
+            tmp_pointer = self.pointer_path.with_name('CURRENT.tmp')
+            with open(tmp_pointer, 'w', encoding='utf-8') as f:
+                json.dump(pointer, f)
+            os.replace(tmp_pointer, self.pointer_path)
+
+            self._remove_old_generations(generation)
+            return pointer
+
+    def _remove_old_generations(self, generation: int):
+        """Unlink generations no worker should still switch to"""
+        for path in self.directory.glob("gen-*.bin"):
+            try:
+                old = int(path.stem.split('-', 1)[1])
+            except ValueError:
+                continue
+            if old <= generation - KEEP_GENERATIONS:
+                path.unlink(missing_ok=True)
+
+    def load(self, pointer: Dict) -> Snapshot:
+        """Map the generation a pointer names; last_modified is the source mtime"""
+        try:
+            snapshot = load_binary_snapshot(self.directory / pointer['file'], pointer['sourceMtime'])
+        except FileNotFoundError:
+            # Superseded and cleaned up meanwhile; follow CURRENT instead
+            pointer = self.read_pointer()
+            if pointer is None:
+                raise
+            snapshot = load_binary_snapshot(self.directory / pointer['file'], pointer['sourceMtime'])
+        return dataclasses.replace(snapshot, generation=pointer['generation'])
@@ -0,0 +1,353 @@
+"""
+Data Snapshot
+Immutable, precomputed view of one data.json load
+"""
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from data.analytics import Analytics, build_analytics
+from data.search import SearchIndex
+
+# Metric axis of the score matrix
+METRICS = ('ortalama', 'medyan')
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Read-only view of a data load with lookups built in advance.
+
+    Scores are held columnar in ``scores``, a float array shaped
+    (university, year, metric) with NaN for missing values; ``slug_index``,
+    ``year_index`` and ``metric_index`` map labels to positions on each axis.
+    ``indicator_scores`` holds the per-output efficiencies (y1..y13) the
+    metrics are combined from, shaped (university, year, indicator); it has
+    no indicator axis when the data carries none.
+    ``generation`` is set when the snapshot comes from the shared store.
+    Everything here is shared between requests, so callers must treat the
+    returned lists and dicts as read-only.
+    """
+    data: Dict
+    last_modified: Optional[float]
+    version: Optional[str]
+    years: List[int]
+    latest_year: Optional[int]
+    universities: Sequence
+    universities_by_slug: Mapping
+    slugs: List[str]
+    names: List[str]
+    slug_index: Dict[str, int]
+    year_index: Dict[int, int]
+    metric_index: Dict[str, int]
+    scores: np.ndarray
+    present: np.ndarray
+    indicators: List[str]
+    indicator_scores: np.ndarray
+    ranks: np.ndarray
+    rankings: Mapping
+    search_index: SearchIndex
+    analytics: Analytics
+    info: Dict
+    generation: Optional[int] = None
+
+
+def nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    """Convert a float array to a JSON-ready list with None for NaN"""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def build_score_matrix(universities: List[Dict], years: List[int]):
+    """Pack nested per-university scores into a (university, year, metric) array"""
+    scores = np.full((len(universities), len(years), len(METRICS)), np.nan)
+    present = np.zeros((len(universities), len(years)), dtype=bool)
+
+    for i, uni in enumerate(universities):
+        uni_scores = uni.get('scores', {})
+        for j, year in enumerate(years):
+            year_scores = uni_scores.get(str(year))
+            if not year_scores:
+                continue
+            present[i, j] = True
+            for k, metric in enumerate(METRICS):
+                value = year_scores.get(metric)
+                if value is not None:
+                    scores[i, j, k] = value
+
+    return scores, present
+
+
+def build_indicator_matrix(universities: List[Dict], years: List[int], indicators: List[str]) -> np.ndarray:
+    """Pack per-indicator scores (or any per-year keys, e.g. intervals) into
+    a (university, year, indicator) array"""
+    values = np.full((len(universities), len(years), len(indicators)), np.nan)
+    if not indicators:
+        return values
+
+    for i, uni in enumerate(universities):
+        uni_scores = uni.get('scores', {})
+        for j, year in enumerate(years):
+            year_scores = uni_scores.get(str(year))
+            if not year_scores:
+                continue
+            for k, indicator in enumerate(indicators):
+                value = year_scores.get(indicator)
+                if value is not None:
+                    values[i, j, k] = value
+
+    return values
+
+
+class UniversityRows(Sequence):
+    """The nested per-university dicts of a columnar snapshot, each built
+    from the arrays on first access and kept.
+
+    Serving a few universities (lookups, search results) only builds those;
+    /api/universities builds them all once. ``columns`` pairs every score
+    name with its (university, year) array. Concurrent first accesses may
+    build a dict twice, which is harmless: both are equal.
+    """
+
+    def __init__(
+        self,
+        slugs: List[str],
+        names: List[str],
+        years: List[int],
+        present: np.ndarray,
+        columns: List[Tuple[str, np.ndarray]]
+    ):
+        self._slugs = slugs
+        self._names = names
+        self._years = [str(year) for year in years]
+        self._present = present
+        self._columns = columns
+        self._rows: List[Optional[Dict]] = [None] * len(slugs)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self._rows[index]
+        if row is None:
+            row = self._rows[index] = self._build(index)
+        return row
+
+    def _build(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self._rows)
+        values = [(column, nan_to_none(array[i])) for column, array in self._columns]
+        return {
+            'slug': self._slugs[i],
+            'name': self._names[i],
+            'scores': {
+                year: {column: series[j] for column, series in values}
+                for j, year in enumerate(self._years)
+                if self._present[i, j]
+            }
+        }
+
+
+class SlugLookup(Mapping):
+    """University dicts by slug, resolved through the slug index"""
+
+    def __init__(self, slug_index: Dict[str, int], universities: Sequence):
+        self._slug_index = slug_index
+        self._universities = universities
+
+    def __getitem__(self, slug: str) -> Dict:
+        return self._universities[self._slug_index[slug]]
+
+    def __iter__(self):
+        return iter(self._slug_index)
+
+    def __len__(self) -> int:
+        return len(self._slug_index)
+
+
+class YearRankings(Mapping):
+    """Ranking entries per year, each year built from the rank array on first access"""
+
+    def __init__(self, scores: np.ndarray, ranks: np.ndarray, slugs: List[str], names: List[str], years: List[int]):
+        self._scores = scores
+        self._ranks = ranks
+        self._slugs = slugs
+        self._names = names
+        self._year_index = {year: j for j, year in enumerate(years)}
+        self._rankings: Dict[int, List[Dict]] = {}
+
+    def __getitem__(self, year: int) -> List[Dict]:
+        ranking = self._rankings.get(year)
+        if ranking is None:
+            ranking = self._rankings[year] = self._build(self._year_index[year])
+        return ranking
+
+    def __iter__(self):
+        return iter(self._year_index)
+
+    def __len__(self) -> int:
+        return len(self._year_index)
+
+    def _build(self, j: int) -> List[Dict]:
+        column = self._ranks[:, j]
+        order = np.flatnonzero(~np.isnan(column))
+        order = order[np.argsort(column[order])]
+        ortalama = self._scores[order, j, METRICS.index('ortalama')]
+        medyan = self._scores[order, j, METRICS.index('medyan')]
+        return [
+            {
+                'slug': self._slugs[i],
+                'name': self._names[i],
+                'ortalama': score,
+                'medyan': median,
+                'rank': position
+            }
+            for position, (i, score, median) in enumerate(
+                zip(order.tolist(), ortalama.tolist(), nan_to_none(medyan)),
+                start=1
+            )
+        ]
+
+
+def _build_ranks(scores: np.ndarray) -> np.ndarray:
+    """Rank every year by ortalama (descending) in one vectorized pass per year"""
+    ranks = np.full(scores.shape[:2], np.nan)
+    ortalama = scores[:, :, METRICS.index('ortalama')]
+
+    for j in range(scores.shape[1]):
+        column = ortalama[:, j]
+        order = np.flatnonzero(~np.isnan(column))
+        # Stable sort keeps file order for ties, like list.sort(reverse=True)
+        order = order[np.argsort(-column[order], kind='stable')]
+        ranks[order, j] = np.arange(1, len(order) + 1)
+
+    return ranks
+
+
+def _assemble(
+    data: Dict,
+    slugs: List[str],
+    names: List[str],
+    years: List[int],
+    scores: np.ndarray,
+    present: np.ndarray,
+    indicators: List[str],
+    indicator_scores: np.ndarray,
+    last_modified: Optional[float],
+    version: Optional[str]
+) -> Snapshot:
+    """Derive every index from the columnar scores and wrap them in a Snapshot.
+
+    Rankings are built per year on first access, so a worker only holds the
+    ones it serves.
+    """
+    universities = data.get('universities', [])
+    latest_year = max(years) if years else None
+
+    # Keep the first entry per slug, as the old linear scan did
+    slug_index = {}
+    for i, slug in enumerate(slugs):
+        if slug and slug not in slug_index:
+            slug_index[slug] = i
+
+    ranks = _build_ranks(scores)
+    for array in (scores, present, indicator_scores, ranks):
+        array.flags.writeable = False
+
+    return Snapshot(
+        data=data,
+        last_modified=last_modified,
+        version=version,
+        years=years,
+        latest_year=latest_year,
+        universities=universities,
+        universities_by_slug=SlugLookup(slug_index, universities),
+        slugs=slugs,
+        names=names,
+        slug_index=slug_index,
+        year_index={year: j for j, year in enumerate(years)},
+        metric_index={metric: k for k, metric in enumerate(METRICS)},
+        scores=scores,
+        present=present,
+        indicators=indicators,
+        indicator_scores=indicator_scores,
+        ranks=ranks,
+        rankings=YearRankings(scores, ranks, slugs, names, years),
+        search_index=SearchIndex(names),
+        analytics=build_analytics(scores, ranks, years, slugs, names),
+        info={
+            'lastUpdated': data.get('lastUpdated'),
+            'years': years,
+            'universityCount': len(universities),
+            'latestYear': latest_year,
+            'indicators': indicators,
+            'intervals': data.get('intervals', []),
+            'bootstrap': data.get('bootstrap')
+        }
+    )
+
+
+def build_snapshot(
+    data: Dict,
+    last_modified: Optional[float] = None,
+    version: Optional[str] = None
+) -> Snapshot:
+    """Build a snapshot from parsed data.json content.
+
+    ``version`` identifies the content (a hash of the source file) and is
+    what HTTP validators are derived from.
+    """
+    years = data.get('years', [])
+    universities = data.get('universities', [])
+    slugs = [uni.get('slug') for uni in universities]
+    names = [uni.get('name') for uni in universities]
+    indicators = data.get('indicators', [])
+    scores, present = build_score_matrix(universities, years)
+    indicator_scores = build_indicator_matrix(universities, years, indicators)
+    return _assemble(data, slugs, names, years, scores, present, indicators, indicator_scores, last_modified, version)
+
+
+def build_snapshot_from_matrix(
+    slugs: List[str],
+    names: List[str],
+    years: List[int],
+    scores: np.ndarray,
+    present: np.ndarray,
+    indicators: Optional[List[str]] = None,
+    indicator_scores: Optional[np.ndarray] = None,
+    intervals: Optional[List[str]] = None,
+    interval_scores: Optional[np.ndarray] = None,
+    bootstrap: Optional[Dict] = None,
+    last_updated: Optional[str] = None,
+    last_modified: Optional[float] = None,
+    version: Optional[str] = None
+) -> Snapshot:
+    """Build a snapshot from columnar scores, e.g. a memory-mapped data.bin.
+
+    The arrays are used as-is (no copy); the nested per-university dicts
+    that /api/universities serves, including any bootstrap interval
+    bounds, are built from them on first access (see UniversityRows).
+    """
+    indicators = indicators or []
+    if indicator_scores is None:
+        indicator_scores = np.full(scores.shape[:2] + (len(indicators),), np.nan)
+    intervals = intervals or []
+    if interval_scores is None:
+        interval_scores = np.full(scores.shape[:2] + (len(intervals),), np.nan)
+    columns = (
+        [(metric, scores[:, :, k]) for k, metric in enumerate(METRICS)]
+        + [(indicator, indicator_scores[:, :, k]) for k, indicator in enumerate(indicators)]
+        + [(interval, interval_scores[:, :, k]) for k, interval in enumerate(intervals)]
+    )
+    universities = UniversityRows(slugs, names, years, present, columns)
+
+    data = {'years': years, 'universities': universities, 'lastUpdated': last_updated}
+    if indicators:
+        data['indicators'] = indicators
+    if intervals:
+        data['intervals'] = intervals
+        data['bootstrap'] = bootstrap
+    return _assemble(data, slugs, names, years, scores, present, indicators, indicator_scores, last_modified, version)
@@ -0,0 +1,131 @@
+"""
+Snapshot Versions
+Dated historical snapshots kept next to the live data, loaded on demand
+
+Layout of the versions directory (data/versions by default):
+    <version>.bin    binary snapshot (see data/binary.py), preferred
+    <version>.json   data.json content
+
+The version name is the file stem, normally the lastUpdated date of the
+run that produced it (e.g. 2024-10-26). Loaded versions are kept in a
+size-bounded LRU; the live snapshot is held by DataService and never
+evicted.
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from data.binary import content_hash, load_binary_snapshot
+from data.snapshot import Snapshot, build_snapshot
+
+# Historical versions held in memory at once
+VERSION_CACHE_SIZE = int(os.getenv("UNISKOR_VERSION_CACHE_SIZE", "4"))
+
+# Version names are file stems; anything else could escape the directory
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+SUFFIXES = (".bin", ".json")
+
+
+def read_snapshot_file(path: Path) -> Snapshot:
+    """Build a snapshot from data.bin (memory-mapped) or data.json content"""
+    # Read mtime first so a write during parsing triggers another reload
+    last_modified = path.stat().st_mtime
+    if path.suffix == ".bin":
+        return load_binary_snapshot(path, last_modified)
+
+    with open(path, 'rb') as f:
+        raw = f.read()
+    data = json.loads(raw.decode('utf-8'))
+    # The converter stores the canonical hash data.bin carries too; files
+    # written before it did get the same hash computed from their content
+    version = data.get('contentHash') or content_hash(data)
+    return build_snapshot(data, last_modified, version)
+
+
+class SnapshotVersions:
+    """Directory of dated snapshots with an LRU of the loaded ones"""
+
+    def __init__(self, directory: Path, max_loaded: int = VERSION_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, Tuple[float, Snapshot]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, version: str) -> Optional[Path]:
+        """File holding a version (binary preferred), or None if there is none"""
+        if not VERSION_PATTERN.match(version):
+            return None
+        for suffix in SUFFIXES:
+            path = self.directory / f"{version}{suffix}"
+            if path.is_file():
+                return path
+        return None
+
+    def exists(self, version: str) -> bool:
+        return self.path(version) is not None
+
+    def list(self) -> List[Dict]:
+        """Available versions, newest name first; nothing is loaded"""
+        if not self.directory.is_dir():
+            return []
+        versions = {}
+        for suffix in reversed(SUFFIXES):
+            for path in self.directory.glob(f"*{suffix}"):
+                if VERSION_PATTERN.match(path.stem):
+                    versions[path.stem] = path
+        return [
+            {
+                'version': version,
+                'format': path.suffix[1:],
+                'size': path.stat().st_size,
+                'loaded': version in self._loaded
+            }
+            for version, path in sorted(versions.items(), reverse=True)
+        ]
+
+    def get(self, version: str) -> Snapshot:
+        """Load a version, or return it from the LRU if its file is unchanged"""
+        path = self.path(version)
+        if path is None:
+            raise KeyError(f"Version {version} not available")
+        mtime = path.stat().st_mtime
+
+        with self._lock:
+            cached = self._loaded.get(version)
+            if cached is not None and cached[0] == mtime:
+                self._loaded.move_to_end(version)
+                return cached[1]
+
+        # Load outside the lock; a concurrent duplicate load is harmless
+        snapshot = read_snapshot_file(path)
+        with self._lock:
+            self._loaded[version] = (mtime, snapshot)
+            self._loaded.move_to_end(version)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+        return snapshot
+
+    def archive(self, source: Path, version: str) -> Path:
+        """Keep a dated copy of a published data.json and its data.bin, if any"""
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid snapshot version: {version}")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for suffix in SUFFIXES:
+            published = source.with_suffix(suffix)
+            target = self.directory / f"{version}{suffix}"
+            if published.exists():
+                # Replace rather than overwrite: the old file may be memory-mapped
+                tmp_path = target.with_name(target.name + '.tmp')
+                shutil.copyfile(published, tmp_path)
+                os.replace(tmp_path, target)
+            else:
+                # A stale same-day data.bin would shadow the new data.json
+                target.unlink(missing_ok=True)
+        return self.directory / f"{version}.json"
@@ -0,0 +1,126 @@
+"""
+Data Watcher
+Reloads the data snapshot in the background when data.json or data.bin changes
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from data.service import DataService, data_service
+
+try:
+    from watchfiles import awatch
+except ImportError:  # Optional (ships with uvicorn[standard]); fall back to polling
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between stat() checks when inotify-style watching is unavailable
+POLL_INTERVAL = float(os.getenv("UNISKOR_RELOAD_INTERVAL", "2.0"))
+
+
+class SnapshotWatcher:
+    """Watch data.json and publish a new snapshot whenever it changes.
+
+    Uses filesystem notifications through watchfiles when it is installed
+    and polling otherwise. Parsing and index building run in a worker
+    thread; the finished snapshot is published with a single reference
+    swap, so request handlers never block on the filesystem.
+    """
+
+    def __init__(self, service: DataService, poll_interval: float = POLL_INTERVAL):
+        self.service = service
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._failed_fingerprint = None
+
+    async def start(self):
+        """Load the initial snapshot if needed and start watching"""
+        if self._task is not None:
+            return
+        try:
+            await self.reload()
+        except (OSError, ValueError):
+            # Keep watching: the snapshot is published once a valid file appears
+            logger.exception("Initial data load failed")
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop watching and wait for the watcher task to finish"""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _changed(self) -> bool:
+        """Check for a change worth reloading; runs in a worker thread"""
+        if not self.service._should_reload():
+            return False
+        try:
+            # Do not retry a file version that already failed to parse
+            return self.service._source_fingerprint() != self._failed_fingerprint
+        except OSError:
+            return self.service._snapshot is None
+
+    async def reload(self) -> bool:
+        """Reload in a worker thread if data.json changed; returns True if swapped"""
+        if not await asyncio.to_thread(self._changed):
+            return False
+        started = time.perf_counter()
+        try:
+            snapshot = await asyncio.to_thread(self.service._read_snapshot)
+        except (OSError, ValueError) as e:
+            self.service.reload_failures += 1
+            # Half-written or missing file: keep serving the current snapshot
+            if self.service._snapshot is None:
+                raise
+            try:
+                self._failed_fingerprint = self.service._source_fingerprint()
+            except OSError:
+                pass
+            logger.warning("Data reload failed, keeping current snapshot: %s", e)
+            return False
+        self.service._publish(snapshot, time.perf_counter() - started)
+        logger.info("Loaded data snapshot %s", (snapshot.version or "")[:12])
+        return True
+
+    async def _run(self):
+        """Watch loop: react to change notifications or poll on an interval"""
+        if awatch is not None:
+            await self._watch()
+        else:
+            await self._poll()
+
+    async def _watch(self):
+        """Reload on filesystem notifications for data.json"""
+        # Watch directories, not files: editors and converters replace them
+        directories, names = self.service.watch_targets()
+        async for changes in awatch(*directories, stop_event=self._stop_event):
+            if any(os.path.basename(path) in names for _, path in changes):
+                await self._reload_logged()
+
+    async def _poll(self):
+        """Reload when data.json's mtime changes"""
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.poll_interval)
+            await self._reload_logged()
+
+    async def _reload_logged(self):
+        """Reload, logging instead of raising so the watcher keeps running"""
+        try:
+            await self.reload()
+        except Exception:
+            logger.exception("Data reload failed")
+
+
+snapshot_watcher = SnapshotWatcher(data_service)
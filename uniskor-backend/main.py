@@ -3,25 +3,63 @@ UniSkor Backend API
 FastAPI backend for university efficiency scores
 """
 
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 import os
 from pathlib import Path
 from typing import List, Optional
 from pydantic import BaseModel
 
-from api.routes import data, universities
-from data.service import DataService
+from api.caching import ConditionalGetMiddleware, ResponseCacheMiddleware
+from api.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from api.profiling import PROFILING_ENABLED, ProfilingMiddleware
+from api.routes import analytics, data, export, universities
+from api.warmup import Rewarmer, hot_paths, prerender
+from data.service import DataService, data_service
+from data.watcher import snapshot_watcher
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load, index and pre-render the data snapshot before taking traffic, then keep it fresh"""
+    app.state.warmed_up = False
+    app.state.prerendered = 0
+    app.state.warmup_duration = None
+    started = time.perf_counter()
+    await snapshot_watcher.start()
+    if data_service.current_snapshot is not None:
+        app.state.prerendered = await prerender(app, hot_paths())
+        app.state.warmup_duration = time.perf_counter() - started
+    # Without data at startup, readiness follows the watcher's first successful load
+    app.state.warmed_up = True
+    # Every later snapshot is pre-rendered again as soon as it is published
+    rewarmer.start()
+    yield
+    await rewarmer.stop()
+    await snapshot_watcher.stop()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="UniSkor API",
     description="API for university efficiency scores",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Re-renders the hot responses after each reload; inert until the lifespan starts it
+rewarmer = Rewarmer(app)
+data_service.add_reload_listener(rewarmer)
+
+# Pre-serialized, precompressed response bytes for snapshot data
+app.add_middleware(ResponseCacheMiddleware)
+
+# Conditional GETs (ETag / Last-Modified); added before CORS so 304s still get CORS headers
+app.add_middleware(ConditionalGetMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -36,12 +74,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (UNISKOR_PROFILING=1, on request only with UNISKOR_PROFILING_TOKEN)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Request metrics; added last so it wraps everything, cache hits and 304s included
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(data.router, prefix="/api/data", tags=["data"])
 app.include_router(universities.router, prefix="/api/universities", tags=["universities"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"])
+app.include_router(export.router, prefix="/api/export", tags=["export"])
 
 # Serve static files (JSON data)
-app.mount("/data", StaticFiles(directory="data"), name="data")
+app.mount("/data", StaticFiles(directory=data_service.data_dir), name="data")
 
 @app.get("/")
 async def root():
@@ -51,6 +98,30 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: per-route latency and size histograms, reload and cache statistics"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for load balancers: data loaded, indexed and hot responses pre-rendered"""
+    snapshot = data_service.current_snapshot
+    if snapshot is None or not getattr(app.state, "warmed_up", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    
+    return {
+        # Still serving, but the data files were removed and cannot reload
+        "status": "degraded" if data_service.source_missing else "ready",
+        "sourceMissing": data_service.source_missing,
+        "dataVersion": snapshot.version,
+        "lastUpdated": snapshot.info.get("lastUpdated"),
+        "loadDuration": data_service.load_duration,
+        "warmupDuration": app.state.warmup_duration,
+        "prerendered": app.state.prerendered,
+        "indexSizes": data_service.get_index_sizes()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,37 +1,57 @@
 #!/usr/bin/env python3
 """
 Excel to JSON converter for UniSkor data
-Converts R output Excel files to the JSON format expected by the frontend
+Converts R output (Parquet dataset or Excel workbook) to the JSON format expected by the frontend
 """
 
+import argparse
 import pandas as pd
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 import re
 
-def clean_university_name(name):
-    """Clean university name for slug generation"""
-    if pd.isna(name):
-        return "unknown"
-    # Remove extra spaces and special characters
-    cleaned = re.sub(r'[^\w\s-]', '', str(name).strip())
-    # Convert to lowercase and replace spaces with hyphens
-    slug = re.sub(r'[-\s]+', '-', cleaned.lower())
-    return slug
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPTS_DIR.parent
 
-def examine_excel_structure(file_path):
-    """Examine Excel file structure"""
+# Make the backend packages (data/) importable when run as a script
+sys.path.insert(0, str(BACKEND_DIR))
+
+from data.binary import content_hash, write_binary_snapshot
+from data.interchange import read_tables
+from data.versions import SnapshotVersions
+
+# Bootstrap interval columns of sfa.py --bootstrap and their per-year JSON keys
+INTERVAL_KEYS = {
+    'Ortalama-Skor-Alt': 'ortalamaLow',
+    'Ortalama-Skor-Üst': 'ortalamaHigh',
+    'Medyan-Skor-Alt': 'medyanLow',
+    'Medyan-Skor-Üst': 'medyanHigh',
+    'Ortalama-Sıralama-Alt': 'ortalamaRankLow',
+    'Ortalama-Sıralama-Üst': 'ortalamaRankHigh',
+    'Medyan-Sıralama-Alt': 'medyanRankLow',
+    'Medyan-Sıralama-Üst': 'medyanRankHigh',
+}
+
+def slugify_names(names: pd.Series) -> pd.Series:
+    """URL slugs for a column of non-null names: punctuation dropped, lowercased,
+    runs of spaces and hyphens joined by one hyphen"""
+    cleaned = names.astype(str).str.strip().str.replace(r'[^\w\s-]', '', regex=True)
+    return cleaned.str.lower().str.replace(r'[-\s]+', '-', regex=True)
+
+def examine_excel_structure(file_path, sheets=None):
+    """Examine Excel file structure; pass already loaded sheets to avoid a second read"""
     print(f"\n=== Examining {file_path} ===")
     
-    # Read all sheet names
-    xl_file = pd.ExcelFile(file_path)
-    print(f"Sheet names: {xl_file.sheet_names}")
+    if sheets is None:
+        sheets = read_tables(file_path)
+    print(f"Sheet names: {list(sheets)}")
     
     # Examine each sheet
-    for sheet_name in xl_file.sheet_names:
+    for sheet_name, df in sheets.items():
         print(f"\n--- Sheet: {sheet_name} ---")
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
         print(f"Shape: {df.shape}")
         print(f"Columns: {list(df.columns)}")
         print(f"First few rows:")
@@ -39,100 +59,136 @@ def examine_excel_structure(file_path):
         print(f"Data types:")
         print(df.dtypes)
 
-def convert_sfa_scores_to_json(excel_path, output_path):
-    """Convert SFA scores Excel to JSON format"""
+def _year_frame(df, year):
+    """Normalize one year sheet to name/ortalama/medyan/yN columns, any
+    interval columns, plus year"""
+    columns = {df.columns[0]: 'name'}
+    for col in df.columns[1:]:
+        if str(col) in INTERVAL_KEYS:
+            columns[col] = INTERVAL_KEYS[str(col)]
+        elif 'Ortalama' in str(col) and 'Skor' in str(col):
+            columns[col] = 'ortalama'
+        elif 'Medyan' in str(col) and 'Skor' in str(col):
+            columns[col] = 'medyan'
+        else:
+            # Per-output efficiencies: y1-Skor .. y13-Skor
+            match = re.match(r'^(y\d+)-Skor$', str(col))
+            if match:
+                columns[col] = match.group(1)
+    
+    frame = df[list(columns)].rename(columns=columns)
+    frame = frame[frame['name'].notna()]
+    return frame.assign(year=year)
+
+def convert_sfa_scores_to_json(excel_path, output_path, sheets=None):
+    """Convert SFA scores (Parquet dataset or Excel workbook) to JSON format.
+    
+    Every year sheet is read in one pass over the input, stacked into a
+    single long frame (one row per university and year) and grouped by
+    slug, so the work grows linearly with universities x years.
+    """
     print(f"\n=== Converting {excel_path} to JSON ===")
     
-    xl_file = pd.ExcelFile(excel_path)
-    years = []
-    universities = []
-    
-    # Process each year sheet
-    for sheet_name in xl_file.sheet_names:
-        if sheet_name.isdigit():  # Year sheets
-            year = int(sheet_name)
-            years.append(year)
-            
-            print(f"Processing year {year}...")
-            df = pd.read_excel(excel_path, sheet_name=sheet_name)
-            
-            # Find university name column (usually first column)
-            uni_col = df.columns[0]
-            ortalama_col = None
-            medyan_col = None
-            
-            # Find score columns
-            for col in df.columns:
-                if 'Ortalama' in str(col) and 'Skor' in str(col):
-                    ortalama_col = col
-                elif 'Medyan' in str(col) and 'Skor' in str(col):
-                    medyan_col = col
-            
-            print(f"University column: {uni_col}")
-            print(f"Ortalama column: {ortalama_col}")
-            print(f"Medyan column: {medyan_col}")
-            
-            # Process each university
-            for _, row in df.iterrows():
-                uni_name = row[uni_col]
-                if pd.isna(uni_name):
-                    continue
-                    
-                slug = clean_university_name(uni_name)
-                
-                # Find or create university entry
-                uni_entry = None
-                for u in universities:
-                    if u['slug'] == slug:
-                        uni_entry = u
-                        break
-                
-                if uni_entry is None:
-                    uni_entry = {
-                        'slug': slug,
-                        'name': str(uni_name).strip(),
-                        'scores': {}
-                    }
-                    universities.append(uni_entry)
-                
-                # Add scores for this year
-                ortalama = row[ortalama_col] if ortalama_col and not pd.isna(row[ortalama_col]) else None
-                medyan = row[medyan_col] if medyan_col and not pd.isna(row[medyan_col]) else None
-                
-                uni_entry['scores'][str(year)] = {
-                    'ortalama': float(ortalama) if ortalama is not None else None,
-                    'medyan': float(medyan) if medyan is not None else None
-                }
-    
-    # Sort years
-    years.sort()
+    if sheets is None:
+        sheets = read_tables(excel_path)
+    year_sheets = [(int(name), df) for name, df in sheets.items() if name.isdigit()]
+    for year, df in year_sheets:
+        print(f"Year {year}: {len(df)} rows")
+    
+    frames = [_year_frame(df, year) for year, df in year_sheets]
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['name', 'year'])
+    for metric in ('ortalama', 'medyan'):
+        if metric not in frame:
+            frame[metric] = float('nan')
+    indicators = sorted(
+        (col for col in frame.columns if re.match(r'^y\d+$', col)),
+        key=lambda name: int(name[1:])
+    )
+    intervals = [key for key in INTERVAL_KEYS.values() if key in frame.columns]
+    # Replicates, level and seed of the bootstrap, kept in the Parquet metadata
+    bootstrap = next((df.attrs['bootstrap'] for _, df in year_sheets if 'bootstrap' in df.attrs), None)
+    frame['slug'] = slugify_names(frame['name'])
+    
+    # Universities in order of first appearance, named as first seen
+    first_seen = frame.drop_duplicates('slug', keep='first')
+    position = pd.Series(range(len(first_seen)), index=first_seen['slug'].to_numpy())
+    # A university listed twice in a sheet keeps its last row, as before
+    frame = frame.drop_duplicates(['slug', 'year'], keep='last')
+    frame = frame.assign(position=frame['slug'].map(position).to_numpy())
+    frame = frame.sort_values('position', kind='stable')
+    
+    fields = ['ortalama', 'medyan'] + indicators + intervals
+    values = frame[fields].to_numpy(dtype=float)
+    # Missing scores become null in JSON
+    rows = [[None if value != value else value for value in row] for row in values.tolist()]
+    
+    universities = [
+        {'slug': slug, 'name': str(name).strip(), 'scores': {}}
+        for slug, name in zip(first_seen['slug'], first_seen['name'])
+    ]
+    for pos, year, row in zip(frame['position'].tolist(), frame['year'].tolist(), rows):
+        universities[pos]['scores'][str(year)] = dict(zip(fields, row))
+    
+    years = sorted(year for year, _ in year_sheets)
     
     # Create final JSON structure
     result = {
         'years': years,
         'universities': universities,
+        'indicators': indicators,
         'lastUpdated': datetime.now().strftime('%Y-%m-%d')
     }
+    if intervals:
+        # Confidence bounds of the scores and ranks (sfa.py --bootstrap)
+        result['intervals'] = intervals
+        result['bootstrap'] = bootstrap
+    # One version for both files, so ETags do not depend on which is served
+    result['contentHash'] = content_hash(result)
     
     # Save to JSON
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
     
+    # Compact binary snapshot the API memory-maps; data.json stays the fallback
+    bin_path = write_binary_snapshot(result, Path(output_path).with_suffix('.bin'))
+    
+    # Dated copy, so this run stays queryable with ?version= after the next one
+    versions = SnapshotVersions(Path(output_path).parent / "versions")
+    version_path = versions.archive(Path(output_path), result['lastUpdated'])
+    
     print(f"\n=== Conversion Complete ===")
     print(f"Years: {years}")
     print(f"Universities: {len(universities)}")
+    if intervals:
+        print(f"Intervals: {intervals} ({bootstrap})")
     print(f"Output saved to: {output_path}")
+    print(f"Binary snapshot saved to: {bin_path}")
+    print(f"Version archived to: {version_path}")
     
     return result
 
 def main():
-    # Examine both Excel files
-    print("Examining Excel files...")
-    examine_excel_structure("data/Hamveri 26102024.xlsx")
-    examine_excel_structure("data/SFA Skorlar 26102024.xlsx")
+    parser = argparse.ArgumentParser(description="Convert SFA score workbooks to data.json")
+    parser.add_argument(
+        "--input", default=str(SCRIPTS_DIR / "SFA Skorlar 26102024"), help="SFA scores Parquet dataset or workbook"
+    )
+    parser.add_argument("--output", default=str(BACKEND_DIR / "data" / "data.json"), help="data.json to write")
+    parser.add_argument(
+        "--raw", default=str(BACKEND_DIR / "data" / "Hamveri 26102024"),
+        help="Raw data Parquet dataset or workbook for --examine"
+    )
+    parser.add_argument("--examine", action="store_true", help="Print the structure of both inputs first")
+    args = parser.parse_args()
+    
+    # Each input is read once; the schema dump reuses the loaded sheets
+    sheets = read_tables(args.input)
+    if args.examine:
+        print("Examining input files...")
+        examine_excel_structure(args.raw)
+        examine_excel_structure(args.input, sheets)
     
     # Convert SFA scores to JSON
-    result = convert_sfa_scores_to_json("data/SFA Skorlar 26102024.xlsx", "data/data.json")
+    result = convert_sfa_scores_to_json(args.input, args.output, sheets)
     
     # Show sample data
     print(f"\n=== Sample Data ===")
@@ -0,0 +1,1018 @@
+#!/usr/bin/env python3
+"""
+Stochastic frontier engine for UniSkor data
+In-process replacement for the sfaR::sfacross fits in Etkinlik_skorlari.R
+
+Each (year, output) model is a Cobb-Douglas production frontier
+
+    log(y) = b0 + sum_k b_k log(x_k) + v - u,   v ~ N(0, s_v^2),  u ~ |N(0, s_u^2)|
+
+fitted by BFGS on the vectorized log-likelihood and its analytic gradient.
+The variances are estimated as log(s_u^2) and log(s_v^2), the Zu_/Zv_
+intercepts of the sfaR summaries. The y<k>-Skor columns are JLMS
+efficiencies exp(-E[u|e]); Ortalama/Medyan and the ranks follow the R
+script exactly, so the output is a drop-in replacement for its dataset.
+
+The year x output models run on a process pool; a model that fails or
+times out leaves its column NaN. Each fit is seeded from the previous
+year's estimates of the same output, and converged fits are cached on disk
+by a hash of their data and starting point, so re-runs only refit what
+changed.
+
+With --bootstrap N every converged model is refitted on N resamples of the
+year's universities. The replicates of a model are fitted together by a
+batched BFGS on the vectorized likelihood, the models in parallel, and
+each replicate is rescored like the point estimate; the percentiles give
+-Alt/-Üst interval columns for Ortalama/Medyan-Skor and their ranks.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.special import erfcx, log_ndtr
+
+# Make the backend packages (data/) importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.interchange import read_dataset, write_dataset
+from data.rescoring import METHODOLOGY_WEIGHTS, weighted_scores
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+RAW_DATASET = SCRIPTS_DIR.parent / "data" / "Hamveri 26102024"
+SCORES_DATASET = SCRIPTS_DIR / "SFA Skorlar 26102024"
+REFERENCE_TABLES = SCRIPTS_DIR / "SFA Regression Tables with 13 vars"
+# Converged fits by a hash of their data and MODEL_SPEC
+MODEL_CACHE = Path(os.getenv("UNISKOR_SFA_CACHE", SCRIPTS_DIR / ".sfa-cache"))
+
+OUTPUTS = tuple(f"y{k}" for k in range(1, 14))
+INPUTS = tuple(f"x{k}" for k in range(1, 6))
+
+# BFGS stops when the largest gradient component falls below this
+GTOL = 1e-6
+MAX_ITER = 5000
+# Seconds one model may take before it is abandoned and scored NaN
+MODEL_TIMEOUT = 300.0
+# A fit must reach the OLS log-likelihood (the s_u -> 0 limit) within this
+OLS_TOLERANCE = 1e-4
+# --check: largest difference from a published score it accepts; the
+# Ortalama/Medyan ranks must match exactly
+SCORE_TOLERANCE = 1e-3
+# Sufficient-decrease constant and step halvings of the batched BFGS line
+# search; a step lowering the objective by less than FTOL (relative, i.e.
+# at floating point resolution) ends the row instead of creeping for
+# thousands of iterations along a flat s_u -> 0 ridge
+ARMIJO = 1e-4
+LINE_SEARCH_STEPS = 40
+FTOL = 1e-14
+
+# Bootstrap defaults: resampling seed and confidence level of the intervals
+BOOTSTRAP_SEED = 20241026
+CONFIDENCE_LEVEL = 0.95
+# Scores and ranks that get -Alt/-Üst (lower/upper) interval columns
+INTERVAL_COLUMNS = ('Ortalama-Skor', 'Medyan-Skor', 'Ortalama-Sıralama', 'Medyan-Sıralama')
+
+# Everything besides the data that determines a fit; change it to
+# invalidate the model cache
+MODEL_SPEC = {
+    'frontier': 'cobb-douglas',
+    'distribution': 'hnormal',
+    'optimizer': 'bfgs',
+    'gtol': GTOL,
+    'max_iter': MAX_ITER,
+    'revision': 2,
+}
+
+_LOG_2_OVER_SQRT_2PI = math.log(2.0) - 0.5 * math.log(2.0 * math.pi)
+
+
+class FitTimeout(Exception):
+    """A fit ran past its deadline"""
+
+
+@dataclass
+class FrontierFit:
+    """Estimates of one half-normal frontier model"""
+    beta: np.ndarray
+    log_var_u: float
+    log_var_v: float
+    loglik: float
+    n: int
+    iterations: int
+    converged: bool
+    gradient_norm: float
+
+    @property
+    def params(self) -> np.ndarray:
+        return np.concatenate([self.beta, [self.log_var_u, self.log_var_v]])
+
+    @property
+    def var_u(self) -> float:
+        return math.exp(self.log_var_u)
+
+    @property
+    def var_v(self) -> float:
+        return math.exp(self.log_var_v)
+
+
+def design(frame: pd.DataFrame, output: str, inputs: Sequence[str] = INPUTS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows with finite logs, log(output) and [1, log(inputs)].
+
+    Like sfaR, observations with a missing or non-positive value are dropped.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        y = np.log(frame[output].to_numpy(dtype=float))
+        logs = np.log(frame[list(inputs)].to_numpy(dtype=float))
+    rows = np.flatnonzero(np.isfinite(y) & np.isfinite(logs).all(axis=1))
+    X = np.column_stack([np.ones(len(rows)), logs[rows]])
+    return rows, y[rows], X
+
+
+def batch_log_likelihood(
+    theta: np.ndarray,
+    y: np.ndarray,
+    X: np.ndarray,
+    weights: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Half-normal frontier log-likelihoods and gradients of a batch of
+    parameter vectors in one array expression.
+
+    ``theta`` is (batch, k + 2) with rows (beta, log s_u^2, log s_v^2).
+    ``weights`` (batch, n) counts every observation per row, e.g. bootstrap
+    draws; by default each observation counts once.
+    """
+    k = X.shape[1]
+    beta = theta[:, :k]
+    var_u = np.exp(theta[:, k:k + 1])
+    var_v = np.exp(theta[:, k + 1:k + 2])
+    var = var_u + var_v
+    w = 1.0 if weights is None else weights
+
+    eps = y - beta @ X.T
+    # a = -eps * lambda / sigma
+    scale = np.sqrt(var_u / (var_v * var))
+    a = -eps * scale
+    log_cdf = log_ndtr(a)
+    mills = np.exp(-0.5 * a * a - 0.5 * math.log(2.0 * math.pi) - log_cdf)
+
+    ll = np.sum(w * (_LOG_2_OVER_SQRT_2PI - 0.5 * np.log(var) - 0.5 * eps * eps / var + log_cdf), axis=1)
+
+    grad = np.empty_like(theta)
+    grad[:, :k] = (w * (eps / var + mills * scale)) @ X
+    eps2 = eps * eps
+    ma = mills * a
+    grad[:, k] = np.sum(w * (-0.5 * var_u / var + 0.5 * eps2 * var_u / (var * var) + 0.5 * ma * var_v / var), axis=1)
+    grad[:, k + 1] = np.sum(
+        w * (-0.5 * var_v / var + 0.5 * eps2 * var_v / (var * var) - 0.5 * ma * (1.0 + var_v / var)), axis=1
+    )
+    return ll, grad
+
+
+def log_likelihood(theta: np.ndarray, y: np.ndarray, X: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Half-normal frontier log-likelihood and its gradient at one ``theta``"""
+    ll, grad = batch_log_likelihood(np.asarray(theta, dtype=float)[None], y, X)
+    return float(ll[0]), grad[0]
+
+
+def ols_loglik(y: np.ndarray, X: np.ndarray) -> float:
+    """Log-likelihood of the OLS fit, which the frontier reaches as s_u -> 0"""
+    beta, *_ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ beta
+    var = resid @ resid / len(y)
+    return -0.5 * len(y) * (math.log(2.0 * math.pi * var) + 1.0)
+
+
+def start_values(y: np.ndarray, X: np.ndarray) -> List[np.ndarray]:
+    """Starting points: OLS with method-of-moments variances (as sfaR
+    starts), then OLS with the residual variance split evenly"""
+    beta, *_ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ beta
+    m2 = np.mean(resid ** 2)
+    m3 = np.mean(resid ** 3)
+    var_u = abs(m3 * math.sqrt(math.pi / 2.0) / (1.0 - 4.0 / math.pi)) ** (2.0 / 3.0)
+    var_v = abs(m2 - (1.0 - 2.0 / math.pi) * var_u)
+    var_u = max(var_u, 1e-6 * m2)
+    var_v = max(var_v, 1e-6 * m2)
+    moments = beta.copy()
+    moments[0] += math.sqrt(2.0 * var_u / math.pi)
+    even = beta.copy()
+    even[0] += math.sqrt(m2 / math.pi)
+    return [
+        np.concatenate([moments, [math.log(var_u), math.log(var_v)]]),
+        np.concatenate([even, [math.log(m2 / 2.0), math.log(m2 / 2.0)]]),
+    ]
+
+
+def _objective(theta, y, X):
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        ll, grad = log_likelihood(theta, y, X)
+    if not np.isfinite(ll) or not np.all(np.isfinite(grad)):
+        return np.inf, np.zeros_like(theta)
+    return -ll, -grad
+
+
+def fit_frontier(
+    y: np.ndarray,
+    X: np.ndarray,
+    warm_start: Optional[np.ndarray] = None,
+    deadline: Optional[float] = None
+) -> FrontierFit:
+    """Maximize the log-likelihood with BFGS from several starting points
+    and keep the best optimum.
+
+    A cold fit tries both points of start_values. A warm start (e.g. the
+    previous year's estimates of the same output) replaces the slower
+    moment start; the even-split OLS start is always tried as well.
+
+    Raises FitTimeout once time.monotonic() passes ``deadline``; it is
+    checked every iteration, which takes microseconds at this size.
+    """
+    def check_deadline(xk):
+        if deadline is not None and time.monotonic() > deadline:
+            raise FitTimeout()
+
+    moments, even = start_values(y, X)
+    starts = [moments, even] if warm_start is None else [np.asarray(warm_start, dtype=float), even]
+    best = None
+    for theta0 in starts:
+        result = minimize(
+            _objective, theta0, args=(y, X), jac=True, method='BFGS',
+            callback=check_deadline, options={'gtol': GTOL, 'maxiter': MAX_ITER}
+        )
+        # Status 2: the line search cannot improve further in floating point,
+        # typical when a variance runs to the boundary as in sfaR's fits
+        stopped = result.status in (0, 2)
+        if best is None or (stopped, -result.fun) > (best.status in (0, 2), -best.fun):
+            best = result
+
+    k = X.shape[1]
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        ll, grad = log_likelihood(best.x, y, X)
+    return FrontierFit(
+        beta=best.x[:k].copy(),
+        log_var_u=float(best.x[k]),
+        log_var_v=float(best.x[k + 1]),
+        loglik=float(ll),
+        n=len(y),
+        iterations=int(best.nit),
+        # A stop below the OLS likelihood is a stalled start, not an optimum
+        converged=bool(
+            np.isfinite(ll) and best.status in (0, 2) and ll >= ols_loglik(y, X) - OLS_TOLERANCE
+        ),
+        gradient_norm=float(np.linalg.norm(grad))
+    )
+
+
+def batch_efficiencies(theta: np.ndarray, y: np.ndarray, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """JLMS exp(-E[u|e]) and Battese-Coelli E[exp(-u)|e] technical
+    efficiencies of every observation, (batch, n), under each row of ``theta``"""
+    k = X.shape[1]
+    var_u = np.exp(theta[:, k:k + 1])
+    var_v = np.exp(theta[:, k + 1:k + 2])
+    var = var_u + var_v
+    eps = y - theta[:, :k] @ X.T
+    mu = -eps * var_u / var
+    sigma = np.sqrt(var_u * var_v / var)
+    ratio = mu / sigma
+    log_cdf = log_ndtr(ratio)
+    # phi(r) / Phi(r) through erfcx stays accurate when s_v -> 0 drives the
+    # ratio to +-1e12, where exp(-r^2/2 - log Phi(r)) cancels to garbage
+    mills = math.sqrt(2.0 / math.pi) / erfcx(-ratio / math.sqrt(2.0))
+    expected_u = mu + sigma * mills
+    jlms = np.exp(-expected_u)
+    bc = np.exp(-mu + 0.5 * sigma * sigma + log_ndtr(ratio - sigma) - log_cdf)
+    return jlms, bc
+
+
+def efficiencies(fit: FrontierFit, y: np.ndarray, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """JLMS and Battese-Coelli efficiencies under one fit"""
+    jlms, bc = batch_efficiencies(fit.params[None], y, X)
+    return jlms[0], bc[0]
+
+
+def batch_bfgs(
+    objective: Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]],
+    theta0: np.ndarray,
+    deadline: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Minimize a batch of independent problems with BFGS in lockstep.
+
+    ``objective(theta, index)`` returns values and gradients of the batch
+    rows ``index`` at ``theta``, inf where infeasible. Every row keeps its
+    own inverse Hessian and takes a backtracking (Armijo) step each
+    iteration, so one array expression advances all rows still moving.
+    Returns the minimizers, their values and a status per row as scipy
+    reports it: 0 gradient below GTOL, 1 out of iterations, 2 no further
+    decrease (below FTOL or in floating point).
+    """
+    theta = np.array(theta0, dtype=float)
+    count, size = theta.shape
+    identity = np.eye(size)
+    value, grad = objective(theta, np.arange(count))
+    status = np.where(np.isfinite(value), 1, 2)
+    inverse = np.tile(identity, (count, 1, 1))
+    scaled = np.zeros(count, dtype=bool)
+
+    for _ in range(MAX_ITER):
+        status[(status == 1) & (np.abs(grad).max(axis=1) < GTOL)] = 0
+        active = np.flatnonzero(status == 1)
+        if not len(active):
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            raise FitTimeout()
+
+        direction = -np.einsum('bij,bj->bi', inverse[active], grad[active])
+        slope = np.einsum('bi,bi->b', direction, grad[active])
+        # Fall back to steepest descent where the update lost positive definiteness
+        uphill = slope >= 0
+        if uphill.any():
+            inverse[active[uphill]] = identity
+            direction[uphill] = -grad[active[uphill]]
+            slope[uphill] = -np.einsum('bi,bi->b', grad[active[uphill]], grad[active[uphill]])
+
+        step = np.ones(len(active))
+        new_value = np.full(len(active), np.inf)
+        new_grad = np.zeros((len(active), size))
+        pending = np.arange(len(active))
+        for _ in range(LINE_SEARCH_STEPS):
+            rows = active[pending]
+            trial_value, trial_grad = objective(theta[rows] + step[pending, None] * direction[pending], rows)
+            accepted = trial_value <= value[rows] + ARMIJO * step[pending] * slope[pending]
+            new_value[pending[accepted]] = trial_value[accepted]
+            new_grad[pending[accepted]] = trial_grad[accepted]
+            pending = pending[~accepted]
+            if not len(pending):
+                break
+            step[pending] *= 0.5
+
+        moved = np.isfinite(new_value)
+        status[active[~moved]] = 2
+        rows = active[moved]
+        stalled = value[rows] - new_value[moved] <= FTOL * np.maximum(np.abs(value[rows]), 1.0)
+        s = step[moved, None] * direction[moved]
+        change = new_grad[moved] - grad[rows]
+        theta[rows] += s
+        value[rows] = new_value[moved]
+        grad[rows] = new_grad[moved]
+        status[rows[stalled]] = 2
+
+        # Armijo steps do not guarantee positive curvature; skip the update without it
+        curvature = np.einsum('bi,bi->b', s, change)
+        update = curvature > np.finfo(float).eps * np.linalg.norm(s, axis=1) * np.linalg.norm(change, axis=1)
+        rows, s, change, curvature = rows[update], s[update], change[update], curvature[update]
+        # Scale the first update to the curvature seen (Nocedal & Wright, eq. 6.20)
+        first = ~scaled[rows]
+        inverse[rows[first]] = (
+            curvature[first] / np.einsum('bi,bi->b', change[first], change[first])
+        )[:, None, None] * identity
+        scaled[rows] = True
+        rho = (1.0 / curvature)[:, None, None]
+        left = identity - rho * s[:, :, None] * change[:, None, :]
+        inverse[rows] = left @ inverse[rows] @ left.transpose(0, 2, 1) + rho * s[:, :, None] * s[:, None, :]
+
+    return theta, value, status
+
+
+def batch_ols(y: np.ndarray, X: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted least squares for every row of ``weights``: coefficients
+    (batch, k) and residual variances (batch,)"""
+    gram = np.einsum('bn,ni,nj->bij', weights, X, X)
+    beta = np.einsum('bij,bj->bi', np.linalg.pinv(gram), weights @ (X * y[:, None]))
+    resid = y - beta @ X.T
+    var = np.sum(weights * resid * resid, axis=1) / weights.sum(axis=1)
+    return beta, var
+
+
+def fit_replicates(
+    y: np.ndarray,
+    X: np.ndarray,
+    weights: np.ndarray,
+    start: np.ndarray,
+    deadline: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Refit one model on every bootstrap replicate in one batch.
+
+    ``weights`` (replicate, n) are the draw counts. Every replicate starts
+    from the full-sample estimates ``start``; the ones that do not converge
+    are retried from their own OLS fit with the variance split evenly. A
+    replicate converges by fit_frontier's rules. Returns the estimates and
+    the converged mask.
+    """
+    def objective(batch_rows):
+        def evaluate(theta, index):
+            with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                ll, grad = batch_log_likelihood(theta, y, X, weights[batch_rows[index]])
+            bad = ~np.isfinite(ll) | ~np.isfinite(grad).all(axis=1)
+            return np.where(bad, np.inf, -ll), np.where(bad[:, None], 0.0, -grad)
+        return evaluate
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        beta, var = batch_ols(y, X, weights)
+        ols_ll = -0.5 * weights.sum(axis=1) * (np.log(2.0 * math.pi * var) + 1.0)
+        even = np.column_stack([beta, np.log(var / 2.0), np.log(var / 2.0)])
+        even[:, 0] += np.sqrt(var / math.pi)
+    # Like fit_model, a replicate needs more distinct observations than parameters
+    enough = (weights > 0).sum(axis=1) > X.shape[1] + 2
+
+    def converged(value, status, batch_rows):
+        return (
+            enough[batch_rows] & np.isfinite(value) & (status != 1)
+            & (-value >= ols_ll[batch_rows] - OLS_TOLERANCE)
+        )
+
+    everything = np.arange(len(weights))
+    theta, value, status = batch_bfgs(objective(everything), np.tile(start, (len(weights), 1)), deadline)
+    done = converged(value, status, everything)
+
+    retry = np.flatnonzero(~done & enough)
+    if len(retry):
+        retried, value, status = batch_bfgs(objective(retry), even[retry], deadline)
+        better = converged(value, status, retry)
+        theta[retry[better]] = retried[better]
+        done[retry[better]] = True
+    return theta, done
+
+
+def _rank(column: pd.Series) -> pd.Series:
+    """rank(-x, na.last="keep"): best first, ties averaged"""
+    return column.rank(ascending=False, method='average', na_option='keep')
+
+
+@dataclass
+class ModelResult:
+    """Outcome of one (year, output) model; ``fit`` is None when it failed"""
+    year: int
+    output: str
+    rows: np.ndarray
+    efficiency: np.ndarray
+    fit: Optional[FrontierFit]
+    seconds: float
+    error: Optional[str] = None
+    cached: bool = False
+
+
+def fit_model(
+    year: int,
+    output: str,
+    rows: np.ndarray,
+    y: np.ndarray,
+    X: np.ndarray,
+    timeout: Optional[float] = MODEL_TIMEOUT,
+    warm_start: Optional[np.ndarray] = None
+) -> ModelResult:
+    """Fit one model and its JLMS efficiencies; never raises, so one bad
+    model cannot take down the grid (like try() in the R script)"""
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout if timeout else None
+    fit = None
+    efficiency = np.empty(0)
+    error = None
+    if len(rows) <= X.shape[1] + 2:
+        error = f"only {len(rows)} observations"
+    else:
+        try:
+            fit = fit_frontier(y, X, warm_start=warm_start, deadline=deadline)
+            if fit.converged:
+                efficiency = efficiencies(fit, y, X)[0]
+            else:
+                error = "did not converge"
+        except FitTimeout:
+            error = f"timed out after {timeout:g}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+    return ModelResult(year, output, rows, efficiency, fit, time.perf_counter() - started, error)
+
+
+class ModelCache:
+    """Converged fits on disk, one .npz per model, keyed by a hash of the
+    model's data, its starting point and MODEL_SPEC"""
+
+    def __init__(self, directory: Path = MODEL_CACHE):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(rows: np.ndarray, y: np.ndarray, X: np.ndarray, start: Optional[np.ndarray] = None) -> str:
+        """``start`` is the warm start the fit begins from, None for a cold fit;
+        the optimum BFGS reaches on a flat likelihood depends on it"""
+        digest = hashlib.sha256(json.dumps(MODEL_SPEC, sort_keys=True).encode('utf-8'))
+        arrays = [rows.astype(np.int64), y, X]
+        if start is None:
+            digest.update(b'cold')
+        else:
+            digest.update(b'warm')
+            arrays.append(np.asarray(start, dtype=float))
+        for array in arrays:
+            digest.update(str(array.shape).encode('utf-8'))
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str, year: int, output: str) -> Optional[ModelResult]:
+        path = self.directory / f"{key}.npz"
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                fit = FrontierFit(
+                    beta=entry['beta'],
+                    log_var_u=float(entry['log_var_u']),
+                    log_var_v=float(entry['log_var_v']),
+                    loglik=float(entry['loglik']),
+                    n=int(entry['n']),
+                    iterations=int(entry['iterations']),
+                    converged=True,
+                    gradient_norm=float(entry['gradient_norm'])
+                )
+                return ModelResult(year, output, entry['rows'], entry['efficiency'], fit, 0.0, cached=True)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def put(self, key: str, result: ModelResult):
+        """Store a converged fit; failures and timeouts are always refitted"""
+        if result.error is not None or result.cached:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{key}.npz"
+        tmp_path = path.with_name(path.name + '.tmp')
+        fit = result.fit
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, beta=fit.beta, log_var_u=fit.log_var_u, log_var_v=fit.log_var_v,
+                loglik=fit.loglik, n=fit.n, iterations=fit.iterations,
+                gradient_norm=fit.gradient_norm, rows=result.rows, efficiency=result.efficiency
+            )
+        os.replace(tmp_path, path)
+
+
+def fit_chain(
+    chain: List[tuple],
+    timeout: Optional[float] = MODEL_TIMEOUT,
+    cache: Optional[ModelCache] = None,
+    start: Optional[np.ndarray] = None
+) -> List[ModelResult]:
+    """Fit models in order, each warm-started from the previous converged one.
+
+    ``chain`` holds (year, output, rows, y, X) per model and ``start`` seeds
+    the first one. A model that ``cache`` holds for the same data and start
+    is used as is and still seeds the next fit; new converged fits are
+    stored in it.
+    """
+    results = []
+    previous = start
+    for year, output, rows, y, X in chain:
+        key = ModelCache.key(rows, y, X, previous)
+        result = cache.get(key, year, output) if cache is not None else None
+        if result is None:
+            result = fit_model(year, output, rows, y, X, timeout, warm_start=previous)
+            if cache is not None:
+                cache.put(key, result)
+        previous = result.fit.params if result.error is None else None
+        results.append(result)
+    return results
+
+
+def fit_grid(
+    frames: Dict[int, pd.DataFrame],
+    outputs: Sequence[str] = OUTPUTS,
+    inputs: Sequence[str] = INPUTS,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = MODEL_TIMEOUT,
+    warm: bool = True,
+    cache: Optional[ModelCache] = None
+) -> Dict[Tuple[int, str], ModelResult]:
+    """Fit every (year, output) model on a process pool (default: all cores).
+
+    With ``warm`` each output is one chain over the years, seeded year to
+    year; otherwise every model is independent. Models found in ``cache``
+    for the same data and start are not refitted. Results are keyed and
+    ordered by year, then output, whatever order the workers finish in.
+    """
+    models = {}
+    for year, frame in frames.items():
+        for output in outputs:
+            rows, y, X = design(frame, output, inputs)
+            models[(year, output)] = (year, output, rows, y, X)
+
+    if warm:
+        chains = [[models[(year, output)] for year in frames] for output in outputs]
+    else:
+        chains = [[model] for model in models.values()]
+
+    # Follow each chain through the cache; a start is only known once the
+    # model before it is, so the first miss and the rest go to a worker
+    results = {}
+    pending = []
+    for chain in chains:
+        start = None
+        for n, (year, output, rows, y, X) in enumerate(chain):
+            cached = cache.get(ModelCache.key(rows, y, X, start), year, output) if cache is not None else None
+            if cached is None:
+                pending.append((chain[n:], start))
+                break
+            results[(year, output)] = cached
+            start = cached.fit.params
+
+    workers = min(workers or os.cpu_count() or 1, max(len(pending), 1))
+    if workers == 1:
+        for chain, start in pending:
+            for result in fit_chain(chain, timeout, cache, start):
+                results[(result.year, result.output)] = result
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(chain, executor.submit(fit_chain, chain, timeout, cache, start)) for chain, start in pending]
+            for chain, future in futures:
+                try:
+                    for result in future.result():
+                        results[(result.year, result.output)] = result
+                except Exception as e:
+                    # The worker process died (e.g. killed); only its chain is lost
+                    for year, output, rows, *_ in chain:
+                        results[(year, output)] = ModelResult(year, output, rows, np.empty(0), None, 0.0, f"worker failed: {e}")
+
+    return {key: results[key] for key in models}
+
+
+@dataclass
+class BootstrapResult:
+    """Bootstrap of one (year, output) model: efficiencies of the model's
+    rows under every replicate's refit, (replicate, row), NaN for the
+    replicates that did not converge"""
+    year: int
+    output: str
+    rows: np.ndarray
+    efficiency: np.ndarray
+    converged: np.ndarray
+    seconds: float
+    error: Optional[str] = None
+
+
+def resample_counts(size: int, replicates: int, seed: int, year: int) -> np.ndarray:
+    """Pairs-bootstrap draw counts (replicate, university) of one year.
+
+    The draws depend only on the seed and the year and are shared by all
+    outputs, so a replicate resamples universities and every model of the
+    year sees the same resample, whichever worker fits it.
+    """
+    rng = np.random.default_rng([seed, year])
+    return rng.multinomial(size, np.full(size, 1.0 / size), size=replicates)
+
+
+def bootstrap_model(
+    year: int,
+    output: str,
+    rows: np.ndarray,
+    y: np.ndarray,
+    X: np.ndarray,
+    start: np.ndarray,
+    counts: np.ndarray,
+    timeout: Optional[float] = MODEL_TIMEOUT
+) -> BootstrapResult:
+    """Refit one model on all replicates of ``counts`` in one batch and
+    score its original rows under each refit; never raises, like fit_model"""
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout if timeout else None
+    efficiency = np.full((len(counts), len(rows)), np.nan)
+    converged = np.zeros(len(counts), dtype=bool)
+    error = None
+    try:
+        theta, done = fit_replicates(y, X, counts[:, rows].astype(float), start, deadline)
+        efficiency[done] = batch_efficiencies(theta[done], y, X)[0]
+        converged = done
+    except FitTimeout:
+        error = f"timed out after {timeout:g}s"
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return BootstrapResult(year, output, rows, efficiency, converged, time.perf_counter() - started, error)
+
+
+def bootstrap_grid(
+    frames: Dict[int, pd.DataFrame],
+    results: Dict[Tuple[int, str], ModelResult],
+    replicates: int,
+    seed: int = BOOTSTRAP_SEED,
+    inputs: Sequence[str] = INPUTS,
+    workers: Optional[int] = None,
+    timeout: Optional[float] = MODEL_TIMEOUT
+) -> Dict[Tuple[int, str], BootstrapResult]:
+    """Bootstrap every converged model of ``results`` on a process pool.
+
+    Each model is one task starting all its replicates from its own
+    full-sample fit, so the whole grid runs in parallel. Models that failed
+    get no entry; results are keyed and ordered like fit_grid's.
+    """
+    counts = {year: resample_counts(len(frame), replicates, seed, year) for year, frame in frames.items()}
+    tasks = {}
+    for (year, output), result in results.items():
+        if result.error is None:
+            rows, y, X = design(frames[year], output, inputs)
+            tasks[(year, output)] = (year, output, rows, y, X, result.fit.params, counts[year], timeout)
+
+    boots = {}
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    if workers == 1:
+        for key, task in tasks.items():
+            boots[key] = bootstrap_model(*task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {key: executor.submit(bootstrap_model, *task) for key, task in tasks.items()}
+            for key, future in futures.items():
+                try:
+                    boots[key] = future.result()
+                except Exception as e:
+                    # The worker process died (e.g. killed); only this model is lost
+                    year, output, rows, *_ = tasks[key]
+                    boots[key] = BootstrapResult(
+                        year, output, rows, np.full((replicates, len(rows)), np.nan),
+                        np.zeros(replicates, dtype=bool), 0.0, f"worker failed: {e}"
+                    )
+    return boots
+
+
+def score_year(
+    frame: pd.DataFrame,
+    results: Dict[str, ModelResult],
+    outputs: Sequence[str] = OUTPUTS
+) -> pd.DataFrame:
+    """Scores of one year in the layout the R script writes; a failed model
+    leaves its column NaN"""
+    efficiency = np.full((len(frame), len(outputs)), np.nan)
+    for j, output in enumerate(outputs):
+        result = results[output]
+        if result.error is None:
+            efficiency[result.rows, j] = result.efficiency
+    return build_scores(frame.iloc[:, 0], efficiency, outputs)
+
+
+def build_scores(names: pd.Series, efficiency: np.ndarray, outputs: Sequence[str] = OUTPUTS) -> pd.DataFrame:
+    """Uni, <y>-Skor, Ortalama/Medyan-Skor and every -Sıralama column"""
+    scores = pd.DataFrame({'Uni': names.to_numpy()})
+    for j, output in enumerate(outputs):
+        scores[f"{output}-Skor"] = efficiency[:, j]
+    scores['Ortalama-Skor'], scores['Medyan-Skor'] = weighted_scores(efficiency, METHODOLOGY_WEIGHTS)
+    for output in outputs:
+        scores[f"{output}-Sıralama"] = _rank(scores[f"{output}-Skor"])
+    scores['Ortalama-Sıralama'] = _rank(scores['Ortalama-Skor'])
+    scores['Medyan-Sıralama'] = _rank(scores['Medyan-Skor'])
+    return scores
+
+
+def score_intervals(
+    frame: pd.DataFrame,
+    results: Dict[str, ModelResult],
+    boots: Dict[str, BootstrapResult],
+    replicates: int,
+    level: float = CONFIDENCE_LEVEL,
+    outputs: Sequence[str] = OUTPUTS
+) -> Tuple[pd.DataFrame, int]:
+    """Bootstrap percentile intervals of Ortalama/Medyan-Skor and their
+    ranks for one year, as the -Alt/-Üst columns of INTERVAL_COLUMNS.
+
+    A replicate is used only if every model that converged on the full
+    sample converged on it too, so each one is a complete rescoring; all
+    replicates are scored and ranked in one batch. The bounds are replicate
+    values (lower and upper order statistics). Returns the columns and the
+    number of replicates used; the bounds are NaN when fewer than two are.
+    """
+    efficiency = np.full((replicates, len(frame), len(outputs)), np.nan)
+    usable = np.ones(replicates, dtype=bool)
+    for j, output in enumerate(outputs):
+        if results[output].error is not None:
+            # Left NaN, as in the point scores
+            continue
+        boot = boots.get(output)
+        if boot is None or boot.error is not None:
+            usable[:] = False
+            continue
+        efficiency[:, boot.rows, j] = boot.efficiency
+        usable &= boot.converged
+
+    mean, median = weighted_scores(efficiency[usable], METHODOLOGY_WEIGHTS)
+    samples = {}
+    for name, values in (('Ortalama', mean), ('Medyan', median)):
+        samples[f"{name}-Skor"] = values
+        samples[f"{name}-Sıralama"] = pd.DataFrame(values).rank(
+            axis=1, ascending=False, method='average', na_option='keep'
+        ).to_numpy()
+
+    intervals = pd.DataFrame(index=frame.index)
+    alpha = 100.0 * (1.0 - level) / 2.0
+    for column in INTERVAL_COLUMNS:
+        lower = upper = np.full(len(frame), np.nan)
+        if usable.sum() >= 2:
+            with warnings.catch_warnings():
+                # Universities without a score are NaN in every replicate
+                warnings.simplefilter('ignore', RuntimeWarning)
+                lower = np.nanpercentile(samples[column], alpha, axis=0, method='lower')
+                upper = np.nanpercentile(samples[column], 100.0 - alpha, axis=0, method='higher')
+        intervals[f"{column}-Alt"] = lower
+        intervals[f"{column}-Üst"] = upper
+    return intervals, int(usable.sum())
+
+
+def parse_reference(path: Path) -> Dict:
+    """Log likelihood, N, iterations and coefficients of an sfaR summary"""
+    text = Path(path).read_text(encoding='utf-8')
+    reference = {
+        'loglik': float(re.search(r"Log likelihood value:\s+(\S+)", text).group(1)),
+        'n': int(re.search(r"N =\s+(\d+)", text).group(1)),
+        'iterations': int(re.search(r"Log likelihood iter:\s+(\d+)", text).group(1)),
+        'coefficients': {},
+    }
+    for name, value in re.findall(r"^(\(Intercept\)|log\(x\d+\)|Zu_\(Intercept\)|Zv_\(Intercept\))\s+(\S+)", text, re.M):
+        reference['coefficients'][name] = float(value)
+    return reference
+
+
+def reference_params(reference: Dict, inputs: Sequence[str] = INPUTS) -> np.ndarray:
+    """Reference estimates in the order of FrontierFit.params"""
+    names = ['(Intercept)'] + [f"log({name})" for name in inputs] + ['Zu_(Intercept)', 'Zv_(Intercept)']
+    return np.array([reference['coefficients'][name] for name in names])
+
+
+def check_against_reference(
+    year: int,
+    fits: Dict[str, Optional[FrontierFit]],
+    tables: Path = REFERENCE_TABLES,
+    tolerance: float = 1e-3
+) -> Tuple[List[str], List[str]]:
+    """Compare fits with the sfaR summaries.
+
+    Returns mismatches and skipped outputs. When sfacross failed, the R
+    script's try() kept the previous model, so that table repeats the one
+    before it; such tables are skipped.
+    """
+    problems = []
+    skipped = []
+    previous = None
+    for output, fit in fits.items():
+        path = Path(tables) / f"SFA_{year}_{output}_hnormal.txt"
+        if not path.exists():
+            continue
+        reference = parse_reference(path)
+        if reference == previous:
+            skipped.append(f"{year} {output}")
+            continue
+        previous = reference
+        if fit is None or not fit.converged:
+            problems.append(f"{year} {output}: no converged fit (sfaR log likelihood {reference['loglik']:.5f})")
+            continue
+        if fit.n != reference['n']:
+            problems.append(f"{year} {output}: N {fit.n} != {reference['n']}")
+        if fit.loglik < reference['loglik'] - tolerance:
+            problems.append(f"{year} {output}: log likelihood {fit.loglik:.5f} < sfaR {reference['loglik']:.5f}")
+    return problems, skipped
+
+
+def check_scores(
+    year: int,
+    scores: pd.DataFrame,
+    published: pd.DataFrame,
+    tolerance: float = SCORE_TOLERANCE
+) -> List[str]:
+    """Compare one year's scores with the published ones, matched by
+    university; the coefficient tables alone miss boundary fits that reach
+    the same likelihood with a different intercept, and so other scores.
+
+    Returns a mismatch per -Skor column off by more than ``tolerance``
+    (including a score missing on one side only) and per rank column that
+    moves at all.
+    """
+    ours = scores.set_index('Uni')
+    theirs = published.set_index('Uni').reindex(ours.index)
+    problems = []
+    for column in [f"{output}-Skor" for output in OUTPUTS] + ['Ortalama-Skor', 'Medyan-Skor']:
+        if column not in theirs:
+            continue
+        a = ours[column].to_numpy(dtype=float)
+        b = theirs[column].to_numpy(dtype=float)
+        if (np.isnan(a) != np.isnan(b)).any():
+            problems.append(f"{year} {column}: missing for {int((np.isnan(a) != np.isnan(b)).sum())} universities on one side only")
+        both = ~np.isnan(a) & ~np.isnan(b)
+        if both.any() and np.abs(a[both] - b[both]).max() > tolerance:
+            problems.append(f"{year} {column}: differs by up to {np.abs(a[both] - b[both]).max():.4f}")
+    for column in ('Ortalama-Sıralama', 'Medyan-Sıralama'):
+        if column not in theirs:
+            continue
+        shift = np.nanmax(np.abs(ours[column].to_numpy(dtype=float) - theirs[column].to_numpy(dtype=float)), initial=0.0)
+        if shift > 0:
+            problems.append(f"{year} {column}: ranks move by up to {shift:g} places")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate SFA efficiency scores from the raw data")
+    parser.add_argument("--input", default=str(RAW_DATASET), help="Raw data Parquet dataset or workbook")
+    parser.add_argument("--output", default=str(SCORES_DATASET), help="SFA scores Parquet dataset to write")
+    parser.add_argument("--years", help="Comma separated years (default: all)")
+    parser.add_argument("--excel", action="store_true", help="Also write the scores workbook")
+    parser.add_argument(
+        "--check", action="store_true",
+        help="Compare fits with the sfaR reference tables and scores with the published dataset"
+    )
+    parser.add_argument(
+        "--published", default=str(SCORES_DATASET),
+        help=f"Published scores for --check (each score within {SCORE_TOLERANCE:g}, ranks equal)"
+    )
+    parser.add_argument("--workers", type=int, help="Parallel model fits (default: all cores)")
+    parser.add_argument(
+        "--timeout", type=float, default=MODEL_TIMEOUT,
+        help="Seconds per model before it is scored NaN (0: no limit)"
+    )
+    parser.add_argument(
+        "--cold", action="store_true",
+        help="Start every fit from OLS only; years of an output then run in parallel too"
+    )
+    parser.add_argument("--cache", default=str(MODEL_CACHE), help="Fitted-model cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Refit every model and leave the cache alone")
+    parser.add_argument(
+        "--bootstrap", type=int, default=0, metavar="REPLICATES",
+        help="Bootstrap replicates for confidence intervals of the scores and ranks (0: none)"
+    )
+    parser.add_argument("--level", type=float, default=CONFIDENCE_LEVEL, help="Confidence level of the intervals")
+    parser.add_argument("--seed", type=int, default=BOOTSTRAP_SEED, help="Bootstrap resampling seed")
+    args = parser.parse_args()
+    if args.bootstrap < 0:
+        parser.error("--bootstrap must be zero or positive")
+    if not 0 < args.level < 1:
+        parser.error("--level must be between 0 and 1")
+
+    input_path = Path(args.input)
+    if input_path.is_dir():
+        frames = read_dataset(input_path)
+    else:
+        frames = {int(name): df for name, df in pd.read_excel(input_path, sheet_name=None).items() if name.isdigit()}
+    if args.years:
+        selected = {int(year) for year in args.years.split(',')}
+        frames = {year: df for year, df in frames.items() if year in selected}
+    # Read before --output, which is the same dataset by default, is rewritten
+    published = read_dataset(Path(args.published)) if args.check else {}
+
+    started = time.perf_counter()
+    cache = None if args.no_cache else ModelCache(Path(args.cache))
+    results = fit_grid(frames, workers=args.workers, timeout=args.timeout or None, warm=not args.cold, cache=cache)
+    elapsed = time.perf_counter() - started
+    for result in results.values():
+        status = "cached" if result.cached else "ok" if result.error is None else result.error
+        print(f"  {result.year} {result.output}: {result.seconds:.2f}s ({status})")
+    model_seconds = sum(result.seconds for result in results.values())
+    print(f"Fitted {len(results)} models in {elapsed:.1f}s ({model_seconds:.1f}s of model time)")
+
+    boots = {}
+    if args.bootstrap:
+        started = time.perf_counter()
+        boots = bootstrap_grid(frames, results, args.bootstrap, args.seed, workers=args.workers, timeout=args.timeout or None)
+        elapsed = time.perf_counter() - started
+        for boot in boots.values():
+            status = "ok" if boot.error is None else boot.error
+            print(f"  {boot.year} {boot.output}: {boot.seconds:.2f}s, {int(boot.converged.sum())}/{args.bootstrap} replicates ({status})")
+        model_seconds = sum(boot.seconds for boot in boots.values())
+        print(f"Bootstrapped {len(boots)} models x {args.bootstrap} replicates in {elapsed:.1f}s ({model_seconds:.1f}s of model time)")
+
+    scores = {}
+    problems = []
+    skipped = []
+    for year, frame in frames.items():
+        year_results = {output: results[(year, output)] for output in OUTPUTS}
+        scores[year] = score_year(frame, year_results)
+        converged = sum(1 for result in year_results.values() if result.error is None)
+        print(f"Year {year}: {converged}/{len(year_results)} models converged")
+        if args.bootstrap:
+            year_boots = {output: boots[(year, output)] for output in OUTPUTS if (year, output) in boots}
+            intervals, used = score_intervals(frame, year_results, year_boots, args.bootstrap, args.level)
+            scores[year] = pd.concat([scores[year], intervals], axis=1)
+            # Carried in the Parquet metadata for excel_to_json.py
+            scores[year].attrs['bootstrap'] = {'replicates': args.bootstrap, 'level': args.level, 'seed': args.seed}
+            print(f"Year {year}: intervals from {used}/{args.bootstrap} replicates")
+        if args.check:
+            fits = {output: result.fit for output, result in year_results.items()}
+            mismatches, stale = check_against_reference(year, fits)
+            problems += mismatches
+            skipped += stale
+            if year in published:
+                problems += check_scores(year, scores[year], published[year])
+
+    output = Path(args.output)
+    write_dataset(scores, output, output.with_suffix('.xlsx') if args.excel else None)
+    print(f"Scores saved to: {output}")
+
+    if args.check:
+        for problem in problems:
+            print(f"✗ {problem}")
+        if skipped:
+            print(f"Skipped tables repeating a failed sfaR fit: {', '.join(skipped)}")
+        print(f"Reference check: {len(problems)} mismatches")
+        return not problems
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,16 +1,167 @@
 #!/usr/bin/env python3
 """
 Complete data update workflow for UniSkor
-1. Run YÖKAK scraping (yokak3.py)
-2. Run R analysis (Etkinlik_skorlari.R)
-3. Convert Excel to JSON (excel_to_json.py)
+1. Run YÖKAK scraping (yokak3_selenium.py)
+2. Estimate SFA scores (Etkinlik_skorlari.R, or sfa.py with --engine python)
+3. Convert SFA scores to JSON (excel_to_json.py)
 4. Update frontend data
+
+Stages hand data to each other as per-year Parquet datasets (see
+data/interchange.py); --excel also writes the old workbooks for people.
+--bootstrap N adds confidence intervals of the scores and ranks (python
+engine only), which the converter carries into data.json. The python
+engine does not yet reproduce the published R scores where a variance
+runs to its boundary; sfa.py --check lists how far off it is.
+
+Each step declares its code, inputs, parameters and outputs. A step is
+skipped when the content hash of those matches a previous run whose
+outputs are still in place (or can be restored from the build cache), so
+re-running after editing only the converter or the R script does not
+scrape again. The scrape has no hashable input (the YÖKAK site), so it is
+re-run only with --force or --from-step scrape.
 """
 
-import subprocess
+import argparse
+import hashlib
+import json
 import os
+import shutil
+import subprocess
 import sys
+from dataclasses import dataclass, field, replace
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SCRIPTS_DIR.parent
+DATA_DIR = BACKEND_DIR / "data"
+
+# Manifest of the last fingerprints plus copies of step outputs per fingerprint
+CACHE_DIR = Path(os.getenv("UNISKOR_BUILD_CACHE", SCRIPTS_DIR / ".build-cache"))
+# Cached artifact sets kept per step
+CACHE_KEEP = int(os.getenv("UNISKOR_BUILD_CACHE_KEEP", "3"))
+
+RAW_DATASET = DATA_DIR / "Hamveri 26102024"
+TRANSLOG_DATASET = DATA_DIR / "Hamveri Translog 26102024"
+SCORES_DATASET = SCRIPTS_DIR / "SFA Skorlar 26102024"
+REGRESSION_TABLES = SCRIPTS_DIR / "SFA Regression Tables with 13 vars"
+JSON_OUTPUT = DATA_DIR / "data.json"
+
+@dataclass
+class Step:
+    """One node of the workflow; ordering follows from inputs and outputs"""
+    name: str
+    description: str
+    command: Callable[[argparse.Namespace], Optional[List[str]]]
+    cwd: Path
+    code: Sequence[Path]
+    inputs: Sequence[Path] = ()
+    outputs: Sequence[Path] = ()
+    params: Dict[str, str] = field(default_factory=dict)
+    # Written besides the outputs with --excel
+    workbooks: Sequence[Path] = ()
+
+def find_rscript():
+    """Return the first working Rscript executable, or None"""
+    for cmd in ["Rscript", "Rscript.exe", "/usr/bin/Rscript"]:
+        try:
+            subprocess.run([cmd, "--version"], check=True, capture_output=True)
+            return cmd
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            continue
+    return None
+
+def scrape_command(args):
+    cmd = [sys.executable, str(SCRIPTS_DIR / "yokak3_selenium.py"), "--no-analysis"]
+    return cmd + ["--excel"] if args.excel else cmd
+
+def analysis_command(args):
+    rscript_cmd = find_rscript()
+    if not rscript_cmd:
+        print("❌ Rscript not found. Please install R or add it to PATH.")
+        return None
+    return [rscript_cmd, "Etkinlik_skorlari.R", "0", "1" if args.excel else "0"]
+
+SCRAPE = Step(
+    name="scrape",
+    description="Running YÖKAK scraping with Selenium",
+    # Run from data/ so the datasets land where the R script reads them
+    command=scrape_command,
+    cwd=DATA_DIR,
+    code=[SCRIPTS_DIR / "yokak3_selenium.py"],
+    outputs=[RAW_DATASET, TRANSLOG_DATASET],
+    workbooks=[RAW_DATASET.with_suffix(".xlsx"), TRANSLOG_DATASET.with_suffix(".xlsx")],
+)
+
+ANALYSIS = {
+    "python": Step(
+        name="analysis",
+        description="Estimating SFA scores",
+        command=lambda args: [
+            sys.executable, "sfa.py",
+            "--input", str(RAW_DATASET), "--output", str(SCORES_DATASET),
+            "--bootstrap", str(args.bootstrap)
+        ] + (["--excel"] if args.excel else []),
+        cwd=SCRIPTS_DIR,
+        code=[
+            SCRIPTS_DIR / "sfa.py",
+            BACKEND_DIR / "data" / "interchange.py",
+            BACKEND_DIR / "data" / "rescoring.py",
+        ],
+        inputs=[RAW_DATASET],
+        outputs=[SCORES_DATASET],
+        workbooks=[SCORES_DATASET.with_suffix(".xlsx")],
+    ),
+    "r": Step(
+        name="analysis",
+        description="Running R analysis",
+        command=analysis_command,
+        cwd=SCRIPTS_DIR,
+        code=[SCRIPTS_DIR / "Etkinlik_skorlari.R"],
+        inputs=[RAW_DATASET],
+        outputs=[SCORES_DATASET, REGRESSION_TABLES],
+        params={"save_eff": "0"},
+        workbooks=[SCORES_DATASET.with_suffix(".xlsx")],
+    ),
+}
+
+CONVERT = Step(
+    name="convert",
+    description="Converting SFA scores to JSON",
+    command=lambda args: [
+        sys.executable, "excel_to_json.py",
+        "--input", str(SCORES_DATASET), "--output", str(JSON_OUTPUT)
+    ],
+    cwd=SCRIPTS_DIR,
+    code=[
+        SCRIPTS_DIR / "excel_to_json.py",
+        BACKEND_DIR / "data" / "binary.py",
+        BACKEND_DIR / "data" / "interchange.py",
+        BACKEND_DIR / "data" / "snapshot.py",
+        BACKEND_DIR / "data" / "versions.py",
+    ],
+    inputs=[SCORES_DATASET],
+    outputs=[JSON_OUTPUT, JSON_OUTPUT.with_suffix(".bin")],
+)
+
+STEP_NAMES = ("scrape", "analysis", "convert")
+
+def workflow(engine: str, bootstrap: int = 0, excel: bool = False) -> List[Step]:
+    """Steps in run order with the chosen scoring engine; bootstrap
+    replicates are a parameter of the analysis, so changing them reruns it.
+    With ``excel`` the workbooks become outputs of the steps writing them,
+    so a run without them is not reused and cached copies are restored."""
+    analysis = ANALYSIS[engine]
+    if bootstrap:
+        analysis = replace(analysis, params={**analysis.params, "bootstrap": str(bootstrap)})
+    steps = [SCRAPE, analysis, CONVERT]
+    if excel:
+        steps = [
+            replace(step, params={**step.params, "excel": "1"}, outputs=[*step.outputs, *step.workbooks])
+            if step.workbooks else step
+            for step in steps
+        ]
+    return steps
 
 def run_command(cmd, cwd=None):
     """Run a command and return success status"""
@@ -24,65 +175,199 @@ def run_command(cmd, cwd=None):
         print(f"Error output: {e.stderr}")
         return False
 
-def main():
-    """Main workflow"""
-    print("=== UniSkor Data Update Workflow ===\n")
-    
-    # Get current directory
-    base_dir = Path(__file__).parent
-    os.chdir(base_dir)
-    
-    # Step 1: Run YÖKAK scraping (Selenium version)
-    print("Step 1: Running YÖKAK scraping with Selenium...")
-    if not run_command([sys.executable, "yokak3_selenium.py"]):
-        print("❌ YÖKAK scraping failed. Check if ChromeDriver is installed.")
-        return False
-    
-    # Step 2: Run R analysis
-    print("\nStep 2: Running R analysis...")
-    r_script = "Etkinlik_skorlari.R"
-    if not os.path.exists(r_script):
-        print(f"❌ R script not found: {r_script}")
-        return False
-    
-    # Try to find Rscript
-    rscript_cmd = None
-    for cmd in ["Rscript", "Rscript.exe", "/usr/bin/Rscript"]:
+def _files(path: Path) -> List[Path]:
+    """A file, or every file under a directory in a stable order"""
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    return [path] if path.is_file() else []
+
+def hash_paths(paths: Sequence[Path]) -> str:
+    """Content hash of files and directories; missing paths hash as absent"""
+    digest = hashlib.sha256()
+    for path in paths:
+        files = _files(path)
+        digest.update(f"{path.relative_to(BACKEND_DIR)}:{len(files)}\n".encode("utf-8"))
+        for file in files:
+            digest.update(str(file.relative_to(BACKEND_DIR)).encode("utf-8"))
+            with open(file, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+def fingerprint(step: Step) -> str:
+    """Hash of everything that determines a step's outputs"""
+    digest = hashlib.sha256()
+    digest.update(step.name.encode("utf-8"))
+    digest.update(json.dumps(step.params, sort_keys=True).encode("utf-8"))
+    digest.update(hash_paths(step.code).encode("utf-8"))
+    digest.update(hash_paths(step.inputs).encode("utf-8"))
+    return digest.hexdigest()
+
+def downstream(steps: Sequence[Step], name: str) -> List[str]:
+    """A step and every step that (transitively) consumes its outputs"""
+    produced = set()
+    selected = []
+    for step in steps:
+        if step.name == name or produced.intersection(step.inputs):
+            selected.append(step.name)
+            produced.update(step.outputs)
+    return selected
+
+class BuildCache:
+    """Last fingerprint per step and the outputs it produced, by fingerprint"""
+
+    def __init__(self, directory: Path = CACHE_DIR):
+        self.directory = directory
+        self.manifest_path = directory / "manifest.json"
         try:
-            subprocess.run([cmd, "--version"], check=True, capture_output=True)
-            rscript_cmd = cmd
-            break
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            continue
-    
-    if not rscript_cmd:
-        print("❌ Rscript not found. Please install R or add it to PATH.")
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+
+    def _artifact_dir(self, step: Step, key: str) -> Path:
+        return self.directory / step.name / key
+
+    def is_current(self, step: Step, key: str) -> bool:
+        """Outputs in place were produced from this fingerprint and are unmodified"""
+        entry = self.manifest.get(step.name)
+        return (
+            entry is not None
+            and entry["fingerprint"] == key
+            and all(path.exists() for path in step.outputs)
+            and entry["outputs"] == hash_paths(step.outputs)
+        )
+
+    def restore(self, step: Step, key: str) -> bool:
+        """Copy cached outputs of this fingerprint back into place"""
+        artifacts = self._artifact_dir(step, key)
+        if not artifacts.is_dir():
+            return False
+        for n, path in enumerate(step.outputs):
+            cached = artifacts / str(n)
+            if not cached.exists():
+                return False
+        for n, path in enumerate(step.outputs):
+            cached = artifacts / str(n)
+            if path.is_dir():
+                shutil.rmtree(path)
+            if cached.is_dir():
+                shutil.copytree(cached, path)
+            else:
+                # Replace rather than overwrite: the API may memory-map data.bin
+                tmp_path = path.with_name(path.name + ".tmp")
+                shutil.copyfile(cached, tmp_path)
+                os.replace(tmp_path, path)
+        self._record(step, key)
+        return True
+
+    def store(self, step: Step, key: str):
+        """Keep a copy of a step's fresh outputs and record its fingerprint"""
+        artifacts = self._artifact_dir(step, key)
+        if artifacts.exists():
+            shutil.rmtree(artifacts)
+        artifacts.mkdir(parents=True)
+        for n, path in enumerate(step.outputs):
+            if path.is_dir():
+                shutil.copytree(path, artifacts / str(n))
+            elif path.exists():
+                shutil.copyfile(path, artifacts / str(n))
+        self._prune(step, key)
+        self._record(step, key)
+
+    def _prune(self, step: Step, key: str):
+        entries = sorted(
+            (p for p in (self.directory / step.name).iterdir() if p.name != key),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        for stale in entries[max(CACHE_KEEP - 1, 0):]:
+            shutil.rmtree(stale)
+
+    def _record(self, step: Step, key: str):
+        self.manifest[step.name] = {"fingerprint": key, "outputs": hash_paths(step.outputs)}
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+def run_step(step: Step, cache: BuildCache, forced: bool, args: argparse.Namespace) -> bool:
+    """Run a step unless its outputs are current or cached"""
+    # Inputs are hashed after upstream steps ran, so changes propagate
+    key = fingerprint(step)
+    if not forced:
+        if cache.is_current(step, key):
+            print(f"✓ Up to date ({key[:12]}), skipped")
+            return True
+        if cache.restore(step, key):
+            print(f"✓ Restored from build cache ({key[:12]})")
+            return True
+
+    missing = [path for path in step.inputs if not path.exists()]
+    if missing:
+        print(f"❌ Missing inputs: {', '.join(str(path) for path in missing)}")
         return False
-    
-    if not run_command([rscript_cmd, r_script, "0"]):
-        print("❌ R analysis failed.")
+
+    cmd = step.command(args)
+    if cmd is None or not run_command(cmd, cwd=step.cwd):
         return False
-    
-    # Step 3: Convert Excel to JSON
-    print("\nStep 3: Converting Excel to JSON...")
-    if not run_command([sys.executable, "excel_to_json.py"]):
-        print("❌ Excel to JSON conversion failed.")
+
+    missing = [path for path in step.outputs if not path.exists()]
+    if missing:
+        print(f"❌ Expected outputs not created: {', '.join(str(path) for path in missing)}")
         return False
-    
+    cache.store(step, key)
+    return True
+
+def main():
+    """Main workflow"""
+    parser = argparse.ArgumentParser(description="Scrape, analyse and convert UniSkor data")
+    parser.add_argument("--force", action="store_true", help="Run every step, ignoring the build cache")
+    parser.add_argument(
+        "--from-step", choices=STEP_NAMES,
+        help="Run this step and everything downstream of it, ignoring the build cache"
+    )
+    parser.add_argument("--excel", action="store_true", help="Also write Excel workbooks from the steps that run")
+    parser.add_argument(
+        "--engine", choices=sorted(ANALYSIS), default="r",
+        help="Estimate scores with Etkinlik_skorlari.R (r) or in-process (python, not yet equal to R's scores)"
+    )
+    parser.add_argument(
+        "--bootstrap", type=int, default=0, metavar="REPLICATES",
+        help="Bootstrap confidence intervals of the scores and ranks (python engine; 0: none)"
+    )
+    args = parser.parse_args()
+    if args.bootstrap and args.engine != "python":
+        parser.error("--bootstrap needs --engine python")
+
+    print("=== UniSkor Data Update Workflow ===\n")
+
+    steps = workflow(args.engine, args.bootstrap, args.excel)
+    forced = set(downstream(steps, args.from_step)) if args.from_step else set()
+    cache = BuildCache()
+
+    for number, step in enumerate(steps, 1):
+        print(f"Step {number}: {step.description}...")
+        if not run_step(step, cache, args.force or step.name in forced, args):
+            print(f"❌ Step '{step.name}' failed.")
+            return False
+        print()
+
     # Step 4: Verify output
-    print("\nStep 4: Verifying output...")
-    json_path = "../data/data.json"
+    print(f"Step {len(steps) + 1}: Verifying output...")
+    json_path = JSON_OUTPUT
     if not os.path.exists(json_path):
         print(f"❌ JSON output not found: {json_path}")
         return False
-    
+
     # Check file size
     size = os.path.getsize(json_path)
     print(f"✓ JSON file created: {json_path} ({size:,} bytes)")
-    
+
     print("\n🎉 Data update completed successfully!")
     print("You can now run the frontend with: cd uniskor-web && npm run dev")
-    
+
     return True
 
 if __name__ == "__main__":
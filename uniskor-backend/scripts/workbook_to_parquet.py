@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Workbook to Parquet converter for UniSkor data
+Turns an existing per-year workbook (Hamveri, SFA Skorlar) into the
+per-year Parquet dataset the pipeline stages exchange
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Make the backend packages (data/) importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.interchange import write_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a per-year workbook to a Parquet dataset")
+    parser.add_argument("workbook", help="Workbook with one sheet per year")
+    parser.add_argument("output", nargs="?", help="Dataset directory (default: workbook path without .xlsx)")
+    args = parser.parse_args()
+
+    workbook = Path(args.workbook)
+    output = Path(args.output) if args.output else workbook.with_suffix("")
+    sheets = pd.read_excel(workbook, sheet_name=None)
+    frames = {int(name): df for name, df in sheets.items() if name.isdigit()}
+    write_dataset(frames, output)
+    print(f"Wrote {len(frames)} years to {output}")
+
+if __name__ == "__main__":
+    main()
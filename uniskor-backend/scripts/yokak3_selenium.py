@@ -1,3 +1,4 @@
+import sys
 import time
 import pandas as pd
 import numpy as np
@@ -11,6 +12,12 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import logging
+from pathlib import Path
+
+# Make the backend packages (data/) importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data.interchange import write_dataset
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -313,27 +320,34 @@ def main():
             # Rate limiting
             time.sleep(1)
         
-        # Excel dosyalarına kaydet
-        logger.info("Excel dosyaları oluşturuluyor...")
+        # Parquet veri setlerine kaydet (yıl başına bir dosya); Excel isteğe bağlı
+        logger.info("Parquet veri setleri oluşturuluyor...")
+        save_excel = "--excel" in sys.argv[1:]
         
         column_names0 = ["Uni"] + ["y" + str(x) for x in range(1, 14)] + ["x" + str(x) for x in range(1, 6)]
         
-        with pd.ExcelWriter('Hamveri 26102024.xlsx') as writer:
-            for year, df in all_data.items():
-                if not df.empty:
-                    df[column_names0[1:]] = df[column_names0[1:]].apply(pd.to_numeric, errors='coerce')
-                    df.to_excel(writer, sheet_name=str(year), engine='openpyxl', index=False)
-        
-        with pd.ExcelWriter('Hamveri Translog 26102024.xlsx') as writer:
-            for year, df in all_data.items():
-                if not df.empty:
-                    df[column_names0[1:]] = df[column_names0[1:]].apply(pd.to_numeric, errors='coerce')
-                    for zz in range(1, 19):
-                        if zz < len(column_names0):
-                            df[column_names0[zz]] = df[column_names0[zz]].div(df[column_names0[zz]].mean())
-                    df.to_excel(writer, sheet_name=str(year), engine='openpyxl', index=False)
-        
-        logger.info("Excel dosyaları başarıyla oluşturuldu!")
+        raw_data = {}
+        translog_data = {}
+        for year, df in all_data.items():
+            if not df.empty:
+                df[column_names0[1:]] = df[column_names0[1:]].apply(pd.to_numeric, errors='coerce')
+                raw_data[year] = df
+                translog = df.copy()
+                for zz in range(1, 19):
+                    if zz < len(column_names0):
+                        translog[column_names0[zz]] = translog[column_names0[zz]].div(translog[column_names0[zz]].mean())
+                translog_data[year] = translog
+        
+        write_dataset(raw_data, Path('Hamveri 26102024'),
+                      Path('Hamveri 26102024.xlsx') if save_excel else None)
+        write_dataset(translog_data, Path('Hamveri Translog 26102024'),
+                      Path('Hamveri Translog 26102024.xlsx') if save_excel else None)
+        
+        logger.info("Veri setleri başarıyla oluşturuldu!")
+        
+        # update_data.py R analizini ayrı bir adım olarak çalıştırır
+        if "--no-analysis" in sys.argv[1:]:
+            return
         
         # R script'ini çalıştır
         logger.info("R analizi başlatılıyor...")
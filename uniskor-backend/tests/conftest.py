@@ -0,0 +1,9 @@
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# The backend packages and the scripts (sfa.py, ...) are imported as top-level modules
+for path in (BACKEND_DIR, BACKEND_DIR / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
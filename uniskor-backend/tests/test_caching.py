@@ -0,0 +1,142 @@
+"""Conditional GETs and the precompressed response cache (api/caching.py)"""
+
+import json
+import os
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from api.caching import encoded_etag, response_cache, snapshot_etag
+from data.service import data_service
+from data.versions import SnapshotVersions
+
+LATEST = "/api/data/latest"
+FAR_FUTURE = "Fri, 01 Jan 2100 00:00:00 GMT"
+LONG_AGO = "Thu, 01 Jan 1970 00:00:00 GMT"
+
+
+@pytest.fixture
+def client():
+    response_cache.clear()
+    yield TestClient(main.app)
+    response_cache.clear()
+
+
+@pytest.fixture
+def old_version(tmp_path, monkeypatch):
+    """A dated snapshot with different content and an older mtime than the current one"""
+    data = json.loads((data_service.data_dir / "data.json").read_text(encoding="utf-8"))
+    data["lastUpdated"] = "2020-01-01"
+    path = tmp_path / "2020-01-01.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, (1577836800, 1577836800))
+    monkeypatch.setattr(data_service, "versions", SnapshotVersions(tmp_path))
+    return "2020-01-01"
+
+
+def test_validators_on_data_responses(client):
+    response = client.get(LATEST, headers={"Accept-Encoding": "identity"})
+    snapshot = data_service.get_snapshot()
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == snapshot_etag(snapshot.version, LATEST, "")
+    assert response.headers["last-modified"] == formatdate(snapshot.last_modified, usegmt=True)
+    assert "cache-control" in response.headers
+
+
+def test_if_none_match_answers_304(client):
+    etag = client.get(LATEST, headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    response = client.get(LATEST, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_if_none_match_mismatch_sends_the_body(client):
+    response = client.get(LATEST, headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.json()["ranking"]
+
+
+def test_if_modified_since(client):
+    assert client.get(LATEST, headers={"If-Modified-Since": FAR_FUTURE}).status_code == 304
+    assert client.get(LATEST, headers={"If-Modified-Since": LONG_AGO}).status_code == 200
+
+
+def test_if_modified_since_does_not_hide_errors(client):
+    missing = client.get("/api/universities/no-such-university", headers={"If-Modified-Since": FAR_FUTURE})
+    invalid = client.get("/api/data/year/1900", headers={"If-Modified-Since": FAR_FUTURE})
+
+    assert missing.status_code == 404
+    assert invalid.status_code == 404
+    assert "etag" not in missing.headers
+
+
+def test_if_none_match_takes_precedence(client):
+    response = client.get(LATEST, headers={"If-None-Match": '"stale"', "If-Modified-Since": FAR_FUTURE})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_compressed_variants(client, encoding):
+    plain = client.get(LATEST, headers={"Accept-Encoding": "identity"})
+    response = client.get(LATEST, headers={"Accept-Encoding": encoding})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == encoded_etag(plain.headers["etag"], encoding)
+    # The client decodes the variant back to the same JSON
+    assert response.content == plain.content
+
+    revalidated = client.get(LATEST, headers={"Accept-Encoding": encoding, "If-None-Match": response.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == response.headers["etag"]
+
+
+def test_identity_variant_varies_too(client):
+    response = client.get(LATEST, headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_versioned_requests_validate_against_their_snapshot(client, old_version):
+    path = f"{LATEST}?version={old_version}"
+    snapshot = data_service.get_snapshot(old_version)
+
+    response = client.get(path, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == snapshot_etag(snapshot.version, LATEST, f"version={old_version}")
+    assert response.headers["last-modified"] == formatdate(1577836800, usegmt=True)
+    # Newer than the old snapshot but older than the current one
+    since = formatdate(1577836800 + 86400, usegmt=True)
+    assert client.get(path, headers={"If-Modified-Since": since}).status_code == 304
+    assert client.get(LATEST, headers={"If-Modified-Since": since}).status_code == 200
+
+
+def test_unknown_version_is_not_validated(client, old_version):
+    response = client.get(f"{LATEST}?version=1999-01-01", headers={"If-Modified-Since": FAR_FUTURE})
+
+    assert response.status_code == 404
+    assert "etag" not in response.headers
+
+
+def test_static_data_file_validates_against_the_file(client):
+    path = "/data/data.json"
+    stat = os.stat(data_service.data_dir / "data.json")
+
+    response = client.get(path, headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == snapshot_etag(f"{stat.st_mtime_ns}-{stat.st_size}", path, "")
+    assert response.headers["last-modified"] == formatdate(stat.st_mtime, usegmt=True)
+    assert client.get(path, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
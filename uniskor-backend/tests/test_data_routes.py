@@ -0,0 +1,82 @@
+"""Pagination and projection on the /api/data routes"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from api.caching import response_cache
+from api.pagination import encode_cursor
+
+
+@pytest.fixture
+def client():
+    response_cache.clear()
+    yield TestClient(main.app)
+    response_cache.clear()
+
+
+def test_search_pages_follow_the_full_ranking(client):
+    full = client.get("/api/data/search", params={"q": "üniversitesi"}).json()
+    slugs = []
+    cursor = None
+    for _ in range(3):
+        params = {"q": "üniversitesi", "limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/api/data/search", params=params).json()
+        slugs += [item["slug"] for item in page["results"]]
+        cursor = page["nextCursor"]
+
+    assert full["total"] == len(full["results"])
+    assert slugs == [item["slug"] for item in full["results"][:12]]
+
+
+def test_search_total_on_the_last_page(client):
+    full = client.get("/api/data/search", params={"q": "ankara"}).json()
+
+    page = client.get("/api/data/search", params={"q": "ankara", "limit": 4}).json()
+    last = client.get("/api/data/search", params={"q": "ankara", "limit": full["total"]}).json()
+
+    assert page["total"] is None
+    assert page["nextCursor"] is not None
+    assert last["total"] == full["total"]
+    assert last["nextCursor"] is None
+
+
+def test_university_fields_project_per_year_scores(client):
+    full = client.get("/api/universities/", params={"limit": 2}).json()["universities"]
+
+    page = client.get("/api/universities/", params={"limit": 2, "fields": "slug,name,ortalama"}).json()
+
+    assert [sorted(item) for item in page["universities"]] == [["name", "ortalama", "slug"]] * 2
+    for item, university in zip(page["universities"], full):
+        assert item["ortalama"] == {year: scores["ortalama"] for year, scores in university["scores"].items()}
+
+
+def test_search_results_project_per_year_scores(client):
+    result = client.get("/api/data/search", params={"q": "ankara", "limit": 1, "fields": "slug,medyan"}).json()
+
+    assert set(result["results"][0]) == {"slug", "medyan"}
+    assert all(isinstance(year, str) for year in result["results"][0]["medyan"])
+
+
+@pytest.mark.parametrize("path", ["/api/universities/", "/api/data/search?q=ankara", "/api/data/latest"])
+def test_unknown_fields_are_rejected(client, path):
+    response = client.get(path, params={"fields": "slug,y1"})
+
+    assert response.status_code == 400
+    assert "Unknown fields: y1" in response.json()["detail"]
+    assert "Allowed: slug, name" in response.json()["detail"]
+
+
+def test_cursor_is_bound_to_its_snapshot(client):
+    page = client.get("/api/universities/", params={"limit": 2}).json()
+    follow = client.get("/api/universities/", params={"limit": 2, "cursor": page["nextCursor"]})
+    assert follow.status_code == 200
+
+    # A cursor from other data (e.g. issued before a reload) is not resumed
+    stale = encode_cursor(2, "0" * 64)
+    response = client.get("/api/universities/", params={"limit": 2, "cursor": stale})
+    assert response.status_code == 409
+    # Cursors from before the version was part of them are rejected too
+    assert client.get("/api/data/search", params={"q": "ankara", "limit": 2, "cursor": "Mg"}).status_code == 400
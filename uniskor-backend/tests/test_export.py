@@ -0,0 +1,34 @@
+"""Export rows are streamed from the snapshot arrays"""
+
+import json
+
+import pytest
+
+from data.binary import load_binary_snapshot, write_binary_snapshot
+from data.export import RANKING_COLUMNS, all_years_rows, ranking_rows
+from data.service import data_service
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    data = json.loads((data_service.data_dir / "data.json").read_text(encoding="utf-8"))
+    write_binary_snapshot(data, tmp_path / "data.bin")
+    return load_binary_snapshot(tmp_path / "data.bin", 0.0)
+
+
+def test_ranking_rows_match_the_rankings(snapshot, monkeypatch):
+    monkeypatch.setattr("data.export.CHUNK_ROWS", 7)
+    for year in snapshot.years:
+        rows = list(ranking_rows(snapshot, year))
+        # Not built by the export itself
+        assert year not in snapshot.rankings._rankings
+        assert rows == [{column: entry[column] for column in RANKING_COLUMNS} for entry in snapshot.rankings[year]]
+    assert list(ranking_rows(snapshot, 1900)) == []
+
+
+def test_all_years_export_leaves_the_rankings_unbuilt(snapshot):
+    rows = list(all_years_rows(snapshot))
+
+    assert len(rows) == sum(1 for year in snapshot.years for _ in ranking_rows(snapshot, year))
+    assert [row['year'] for row in rows] == sorted(row['year'] for row in rows)
+    assert snapshot.rankings._rankings == {}
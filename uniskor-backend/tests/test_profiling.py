@@ -0,0 +1,52 @@
+"""Who can ask ProfilingMiddleware for a profile"""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api.profiling import ProfilingMiddleware
+
+
+async def hello(request):
+    return JSONResponse({"hello": "world"})
+
+
+def make_client(tmp_path, token):
+    app = Starlette(routes=[Route("/", hello)])
+    app.add_middleware(ProfilingMiddleware, sample_rate=0.0, directory=tmp_path, token=token)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("fmt", ["folded", "cprofile"])
+def test_token_requests_a_profile(tmp_path, fmt):
+    client = make_client(tmp_path, "secret")
+
+    response = client.get("/", headers={"X-Profile": "secret", "X-Profile-Format": fmt})
+
+    assert response.status_code == 200
+    assert (tmp_path / response.headers["x-profile-file"]).is_file()
+
+
+def test_query_parameter_carries_the_token(tmp_path):
+    response = make_client(tmp_path, "secret").get("/?profile=secret&profile_format=cprofile")
+
+    assert response.headers["x-profile-file"].endswith(".prof")
+
+
+@pytest.mark.parametrize("flag", ["wrong", "1", ""])
+def test_wrong_token_is_ignored(tmp_path, flag):
+    response = make_client(tmp_path, "secret").get("/", headers={"X-Profile": flag})
+
+    assert response.status_code == 200
+    assert "x-profile-file" not in response.headers
+    assert not any(tmp_path.iterdir())
+
+
+def test_no_profiles_on_request_without_a_token(tmp_path):
+    response = make_client(tmp_path, None).get("/?profile=1", headers={"X-Profile": "1"})
+
+    assert response.status_code == 200
+    assert "x-profile-file" not in response.headers
+    assert not any(tmp_path.iterdir())
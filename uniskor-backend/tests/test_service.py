@@ -0,0 +1,23 @@
+"""Reload decisions of DataService"""
+
+import shutil
+
+from data.service import DataService, data_service
+
+
+def test_missing_source_keeps_the_snapshot_and_is_reported(tmp_path, monkeypatch, caplog):
+    monkeypatch.setenv("UNISKOR_DATA_DIR", str(tmp_path))
+    shutil.copy(data_service.data_dir / "data.json", tmp_path / "data.json")
+    service = DataService()
+    snapshot = service.get_snapshot()
+
+    (tmp_path / "data.json").unlink()
+
+    assert service._should_reload() is False
+    assert service.source_missing
+    assert "Data file not found" in caplog.text
+    assert service.get_snapshot() is snapshot
+
+    shutil.copy(data_service.data_dir / "data.json", tmp_path / "data.json")
+    assert service._should_reload() is True
+    assert not service.source_missing
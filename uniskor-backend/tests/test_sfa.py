@@ -0,0 +1,163 @@
+"""scripts/sfa.py against the sfaR reference tables and the published scores"""
+
+import numpy as np
+import pytest
+
+import sfa
+from data.interchange import read_dataset
+from data.rescoring import METHODOLOGY_WEIGHTS, weighted_scores
+
+# Models whose sfaR optimum is interior; on the others s_u runs to zero and
+# the variance estimates are not identified
+REFERENCE_MODELS = [(2015, 'y1'), (2018, 'y4'), (2022, 'y1'), (2022, 'y4')]
+
+
+@pytest.fixture(scope='module')
+def raw():
+    return read_dataset(sfa.RAW_DATASET)
+
+
+@pytest.fixture(scope='module')
+def published():
+    return read_dataset(sfa.SCORES_DATASET)
+
+
+@pytest.mark.parametrize('year,output', REFERENCE_MODELS)
+def test_fit_frontier_matches_sfar(raw, year, output):
+    rows, y, X = sfa.design(raw[year], output)
+    fit = sfa.fit_frontier(y, X)
+    reference = sfa.parse_reference(sfa.REFERENCE_TABLES / f"SFA_{year}_{output}_hnormal.txt")
+
+    assert fit.converged
+    assert fit.n == reference['n']
+    assert fit.loglik == pytest.approx(reference['loglik'], abs=1e-4)
+    np.testing.assert_allclose(fit.params, sfa.reference_params(reference), atol=1e-4)
+
+
+def test_weighted_scores_reproduce_published_year(published):
+    scores = published[2022]
+    efficiency = scores[[f"{output}-Skor" for output in sfa.OUTPUTS]].to_numpy(dtype=float)
+
+    mean, median = weighted_scores(efficiency, METHODOLOGY_WEIGHTS)
+
+    # Bit for bit, as the R script computes them
+    np.testing.assert_array_equal(mean, scores['Ortalama-Skor'].to_numpy(dtype=float))
+    np.testing.assert_array_equal(median, scores['Medyan-Skor'].to_numpy(dtype=float))
+
+
+def test_build_scores_reproduces_published_ranks(published):
+    scores = published[2022]
+    efficiency = scores[[f"{output}-Skor" for output in sfa.OUTPUTS]].to_numpy(dtype=float)
+
+    rebuilt = sfa.build_scores(scores['Uni'], efficiency)
+
+    for column in ('Ortalama-Sıralama', 'Medyan-Sıralama', 'y1-Sıralama'):
+        np.testing.assert_array_equal(rebuilt[column].to_numpy(dtype=float), scores[column].to_numpy(dtype=float))
+
+
+def test_batch_bfgs_matches_fit_frontier(raw):
+    rows, y, X = sfa.design(raw[2022], 'y1')
+    fit = sfa.fit_frontier(y, X)
+
+    def objective(theta, index):
+        ll, grad = sfa.batch_log_likelihood(theta, y, X)
+        return -ll, -grad
+
+    theta, value, status = sfa.batch_bfgs(objective, sfa.start_values(y, X)[1][None])
+
+    assert status[0] in (0, 2)
+    assert -value[0] == pytest.approx(fit.loglik, abs=1e-8)
+    np.testing.assert_allclose(theta[0], fit.params, atol=1e-6)
+
+
+def test_fit_replicates_of_the_full_sample_keep_the_fit(raw):
+    rows, y, X = sfa.design(raw[2022], 'y1')
+    fit = sfa.fit_frontier(y, X)
+
+    theta, done = sfa.fit_replicates(y, X, np.ones((1, len(y))), fit.params)
+
+    assert done.all()
+    np.testing.assert_allclose(theta[0], fit.params, atol=1e-6)
+
+
+def test_model_cache_hit(raw, tmp_path):
+    rows, y, X = sfa.design(raw[2022], 'y1')
+    cache = sfa.ModelCache(tmp_path)
+    key = sfa.ModelCache.key(rows, y, X)
+    assert cache.get(key, 2022, 'y1') is None
+
+    result = sfa.fit_model(2022, 'y1', rows, y, X)
+    cache.put(key, result)
+    cached = cache.get(key, 2022, 'y1')
+
+    assert cached.cached
+    assert cached.error is None
+    np.testing.assert_array_equal(cached.fit.params, result.fit.params)
+    np.testing.assert_array_equal(cached.efficiency, result.efficiency)
+    np.testing.assert_array_equal(cached.rows, result.rows)
+
+
+def test_model_cache_invalidation(raw, tmp_path, monkeypatch):
+    rows, y, X = sfa.design(raw[2022], 'y1')
+    cache = sfa.ModelCache(tmp_path)
+    key = sfa.ModelCache.key(rows, y, X)
+    cache.put(key, sfa.fit_model(2022, 'y1', rows, y, X))
+
+    # Different data
+    changed = y.copy()
+    changed[0] += 1e-9
+    assert cache.get(sfa.ModelCache.key(rows, changed, X), 2022, 'y1') is None
+    # Same data, warm-started instead of cold
+    start = sfa.start_values(y, X)[0]
+    assert cache.get(sfa.ModelCache.key(rows, y, X, start), 2022, 'y1') is None
+    assert sfa.ModelCache.key(rows, y, X, start) != sfa.ModelCache.key(rows, y, X, start + 1e-9)
+    # Different model specification
+    monkeypatch.setitem(sfa.MODEL_SPEC, 'revision', sfa.MODEL_SPEC['revision'] + 1)
+    assert cache.get(sfa.ModelCache.key(rows, y, X), 2022, 'y1') is None
+
+
+def test_model_cache_skips_failed_fits(raw, tmp_path):
+    rows, y, X = sfa.design(raw[2022], 'y1')
+    cache = sfa.ModelCache(tmp_path)
+    key = sfa.ModelCache.key(rows[:3], y[:3], X[:3])
+
+    result = sfa.fit_model(2022, 'y1', rows[:3], y[:3], X[:3])
+    cache.put(key, result)
+
+    assert result.error is not None
+    assert cache.get(key, 2022, 'y1') is None
+
+
+def test_fit_grid_reuses_fits_from_the_same_start(raw, tmp_path):
+    frames = {year: raw[year] for year in (2021, 2022)}
+    cache = sfa.ModelCache(tmp_path)
+
+    first = sfa.fit_grid(frames, outputs=('y1', 'y4'), workers=1, cache=cache)
+    again = sfa.fit_grid(frames, outputs=('y1', 'y4'), workers=1, cache=cache)
+    cold = sfa.fit_grid(frames, outputs=('y1', 'y4'), workers=1, warm=False, cache=cache)
+
+    assert not any(result.cached for result in first.values())
+    assert all(result.cached for result in again.values())
+    for key, result in again.items():
+        np.testing.assert_array_equal(result.fit.params, first[key].fit.params)
+    # The first year of a warm chain starts cold; the later ones do not
+    assert cold[(2021, 'y1')].cached and cold[(2021, 'y4')].cached
+    assert not cold[(2022, 'y1')].cached and not cold[(2022, 'y4')].cached
+
+
+def test_check_scores_flags_score_and_rank_differences(published):
+    scores = published[2022]
+    assert sfa.check_scores(2022, scores, scores) == []
+
+    changed = scores.copy()
+    # Swap the two best universities' means and add a NaN on our side only
+    best = changed['Ortalama-Sıralama'].nsmallest(2).index
+    changed.loc[best, 'Ortalama-Skor'] = changed.loc[best[::-1], 'Ortalama-Skor'].to_numpy()
+    changed.loc[best, 'Ortalama-Sıralama'] = changed.loc[best[::-1], 'Ortalama-Sıralama'].to_numpy()
+    changed.loc[changed['y1-Skor'].first_valid_index(), 'y1-Skor'] = np.nan
+
+    problems = sfa.check_scores(2022, changed, scores)
+
+    assert any(problem.startswith('2022 Ortalama-Skor: differs') for problem in problems)
+    assert '2022 Ortalama-Sıralama: ranks move by up to 1 places' in problems
+    assert '2022 y1-Skor: missing for 1 universities on one side only' in problems
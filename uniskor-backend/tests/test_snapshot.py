@@ -0,0 +1,70 @@
+"""Snapshots built from data.json and from a data.bin serve the same content"""
+
+import json
+
+import pytest
+
+from data.binary import content_hash, load_binary_snapshot, write_binary_snapshot
+from data.service import data_service
+from data.snapshot import build_snapshot
+from data.versions import read_snapshot_file
+
+
+@pytest.fixture(scope="module")
+def data():
+    return json.loads((data_service.data_dir / "data.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="module")
+def snapshots(data, tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshot") / "data.bin"
+    write_binary_snapshot(data, path)
+    return build_snapshot(data), load_binary_snapshot(path, 0.0)
+
+
+def test_universities_are_built_on_access(snapshots):
+    from_json, from_bin = snapshots
+
+    assert len(from_bin.universities) == len(from_json.universities)
+    assert from_bin.universities[0] is from_bin.universities[0]
+    assert from_bin.universities[-1] == from_bin.universities[len(from_bin.universities) - 1]
+    assert from_bin.universities[2:5] == [from_bin.universities[i] for i in range(2, 5)]
+    for built, parsed in zip(from_bin.universities, from_json.universities):
+        assert built["slug"] == parsed["slug"]
+        assert built["scores"].keys() == parsed["scores"].keys()
+        for year, scores in built["scores"].items():
+            assert scores["ortalama"] == parsed["scores"][year]["ortalama"]
+            assert scores["medyan"] == parsed["scores"][year]["medyan"]
+
+
+def test_slug_lookup(snapshots):
+    from_json, from_bin = snapshots
+    slug = from_json.slugs[10]
+
+    assert from_bin.universities_by_slug[slug] is from_bin.universities[from_bin.slug_index[slug]]
+    assert from_json.universities_by_slug[slug] is from_json.data["universities"][10]
+    assert from_bin.universities_by_slug.get("no-such-university") is None
+    assert len(from_bin.universities_by_slug) == len(from_json.universities_by_slug)
+
+
+def test_rankings_are_built_per_year(snapshots):
+    from_json, from_bin = snapshots
+
+    assert list(from_bin.rankings) == from_bin.years
+    for year in from_json.years:
+        assert from_bin.rankings[year] == from_json.rankings[year]
+        assert [entry["rank"] for entry in from_bin.rankings[year]] == list(range(1, len(from_bin.rankings[year]) + 1))
+    assert from_bin.rankings.get(1900, []) == []
+
+
+def test_json_and_binary_share_one_version(data, tmp_path):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    bin_path = write_binary_snapshot(data, tmp_path / "data.bin")
+    # Same data, different formatting: the version follows the content
+    stored = tmp_path / "stored.json"
+    stored.write_text(json.dumps({**data, "contentHash": content_hash(data)}, indent=2), encoding="utf-8")
+
+    versions = {read_snapshot_file(path).version for path in (json_path, bin_path, stored)}
+
+    assert versions == {content_hash(data)}
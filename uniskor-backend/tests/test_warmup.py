@@ -0,0 +1,46 @@
+"""Warm-up requests stay out of the metrics and follow snapshot reloads"""
+
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from api.caching import response_cache
+from api.metrics import request_metrics
+from api.warmup import prerender
+from data.service import data_service
+
+
+def test_warmup_requests_are_not_counted():
+    before = dict(request_metrics.requests)
+
+    rendered = asyncio.run(prerender(main.app, ["/api/data/years", "/api/data/latest"]))
+
+    assert rendered == 2
+    assert request_metrics.requests == before
+
+
+def test_reload_rewarms_the_response_cache():
+    with TestClient(main.app) as client:
+        response_cache.clear()
+        before = dict(request_metrics.requests)
+
+        # Published from this thread, as a load outside the event loop would be
+        data_service._publish(data_service.current_snapshot)
+        deadline = time.monotonic() + 10
+        while len(response_cache) < len(main.hot_paths()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert len(response_cache) == len(main.hot_paths())
+        assert main.app.state.prerendered == len(main.hot_paths())
+        assert request_metrics.requests == before
+        assert client.get("/ready").json()["status"] == "ready"
+
+
+def test_rewarmer_is_inert_outside_the_lifespan():
+    response_cache.clear()
+
+    data_service._publish(data_service.get_snapshot())
+
+    assert len(response_cache) == 0